@@ -0,0 +1,246 @@
+"""
+Contrôle d'admission et ordonnancement des appels au LLM.
+
+Un nombre borné d'appels s'exécute en même temps ; les suivants attendent
+dans une file bornée. File pleine : la demande est refusée immédiatement
+(Overloaded) avec un délai de nouvel essai estimé à partir du temps de
+service observé. Une demande dont le client s'est déconnecté pendant
+l'attente est retirée de la file (Abandoned) au lieu d'occuper le modèle
+pour personne.
+
+L'ordre de service n'est pas celui d'arrivée : les demandes interactives
+passent avant les demandes de fond (rejeus scriptés, traitements par lots), qui ne
+disposent que d'une partie des places d'exécution, et chaque classe partage
+ses places équitablement entre appelants (clé d'API, roadmap...) par
+deficit round-robin.
+"""
+import math
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = (INTERACTIVE, BATCH)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Serveur saturé, réessayer dans {retry_after} s")
+        self.retry_after = retry_after
+
+
+class Abandoned(Exception):
+    """Le client est parti avant que sa demande soit admise."""
+
+
+class DeficitRoundRobin:
+    def __init__(self, quantum=1, weights=None):
+        """
+        File équitable entre appelants (deficit round-robin).
+
+        À chaque tour, un appelant reçoit quantum × poids de crédit et sert
+        ses demandes tant que le crédit couvre leur coût : un appelant qui
+        envoie beaucoup de demandes n'obtient pas plus que sa part.
+
+        Args:
+            quantum (float): Crédit attribué par tour à un appelant de poids 1
+            weights (dict, optional): Poids par appelant (1 par défaut)
+        """
+        self.quantum = quantum
+        self.weights = weights or {}
+        self._queues = OrderedDict()
+        self._deficits = {}
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def push(self, caller, item, cost=1):
+        if caller not in self._queues:
+            self._queues[caller] = deque()
+            self._deficits[caller] = 0
+        self._queues[caller].append((cost, item))
+        self._size += 1
+
+    def pop(self):
+        """Retourne la prochaine demande à servir, ou None si la file est vide."""
+        while self._queues:
+            caller, queue = next(iter(self._queues.items()))
+            cost, item = queue[0]
+
+            if self._deficits[caller] >= cost:
+                self._deficits[caller] -= cost
+                queue.popleft()
+                self._size -= 1
+                if not queue:
+                    # Un appelant inactif ne garde pas de crédit
+                    del self._queues[caller], self._deficits[caller]
+                return item
+
+            self._deficits[caller] += self.quantum * self.weights.get(caller, 1)
+            self._queues.move_to_end(caller)
+
+        return None
+
+    def remove(self, caller, item):
+        """Retire une demande en attente (client déconnecté)."""
+        queue = self._queues.get(caller)
+        if queue is None:
+            return
+        for entry in queue:
+            if entry[1] is item:
+                queue.remove(entry)
+                self._size -= 1
+                break
+        if not queue:
+            del self._queues[caller], self._deficits[caller]
+
+
+class _Ticket:
+    __slots__ = ('caller', 'priority', 'granted')
+
+    def __init__(self, caller, priority):
+        self.caller = caller
+        self.priority = priority
+        self.granted = False
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=2, max_queue=16, initial_service_time=5.0, smoothing=0.2,
+                 check_interval=0.5, batch_max_in_flight=None, caller_weights=None):
+        """
+        Initialise le contrôle d'admission.
+
+        Args:
+            max_in_flight (int): Appels exécutés simultanément
+            max_queue (int): Demandes en attente au maximum
+            initial_service_time (float): Durée d'un appel (secondes) supposée
+                avant la première mesure
+            smoothing (float): Poids d'une nouvelle mesure dans la moyenne
+                mobile exponentielle du temps de service
+            check_interval (float): Secondes entre deux vérifications de
+                déconnexion d'un client en attente
+            batch_max_in_flight (int, optional): Places utilisables par les
+                demandes de fond ; par défaut toutes sauf une, gardée libre
+                pour les demandes interactives
+            caller_weights (dict, optional): Poids de partage par appelant
+        """
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.service_time = initial_service_time
+        self.smoothing = smoothing
+        self.check_interval = check_interval
+        self.batch_max_in_flight = (batch_max_in_flight if batch_max_in_flight is not None
+                                    else max(1, max_in_flight - 1))
+        self._in_flight = {priority: 0 for priority in PRIORITIES}
+        self._queues = {priority: DeficitRoundRobin(weights=caller_weights) for priority in PRIORITIES}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def admit(self, is_abandoned=None, caller=None, priority=INTERACTIVE, cost=1):
+        """
+        Réserve une place d'exécution pour la durée du bloc.
+
+        Args:
+            is_abandoned (callable, optional): Retourne True si le client
+                s'est déconnecté ; vérifié pendant l'attente
+            caller (str, optional): Appelant pour le partage équitable
+            priority (str): INTERACTIVE ou BATCH
+            cost (float): Coût de la demande dans la part de l'appelant
+
+        Raises:
+            ValueError: Si la priorité est inconnue
+            Overloaded: Si la file d'attente est pleine
+            Abandoned: Si le client s'est déconnecté pendant l'attente
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Priorité inconnue : {priority}")
+
+        self._enter(is_abandoned, caller, priority, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._leave(priority, time.monotonic() - started)
+
+    def retry_after(self):
+        """Retourne le délai (secondes entières) avant qu'une nouvelle demande puisse être servie."""
+        with self._condition:
+            return self._retry_after()
+
+    def _queued(self):
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _retry_after(self):
+        # Vagues d'appels à écouler avant qu'une place se libère pour un nouveau venu
+        waves = (self._queued() + sum(self._in_flight.values())) / self.max_in_flight
+        return max(1, math.ceil(waves * self.service_time))
+
+    def _dispatch(self):
+        """Attribue les places libres aux demandes en attente, interactives d'abord."""
+        granted = False
+        while sum(self._in_flight.values()) < self.max_in_flight:
+            ticket = self._queues[INTERACTIVE].pop()
+            if ticket is None and self._in_flight[BATCH] < self.batch_max_in_flight:
+                ticket = self._queues[BATCH].pop()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self._in_flight[ticket.priority] += 1
+            granted = True
+
+        if granted:
+            self._condition.notify_all()
+
+    def _enter(self, is_abandoned, caller, priority, cost):
+        with self._condition:
+            ticket = _Ticket(caller, priority)
+            self._queues[priority].push(caller, ticket, cost)
+            self._dispatch()
+
+            if not ticket.granted and self._queued() > self.max_queue:
+                self._queues[priority].remove(caller, ticket)
+                raise Overloaded(self._retry_after())
+
+            try:
+                while not ticket.granted:
+                    self._condition.wait(self.check_interval)
+                    if not ticket.granted and is_abandoned is not None and is_abandoned():
+                        raise Abandoned()
+            except BaseException:
+                if ticket.granted:
+                    self._in_flight[priority] -= 1
+                    self._dispatch()
+                else:
+                    self._queues[priority].remove(caller, ticket)
+                raise
+
+    def _leave(self, priority, duration):
+        with self._condition:
+            self._in_flight[priority] -= 1
+            self.service_time += self.smoothing * (duration - self.service_time)
+            self._dispatch()
+
+
+def socket_closed(sock):
+    """
+    Indique si le pair d'une connexion TCP l'a fermée, sans consommer de données.
+
+    Args:
+        sock (socket.socket): Connexion du client (None si inconnue)
+
+    Returns:
+        bool: True si la connexion est fermée ou en erreur
+    """
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # Lisible sans données : fin de connexion (EOF)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
@@ -0,0 +1,82 @@
+"""
+Notification des changements de la base aux clients connectés en continu (SSE).
+
+Un seul thread surveille la révision pour tout le processus, et seulement
+tant qu'au moins un client attend : un onglet inactif ne coûte qu'une
+connexion ouverte, quel que soit le nombre d'onglets. Les écritures des
+autres processus sont vues au tour de surveillance suivant ; celles du
+processus courant peuvent être signalées immédiatement avec notify().
+"""
+import threading
+import time
+
+
+class ChangeFeed:
+    def __init__(self, revision_source, poll_interval=0.25):
+        """
+        Initialise le flux de changements.
+
+        Args:
+            revision_source (callable): Retourne la révision courante de la base
+            poll_interval (float): Secondes entre deux lectures de la révision
+        """
+        self._revision_source = revision_source
+        self.poll_interval = poll_interval
+        self._revision = None
+        self._waiters = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def notify(self):
+        """Relit la révision et réveille les clients si elle a changé."""
+        revision = self._revision_source()
+        with self._condition:
+            if revision != self._revision:
+                self._revision = revision
+                self._condition.notify_all()
+
+    def wait(self, revision, timeout):
+        """
+        Attend une révision plus récente que celle connue du client.
+
+        Le client peut connaître une révision plus récente que le flux (lue
+        directement en base avant le tour de surveillance suivant) : il
+        attend alors que le flux la dépasse, au lieu de repartir aussitôt.
+
+        Args:
+            revision (int): Dernière révision envoyée au client (None au départ)
+            timeout (float): Attente maximale en secondes
+
+        Returns:
+            int: Révision du flux (inférieure ou égale à revision si le
+                délai a expiré)
+        """
+        self._start()
+        with self._condition:
+            self._waiters += 1
+            self._condition.notify_all()
+            try:
+                self._condition.wait_for(
+                    lambda: self._revision is not None and (revision is None or self._revision > revision),
+                    timeout
+                )
+                return self._revision
+            finally:
+                self._waiters -= 1
+
+    def _start(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name='change-feed', daemon=True)
+                self._thread.start()
+
+    def _watch(self):
+        while True:
+            # Aucun client : pas de lecture de la base
+            with self._condition:
+                self._condition.wait_for(lambda: self._waiters > 0)
+            try:
+                self.notify()
+            except Exception as e:
+                print(f"Erreur de surveillance des changements : {e}")
+            time.sleep(self.poll_interval)
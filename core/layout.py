@@ -0,0 +1,165 @@
+"""
+Moteur de mise en page de la roadmap.
+
+Toute la géométrie des barres (x, largeur, y, hauteur) est calculée en une
+seule passe NumPy, en EMU entiers, à partir des colonnes de tâches. Le rendu
+PowerPoint et l'API de prévisualisation consomment le même résultat.
+"""
+import heapq
+from typing import NamedTuple
+
+import numpy as np
+
+EMU_PER_INCH = 914400
+
+# Dimensions d'une présentation python-pptx vierge (10 x 7.5 pouces)
+SLIDE_WIDTH = 10 * EMU_PER_INCH
+SLIDE_HEIGHT = 15 * EMU_PER_INCH // 2
+
+GRID_MARGIN_TOP = 3 * EMU_PER_INCH // 2
+GRID_MARGIN_BOTTOM = EMU_PER_INCH // 2
+GRID_MARGIN_LEFT = EMU_PER_INCH // 2
+GRID_MARGIN_RIGHT = EMU_PER_INCH // 2
+
+LANE_OFFSET = EMU_PER_INCH // 2
+LANE_PITCH = 3 * EMU_PER_INCH // 5
+TASK_HEIGHT = EMU_PER_INCH // 2
+
+MONTHS_PER_YEAR = 12
+MONTH_LABELS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+# Grille des mois (tableau d'en-tête) et titre de la slide
+HEADER_HEIGHT = EMU_PER_INCH // 2
+TITLE_LEFT = EMU_PER_INCH
+TITLE_TOP = EMU_PER_INCH // 2
+
+# Valeurs par défaut appliquées aux bornes manquantes
+DEFAULT_START_MONTH = 0
+DEFAULT_START_POSITION = 0.5
+DEFAULT_END_MONTH = 11
+DEFAULT_END_POSITION = 1.0
+
+
+class RoadmapLayout(NamedTuple):
+    """Géométrie des barres, une entrée par tâche (tableaux int64 en EMU)."""
+    x: np.ndarray
+    y: np.ndarray
+    width: np.ndarray
+    height: np.ndarray
+    lanes: np.ndarray
+    slide_width: int
+    slide_height: int
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def grid_width(self):
+        return self.slide_width - GRID_MARGIN_LEFT - GRID_MARGIN_RIGHT
+
+
+def _column(values, default):
+    """Convertit une séquence (None autorisé) en tableau float64 sans trous."""
+    column = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(column), default, column)
+
+
+def month_bounds(start_month, start_position, end_month, end_position):
+    """Retourne les bornes de chaque tâche en mois fractionnaires."""
+    start = (_column(start_month, DEFAULT_START_MONTH)
+             + _column(start_position, DEFAULT_START_POSITION))
+    end = (_column(end_month, DEFAULT_END_MONTH)
+           + _column(end_position, DEFAULT_END_POSITION))
+    return start, end
+
+
+def compute_layout(start_month, start_position, end_month, end_position, lanes,
+                   slide_width=SLIDE_WIDTH, slide_height=SLIDE_HEIGHT):
+    """
+    Calcule la géométrie de toutes les barres en une passe vectorisée.
+
+    Args:
+        start_month, start_position, end_month, end_position: Colonnes des
+            bornes (séquences ou tableaux, None/NaN remplacés par les défauts)
+        lanes: Index de ligne de chaque barre
+        slide_width (int): Largeur de la slide en EMU
+        slide_height (int): Hauteur de la slide en EMU
+
+    Returns:
+        RoadmapLayout: Géométrie des barres en EMU entiers
+    """
+    start, end = month_bounds(start_month, start_position, end_month, end_position)
+    lanes = np.asarray(lanes, dtype=np.int64)
+
+    grid_width = slide_width - GRID_MARGIN_LEFT - GRID_MARGIN_RIGHT
+    scale = grid_width / MONTHS_PER_YEAR
+
+    x = GRID_MARGIN_LEFT + np.rint(start * scale).astype(np.int64)
+    end_x = GRID_MARGIN_LEFT + np.rint(end * scale).astype(np.int64)
+    y = GRID_MARGIN_TOP + LANE_OFFSET + lanes * LANE_PITCH
+
+    return RoadmapLayout(
+        x=x,
+        y=y,
+        # Une fin antérieure au début donne une barre vide, jamais une largeur
+        # négative (refusée par Pillow, invalide en SVG)
+        width=np.maximum(end_x - x, 0),
+        height=np.full(len(x), TASK_HEIGHT, dtype=np.int64),
+        lanes=lanes,
+        slide_width=int(slide_width),
+        slide_height=int(slide_height),
+    )
+
+
+def assign_lanes(starts, ends, lane_ends=None):
+    """
+    Répartit les tâches sur des lignes sans chevauchement (premier emplacement libre).
+
+    Les tâches sont traitées dans l'ordre fourni : chacune prend la ligne
+    libérée le plus tôt si sa dernière tâche se termine avant son début,
+    sinon une nouvelle ligne. Les fins de ligne sont gardées dans un tas :
+    chaque tâche coûte O(log lignes), au lieu d'un parcours de toutes les
+    lignes ouvertes. Pour des tâches triées par début, le nombre de lignes
+    est minimal.
+
+    Args:
+        starts, ends: Bornes des tâches en mois fractionnaires
+        lane_ends (list, optional): Fin de la dernière tâche de chaque ligne,
+            pour reprendre une répartition commencée ailleurs
+
+    Returns:
+        tuple: (tableau des lignes, liste des fins de ligne mise à jour)
+    """
+    lane_ends = [float(lane_end) for lane_end in lane_ends or []]
+    # (fin, ligne) : à fin égale, la ligne de plus petit index
+    heap = [(lane_end, lane) for lane, lane_end in enumerate(lane_ends)]
+    heapq.heapify(heap)
+    lanes = []
+
+    for start, end in zip(np.asarray(starts, dtype=np.float64).tolist(),
+                          np.asarray(ends, dtype=np.float64).tolist()):
+        if heap and heap[0][0] <= start:
+            lane_end, lane = heap[0]
+            end = max(lane_end, end)
+            heapq.heapreplace(heap, (end, lane))
+            lane_ends[lane] = end
+        else:
+            lane = len(lane_ends)
+            lane_ends.append(end)
+            heapq.heappush(heap, (end, lane))
+        lanes.append(lane)
+
+    return np.array(lanes, dtype=np.int64), lane_ends
+
+
+def to_percent(layout):
+    """
+    Convertit la géométrie en pourcentages de la grille des mois.
+
+    Returns:
+        tuple: (start_percent, duration_percent) en float64
+    """
+    grid_width = layout.grid_width
+    start_percent = (layout.x - GRID_MARGIN_LEFT) * 100.0 / grid_width
+    duration_percent = layout.width * 100.0 / grid_width
+    return start_percent, duration_percent
@@ -0,0 +1,95 @@
+"""
+Extraction et validation des réponses JSON du LLM d'analyse des prompts.
+
+Le modèle entoure parfois sa réponse de texte ("Voici la réponse : ...",
+"[note] ...") : la réponse est la première valeur JSON de la forme
+attendue trouvée dans le texte, qu'elle soit un objet ou un tableau.
+"""
+import json
+
+
+def find_json_value(text, accept):
+    """
+    Retourne la première valeur JSON du texte acceptée par accept.
+
+    Le décodage est tenté à partir de chaque '{' ou '[' du texte : un
+    crochet ou une accolade de la prose qui précède ne fait que passer au
+    candidat suivant. Une valeur décodée mais refusée est sautée en
+    entier, pour ne jamais retenir une valeur qu'elle contient.
+
+    Args:
+        text (str): Réponse brute du modèle
+        accept (callable): Retourne True pour une valeur de la forme attendue
+
+    Returns:
+        Valeur JSON décodée
+
+    Raises:
+        ValueError: Si aucune valeur acceptée n'est trouvée
+    """
+    decoder = json.JSONDecoder()
+    index = 0
+    while index < len(text):
+        if text[index] not in '{[':
+            index += 1
+            continue
+        try:
+            value, end = decoder.raw_decode(text, index)
+        except json.JSONDecodeError:
+            index += 1
+            continue
+        if accept(value):
+            return value
+        index = end
+
+    raise ValueError("Aucune réponse JSON de la forme attendue")
+
+
+def is_parsed_actions(value):
+    """Un objet (une action) ou un tableau non vide d'objets (prompt composé)."""
+    return isinstance(value, dict) or (isinstance(value, list) and bool(value)
+                                       and all(isinstance(element, dict) for element in value))
+
+
+def validate_parsed_task(parsed_res):
+    """
+    Valide une action analysée par le LLM.
+
+    Args:
+        parsed_res (dict): Action décodée
+
+    Returns:
+        dict: Action, sans les champs nuls pour une mise à jour
+
+    Raises:
+        ValueError: Si l'action n'est pas un objet ou est incomplète
+    """
+    if not isinstance(parsed_res, dict):
+        raise ValueError("Objet JSON attendu")
+
+    required_keys = ['type', 'task_name']
+    if not all(key in parsed_res for key in required_keys):
+        raise ValueError("JSON incomplet")
+
+    if parsed_res['type'] == 'update':
+        parsed_res = {k: v for k, v in parsed_res.items() if v is not None}
+
+    return parsed_res
+
+
+def validate_parsed_actions(parsed_res):
+    """
+    Valide les actions d'un prompt : un objet seul est une action, un
+    tableau les actions d'un prompt composé.
+
+    Returns:
+        list: Actions validées, dans l'ordre du prompt
+
+    Raises:
+        ValueError: Si le tableau est vide ou si une action est invalide
+    """
+    actions = parsed_res if isinstance(parsed_res, list) else [parsed_res]
+    if not actions:
+        raise ValueError("Aucune action")
+
+    return [validate_parsed_task(action) for action in actions]
@@ -0,0 +1,99 @@
+"""
+Regroupement de demandes concurrentes en un seul appel (micro-batching).
+
+Les demandes arrivées pendant quelques millisecondes, ou pendant qu'un
+appel est déjà en cours, partent ensemble dans un même appel au modèle :
+le prompt système n'est évalué qu'une fois pour tout le lot. Un élément du
+lot dont le résultat est invalide est rejoué seul.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, SimpleQueue
+
+
+class MicroBatcher:
+    def __init__(self, run_batch, run_single, max_batch=8, window=0.005, max_concurrent=1):
+        """
+        Initialise le regroupement.
+
+        Args:
+            run_batch (callable): Traite une liste d'éléments ; retourne un
+                résultat par élément, dans l'ordre (None si invalide)
+            run_single (callable): Traite un élément seul (lots d'un élément
+                et éléments invalides d'un lot)
+            max_batch (int): Nombre maximum d'éléments par lot
+            window (float): Secondes d'attente de demandes supplémentaires
+                une fois la première reçue
+            max_concurrent (int): Appels simultanés au maximum
+        """
+        self.run_batch = run_batch
+        self.run_single = run_single
+        self.max_batch = max_batch
+        self.window = window
+        self._queue = SimpleQueue()
+        self._slots = threading.Semaphore(max_concurrent)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='micro-batch')
+        self._collector = None
+        self._collector_lock = threading.Lock()
+
+    def submit(self, item):
+        """
+        Traite un élément au sein d'un lot et attend son résultat.
+
+        Args:
+            item: Élément à traiter
+
+        Returns:
+            Résultat de l'élément
+        """
+        with self._collector_lock:
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name='micro-batch-collector',
+                                                   daemon=True)
+                self._collector.start()
+
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+
+            # Tant qu'aucune place n'est libre, les demandes s'accumulent dans la file
+            self._slots.acquire()
+
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except Empty:
+                    break
+
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch):
+        try:
+            items = [item for item, _ in batch]
+            if len(batch) == 1:
+                results = [None]
+            else:
+                try:
+                    results = list(self.run_batch(items))
+                except Exception as e:
+                    print(f"Erreur du traitement par lot, rejeu individuel : {e}")
+                    results = [None] * len(batch)
+                if len(results) != len(batch):
+                    results = [None] * len(batch)
+
+            for (item, future), result in zip(batch, results):
+                if result is None:
+                    try:
+                        result = self.run_single(item)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                future.set_result(result)
+        finally:
+            self._slots.release()
@@ -0,0 +1,109 @@
+"""
+Interface de stockage des tâches de la roadmap.
+
+TaskRepository décrit ce que l'application attend d'un stockage : écritures
+journalisées par révision, lectures paginées et instantanés colonnaires.
+task_database.TaskDatabase l'implémente sur sqlite3 (fichier local, index
+spécialisés) et core.sqlalchemy_repository sur un moteur SQLAlchemy
+(pool de connexions, PostgreSQL ou SQLite).
+
+Les deux stockages fournissent les mêmes fonctions : noms approchés,
+recherche dans le journal, annulation et reconstruction d'une révision
+passée. Seuls les index qui les accélèrent diffèrent.
+"""
+from abc import ABC, abstractmethod
+
+
+class TaskRepository(ABC):
+    @abstractmethod
+    def close(self):
+        """Libère les connexions du stockage."""
+
+    @abstractmethod
+    def revision(self):
+        """Retourne la révision courante (incrémentée à chaque écriture)."""
+
+    @abstractmethod
+    def changes_since(self, revision, limit):
+        """Retourne les changements postérieurs à une révision, dans l'ordre d'application."""
+
+    @abstractmethod
+    def insert_task(self, task_info):
+        """Insère une nouvelle tâche ; lève une erreur d'intégrité si le nom existe déjà."""
+
+    @abstractmethod
+    def upsert_task(self, task_info, raw_prompt=None):
+        """Insère ou met à jour une tâche par son nom ; retourne son id."""
+
+    @abstractmethod
+    def update_task(self, task_id, task_info, raw_prompt=None):
+        """Modifie les champs fournis d'une tâche par son id ; retourne la tâche ou None."""
+
+    @abstractmethod
+    def apply_actions(self, actions, raw_prompt=None):
+        """Applique les actions d'un prompt composé dans une seule transaction, en une révision."""
+
+    @abstractmethod
+    def bulk_upsert(self, tasks, raw_prompt=None, chunk_size=None):
+        """Insère ou met à jour un flux de tâches ; retourne les nombres imported, created et updated."""
+
+    @abstractmethod
+    def delete_task(self, task_info, raw_prompt=None):
+        """Supprime une tâche par son nom ; retourne True si elle existait."""
+
+    @abstractmethod
+    def delete_task_by_id(self, task_id, raw_prompt=None):
+        """Supprime une tâche par son id ; retourne True si elle existait."""
+
+    @abstractmethod
+    def delete_tasks(self, task_names):
+        """Supprime plusieurs tâches par leur nom ; retourne le nombre supprimé."""
+
+    @abstractmethod
+    def get_task(self, task_id):
+        """Retourne la tâche (dict) portant cet id, ou None."""
+
+    @abstractmethod
+    def get_task_by_name(self, task_name):
+        """Retourne la tâche (dict) portant ce nom, ou None."""
+
+    @abstractmethod
+    def iter_tasks(self, since=None, batch=None):
+        """Parcourt les tâches (dict) par (start_date, id), sans date en premier."""
+
+    @abstractmethod
+    def iter_task_rows(self, columns, window=None):
+        """Parcourt les tâches sous forme de tuples, éventuellement limitées à une période."""
+
+    def list_tasks(self, limit=None):
+        """Liste les tâches triées par date de début."""
+        tasks = []
+        for task in self.iter_tasks():
+            if limit is not None and len(tasks) >= limit:
+                break
+            tasks.append(task)
+        return tasks
+
+    @abstractmethod
+    def tasks_overlapping(self, start=None, end=None):
+        """Liste les tâches dont la période chevauche [start, end]."""
+
+    @abstractmethod
+    def resolve_task_name(self, candidate, threshold=None, limit=5):
+        """Recherche les tâches au nom proche d'un nom candidat ({id, task_name, score})."""
+
+    @abstractmethod
+    def search_changes(self, query, limit=None, offset=0):
+        """Recherche dans le journal des changements (noms et prompts), avec un extrait."""
+
+    @abstractmethod
+    def undo(self):
+        """Annule la dernière opération ; retourne {revision, target}, ou None."""
+
+    @abstractmethod
+    def redo(self):
+        """Rétablit la dernière opération annulée ; retourne {revision, target}, ou None."""
+
+    @abstractmethod
+    def tasks_at(self, revision):
+        """Reconstruit les tâches à une révision passée ; ValueError avant l'historique conservé."""
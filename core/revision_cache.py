@@ -0,0 +1,68 @@
+"""
+Cache en mémoire des valeurs calculées à partir de la base (instantanés,
+exports...), cohérent entre processus.
+
+Chaque entrée est étiquetée par la révision de la base qui a servi à la
+calculer. Avant de servir une entrée, le cache relit la révision courante
+(un PRAGMA data_version côté SQLite tant que personne n'a écrit) : une
+écriture validée par n'importe quel processus invalide tout le cache, et
+seulement dans ce cas.
+"""
+import threading
+
+
+class RevisionCache:
+    def __init__(self, revision_source):
+        """
+        Initialise un cache vide.
+
+        Args:
+            revision_source (callable): Retourne la révision courante de la base
+        """
+        self._revision_source = revision_source
+        self._revision = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def revision(self):
+        """
+        Retourne la révision courante et vide le cache si elle a changé.
+
+        Returns:
+            int: Révision courante de la base
+        """
+        revision = self._revision_source()
+        with self._lock:
+            if revision != self._revision:
+                self._revision = revision
+                self._entries = {}
+        return revision
+
+    def get(self, key, revision):
+        """Retourne la valeur calculée pour cette révision, ou None."""
+        with self._lock:
+            return self._entries.get(key) if revision == self._revision else None
+
+    def put(self, key, revision, value):
+        """Enregistre une valeur, ignorée si une révision plus récente est déjà servie."""
+        with self._lock:
+            if revision == self._revision:
+                self._entries[key] = value
+
+    def get_or_build(self, key, build):
+        """
+        Retourne la valeur de la révision courante, calculée au besoin.
+
+        Args:
+            key: Clé de la valeur
+            build (callable): Calcule la valeur à partir de la révision
+
+        Returns:
+            Valeur en cache ou nouvellement calculée
+        """
+        revision = self.revision()
+        value = self.get(key, revision)
+        if value is None:
+            value = build(revision)
+            self.put(key, revision, value)
+        return value
@@ -0,0 +1,108 @@
+"""
+Exports légers de la roadmap (SVG et JSON), sans passer par python-pptx.
+
+Les deux formats sont produits par morceaux à partir de la mise en page
+calculée par core.layout, pour pouvoir être diffusés en streaming.
+"""
+import json
+from xml.sax.saxutils import escape
+
+from core.layout import (GRID_MARGIN_LEFT, GRID_MARGIN_TOP, HEADER_HEIGHT, MONTH_LABELS,
+                         MONTHS_PER_YEAR, TITLE_LEFT, TITLE_TOP)
+
+EMU_PER_PIXEL = 9525  # 96 dpi
+EMU_PER_POINT = 12700
+
+
+def _rgb(color_rgb):
+    return f"rgb({color_rgb[0]},{color_rgb[1]},{color_rgb[2]})"
+
+
+def iter_svg(layout, names, colors):
+    """
+    Génère le SVG de la roadmap morceau par morceau.
+
+    Le repère est exprimé en EMU (viewBox) pour reprendre la géométrie de la
+    mise en page sans conversion ; la taille affichée est celle de la slide à 96 dpi.
+
+    Args:
+        layout (RoadmapLayout): Géométrie des barres
+        names (sequence): Nom de chaque tâche, dans l'ordre de la mise en page
+        colors (list): Couleur [R, G, B] de chaque tâche
+
+    Yields:
+        str: Fragments du document SVG
+    """
+    width, height = layout.slide_width, layout.slide_height
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'width="{width // EMU_PER_PIXEL}" height="{height // EMU_PER_PIXEL}" '
+        'font-family="Calibri, Arial, sans-serif">\n'
+        f'<rect width="{width}" height="{height}" fill="#ffffff"/>\n'
+        f'<text x="{TITLE_LEFT}" y="{TITLE_TOP + 24 * EMU_PER_POINT}" '
+        f'font-size="{24 * EMU_PER_POINT}" font-weight="bold">ROADMAP</text>\n'
+    )
+
+    month_width = layout.grid_width / MONTHS_PER_YEAR
+    header = []
+    for index, month in enumerate(MONTH_LABELS):
+        x = GRID_MARGIN_LEFT + round(index * month_width)
+        header.append(
+            f'<rect x="{x}" y="{GRID_MARGIN_TOP}" width="{round(month_width)}" '
+            f'height="{HEADER_HEIGHT}" fill="#4f81bd" stroke="#ffffff"/>'
+            f'<text x="{x + round(month_width / 2)}" y="{GRID_MARGIN_TOP + HEADER_HEIGHT // 2}" '
+            f'font-size="{8 * EMU_PER_POINT}" fill="#ffffff" text-anchor="middle" '
+            f'dominant-baseline="middle">{month}</text>'
+        )
+    yield '<g class="months">' + ''.join(header) + '</g>\n'
+
+    for index in range(len(layout)):
+        x, y = int(layout.x[index]), int(layout.y[index])
+        bar_width, bar_height = int(layout.width[index]), int(layout.height[index])
+        yield (
+            f'<g class="task"><rect x="{x}" y="{y}" width="{bar_width}" height="{bar_height}" '
+            f'fill="{_rgb(colors[index])}"/>'
+            f'<text x="{x + bar_width // 2}" y="{y + bar_height // 2}" '
+            f'font-size="{10 * EMU_PER_POINT}" text-anchor="middle" dominant-baseline="middle">'
+            f'{escape(names[index])}</text></g>\n'
+        )
+
+    yield '</svg>\n'
+
+
+def iter_layout_json(layout, ids, names, colors, revision):
+    """
+    Génère la mise en page au format JSON morceau par morceau.
+
+    Args:
+        layout (RoadmapLayout): Géométrie des barres
+        ids (sequence): Identifiant de chaque tâche
+        names (sequence): Nom de chaque tâche
+        colors (list): Couleur [R, G, B] de chaque tâche
+        revision (int): Révision de la base ayant servi au calcul
+
+    Yields:
+        str: Fragments du document JSON
+    """
+    yield json.dumps({
+        'revision': revision,
+        'unit': 'emu',
+        'slide': {'width': layout.slide_width, 'height': layout.slide_height},
+        'months': MONTH_LABELS,
+    })[:-1] + ', "tasks": ['
+
+    for index, task_name in enumerate(names):
+        separator = ', ' if index else ''
+        yield separator + json.dumps({
+            'id': ids[index],
+            'task_name': task_name,
+            'color_rgb': colors[index],
+            'lane': int(layout.lanes[index]),
+            'x': int(layout.x[index]),
+            'y': int(layout.y[index]),
+            'width': int(layout.width[index]),
+            'height': int(layout.height[index]),
+        })
+
+    yield ']}'
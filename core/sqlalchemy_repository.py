@@ -0,0 +1,1014 @@
+"""
+Stockage des tâches sur un moteur SQLAlchemy (PostgreSQL, ou SQLite en local).
+
+Les nœuds API partagent une base serveur au lieu d'un fichier tasks.db local :
+les connexions viennent d'un pool, et la même logique d'écriture sert à la
+version synchrone (SQLAlchemyTaskRepository) et à la version asynchrone
+(AsyncSQLAlchemyTaskRepository, via AsyncConnection.run_sync).
+
+Le schéma et les règles sont ceux de task_database : upsert par nom,
+révision et journal en images complètes, instantanés et pile d'annulation.
+Les index spécialisés de SQLite (R*Tree, trigrammes, FTS5) n'existent pas
+ici : les noms approchés sont notés en Python sur les clés de
+rapprochement, et la recherche dans le journal compare (LIKE) un texte
+sans accents enregistré avec chaque changement.
+"""
+import json
+import re
+from datetime import datetime
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from sqlalchemy import (Boolean, Column, DateTime, Float, Index, Integer, MetaData, Table, Text, and_,
+                        bindparam, create_engine, delete, event, func, or_, select, tuple_, update)
+from sqlalchemy.dialects import postgresql, sqlite
+
+from core.repository import TaskRepository
+from core.task_values import (AUTO_MATCH_MARGIN, AUTO_MATCH_THRESHOLD, MATCH_THRESHOLD, STATE_COLUMNS, TASK_COLUMNS,
+                              UPSERT_COLUMNS, changed_fields, fold_accents, match_key, normalize_text, pack_color,
+                              rank_matches, select_match, task_values)
+from task_database import (BULK_CHUNK_SIZE, CHANGES_PAGE_SIZE, ITER_BATCH_SIZE, SEARCH_PAGE_SIZE, SNAPSHOT_INTERVAL,
+                           SNAPSHOT_RETENTION, SNIPPET_TOKENS)
+
+# Format texte des horodatages, comme CURRENT_TIMESTAMP de SQLite
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+metadata = MetaData()
+
+tasks = Table(
+    'tasks', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('task_name', Text, nullable=False, unique=True),
+    Column('name_key', Text, index=True),
+    Column('match_key', Text),
+    Column('start_month', Integer),
+    Column('start_position', Float),
+    Column('end_month', Integer),
+    Column('end_position', Float),
+    Column('color_rgb', Text),
+    Column('start_date', Text),
+    Column('end_date', Text),
+    Column('raw_prompt', Text),
+    Column('created_at', DateTime, server_default=func.current_timestamp()),
+    Column('updated_at', DateTime, server_default=func.current_timestamp()),
+)
+Index('idx_tasks_start_date', tasks.c.start_date, tasks.c.id)
+
+roadmap_meta = Table(
+    'roadmap_meta', metadata,
+    Column('key', Text, primary_key=True),
+    Column('value', Integer, nullable=False),
+)
+
+task_changes = Table(
+    'task_changes', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('revision', Integer, nullable=False, index=True),
+    Column('op', Text, nullable=False),
+    Column('task_id', Integer, nullable=False),
+    Column('task_name', Text),
+    Column('fields', Text),
+    Column('raw_prompt', Text),
+    Column('changed_at', DateTime, server_default=func.current_timestamp()),
+    # Images de la tâche après (state) et avant (previous) le changement
+    Column('state', Text),
+    Column('previous', Text),
+    # Nom et prompt en minuscules sans accents, comparés par search_changes
+    Column('search_text', Text),
+)
+
+task_snapshots = Table(
+    'task_snapshots', metadata,
+    Column('revision', Integer, primary_key=True, autoincrement=False),
+    Column('tasks', Text, nullable=False),
+    Column('created_at', DateTime, server_default=func.current_timestamp()),
+)
+
+# Opérations annulables : 'done' ou 'undone' (undone_at : révision de l'annulation)
+task_operations = Table(
+    'task_operations', metadata,
+    Column('revision', Integer, primary_key=True, autoincrement=False),
+    Column('status', Text, nullable=False, server_default='done'),
+    Column('undone_at', Integer),
+)
+Index('idx_task_operations_status', task_operations.c.status, task_operations.c.undone_at)
+
+# INSERT ... ON CONFLICT existe avec la même API pour ces deux dialectes
+DIALECT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+class _Statements:
+    def __init__(self, dialect_name):
+        """
+        Prépare les requêtes propres au dialecte du moteur.
+
+        Args:
+            dialect_name (str): Nom du dialecte SQLAlchemy ('postgresql' ou 'sqlite')
+        """
+        try:
+            insert = DIALECT_INSERTS[dialect_name]
+        except KeyError:
+            raise ValueError(f"Dialecte non pris en charge : {dialect_name}")
+
+        statement = insert(tasks)
+        updates = {column: func.coalesce(statement.excluded[column], tasks.c[column])
+                   for column in UPSERT_COLUMNS + ['raw_prompt']}
+        updates['updated_at'] = func.current_timestamp()
+        # Une tâche existante n'est modifiée que si un champ est fourni
+        self.upsert = statement.on_conflict_do_update(
+            index_elements=['task_name'],
+            set_=updates,
+            where=bindparam('has_updates', type_=Boolean)
+        )
+        self.init_revision = insert(roadmap_meta).values(key='revision', value=0).on_conflict_do_nothing()
+
+        # Remise d'une tâche dans l'état d'une image (undo, redo), par id
+        statement = insert(tasks)
+        self.restore = statement.on_conflict_do_update(
+            index_elements=['id'],
+            set_={column: statement.excluded[column]
+                  for column in STATE_COLUMNS[1:] + ('name_key', 'match_key')}
+        )
+
+        statement = insert(task_snapshots)
+        self.snapshot = statement.on_conflict_do_update(index_elements=['revision'],
+                                                        set_={'tasks': statement.excluded.tasks})
+        self.init_snapshot = statement.on_conflict_do_nothing()
+
+
+class _Settings(NamedTuple):
+    """Réglages des noms approchés et de l'historique (mêmes sens que pour TaskDatabase)."""
+    match_threshold: float = MATCH_THRESHOLD
+    auto_match_threshold: float = AUTO_MATCH_THRESHOLD
+    auto_match_margin: float = AUTO_MATCH_MARGIN
+    history_limit: Optional[int] = None
+    snapshot_retention: Optional[int] = SNAPSHOT_RETENTION
+
+
+def _format_timestamps(values):
+    for column in ('created_at', 'updated_at', 'changed_at'):
+        if isinstance(values.get(column), datetime):
+            values[column] = values[column].strftime(TIMESTAMP_FORMAT)
+    return values
+
+
+def _task_dict(row):
+    """Convertit une ligne de tasks au format de TaskDatabase (dates en texte, color_int)."""
+    task = _format_timestamps(dict(row._mapping))
+    task['color_int'] = pack_color(task['color_rgb'])
+    return task
+
+
+def _task_state(row):
+    """Image d'une tâche (STATE_COLUMNS), comme dans le journal de TaskDatabase."""
+    return _format_timestamps({column: row._mapping[column] for column in STATE_COLUMNS})
+
+
+def _task_states(conn, task_ids):
+    """Images des tâches existantes : {task_id: image}, sans entrée pour une tâche absente."""
+    task_ids = list(task_ids)
+    states = {}
+
+    for start in range(0, len(task_ids), BULK_CHUNK_SIZE):
+        chunk = task_ids[start:start + BULK_CHUNK_SIZE]
+        rows = conn.execute(select(*(tasks.c[column] for column in STATE_COLUMNS)).where(tasks.c.id.in_(chunk)))
+        states.update((row.id, _task_state(row)) for row in rows)
+
+    return states
+
+
+def _all_states(conn):
+    rows = conn.execute(select(*(tasks.c[column] for column in STATE_COLUMNS)).order_by(tasks.c.id))
+    return [_task_state(row) for row in rows]
+
+
+def _restore_values(state):
+    """Valeurs de colonnes d'une image : horodatages relus, clés recalculées à partir du nom."""
+    values = dict(state)
+    for column in ('created_at', 'updated_at'):
+        if isinstance(values[column], str):
+            values[column] = datetime.strptime(values[column], TIMESTAMP_FORMAT)
+    values.update(name_key=normalize_text(state['task_name']), match_key=match_key(state['task_name']))
+    return values
+
+
+def _dumps_state(state):
+    return json.dumps(state) if state is not None else None
+
+
+def _upsert_values(task_info, raw_prompt):
+    values = task_values(task_info)
+    values['raw_prompt'] = raw_prompt
+    values['has_updates'] = any(values[column] is not None for column in UPSERT_COLUMNS)
+    return values
+
+
+def _ids_by_name(conn, task_names):
+    rows = conn.execute(select(tasks.c.task_name, tasks.c.id).where(tasks.c.task_name.in_(task_names)))
+    return {task_name: task_id for task_name, task_id in rows}
+
+
+def _record_changes(conn, statements, settings, changes, previous=None, undoable=True):
+    """Une révision pour une opération : journal en images, pile d'annulation, instantané périodique."""
+    revision = _open_revision(conn, undoable)
+    _log_changes(conn, revision, changes, previous)
+    _close_revision(conn, statements, settings, revision)
+    return revision
+
+
+def _open_revision(conn, undoable=True):
+    revision = conn.execute(
+        update(roadmap_meta).where(roadmap_meta.c.key == 'revision')
+        .values(value=roadmap_meta.c.value + 1).returning(roadmap_meta.c.value)
+    ).scalar_one()
+
+    if undoable:
+        # Une nouvelle modification rend impossible le rétablissement des opérations annulées
+        conn.execute(delete(task_operations).where(task_operations.c.status == 'undone'))
+        conn.execute(task_operations.insert().values(revision=revision))
+
+    return revision
+
+
+def _log_changes(conn, revision, changes, previous=None):
+    previous = previous or {}
+    states = _task_states(conn, {task_id for _, task_id, _, _, _ in changes})
+
+    conn.execute(task_changes.insert(), [
+        {'revision': revision, 'op': op, 'task_id': task_id, 'task_name': task_name,
+         'fields': json.dumps(fields) if fields is not None else None, 'raw_prompt': raw_prompt,
+         'state': _dumps_state(states.get(task_id)), 'previous': _dumps_state(previous.get(task_id)),
+         'search_text': fold_accents(' '.join(text for text in (task_name, raw_prompt) if text))}
+        for op, task_id, task_name, fields, raw_prompt in changes
+    ])
+
+
+def _close_revision(conn, statements, settings, revision):
+    if revision % SNAPSHOT_INTERVAL == 0:
+        _take_snapshot(conn, statements, settings, revision)
+
+
+def _journal(conn, statements, settings, journal, change, previous):
+    """Journalise un changement, ou le garde pour la révision unique d'une opération composée."""
+    if journal is None:
+        _record_changes(conn, statements, settings, [change], previous)
+        return
+
+    journal['changes'].append(change)
+
+    # L'image d'avant est celle du début de l'opération composée
+    task_id = change[1]
+    if task_id not in journal['touched']:
+        journal['touched'].add(task_id)
+        if task_id in previous:
+            journal['previous'][task_id] = previous[task_id]
+
+
+def _take_snapshot(conn, statements, settings, revision):
+    conn.execute(statements.snapshot, {'revision': revision, 'tasks': json.dumps(_all_states(conn))})
+    if settings.history_limit is not None:
+        _compact_history(conn, settings.history_limit)
+    if settings.snapshot_retention is not None:
+        _prune_snapshots(conn, settings.snapshot_retention)
+
+
+def _prune_snapshots(conn, keep):
+    """Supprime les instantanés intermédiaires au-delà des keep plus récents ; le premier est conservé."""
+    first = select(func.min(task_snapshots.c.revision)).scalar_subquery()
+    recent = select(task_snapshots.c.revision).order_by(task_snapshots.c.revision.desc()).limit(keep)
+    conn.execute(delete(task_snapshots).where(task_snapshots.c.revision > first,
+                                              task_snapshots.c.revision.not_in(recent)))
+
+
+def _compact_history(conn, keep_revisions):
+    """Efface les images du journal jusqu'au dernier instantané antérieur aux keep_revisions dernières révisions."""
+    base = conn.execute(
+        select(func.max(task_snapshots.c.revision))
+        .where(task_snapshots.c.revision <= _revision(conn) - keep_revisions)
+    ).scalar()
+    if base is None:
+        return 0
+
+    compacted = conn.execute(
+        update(task_changes)
+        .where(task_changes.c.revision <= base,
+               or_(task_changes.c.state.is_not(None), task_changes.c.previous.is_not(None)))
+        .values(state=None, previous=None)
+    ).rowcount
+    conn.execute(delete(task_snapshots).where(task_snapshots.c.revision < base))
+    conn.execute(delete(task_operations).where(task_operations.c.revision <= base))
+    return compacted
+
+
+def _undo(conn, statements, settings):
+    target = conn.execute(
+        select(task_operations.c.revision).where(task_operations.c.status == 'done')
+        .order_by(task_operations.c.revision.desc()).limit(1)
+    ).scalar()
+    if target is None:
+        return None
+
+    # Les images d'avant sont réappliquées en ordre inverse de l'opération
+    images = conn.execute(
+        select(task_changes.c.task_id, task_changes.c.task_name, task_changes.c.previous)
+        .where(task_changes.c.revision == target).order_by(task_changes.c.id.desc())
+    ).all()
+    revision = _apply_images(conn, statements, settings, 'undo', images)
+
+    conn.execute(update(task_operations).where(task_operations.c.revision == target)
+                 .values(status='undone', undone_at=revision))
+    return {'revision': revision, 'target': target}
+
+
+def _redo(conn, statements, settings):
+    target = conn.execute(
+        select(task_operations.c.revision).where(task_operations.c.status == 'undone')
+        .order_by(task_operations.c.undone_at.desc()).limit(1)
+    ).scalar()
+    if target is None:
+        return None
+
+    images = conn.execute(
+        select(task_changes.c.task_id, task_changes.c.task_name, task_changes.c.state)
+        .where(task_changes.c.revision == target).order_by(task_changes.c.id)
+    ).all()
+    revision = _apply_images(conn, statements, settings, 'redo', images)
+
+    conn.execute(update(task_operations).where(task_operations.c.revision == target)
+                 .values(status='done', undone_at=None))
+    return {'revision': revision, 'target': target}
+
+
+def _apply_images(conn, statements, settings, op, images):
+    """Remet des tâches dans l'état de leurs images (None : tâche absente) ; retourne la révision produite."""
+    touched = dict.fromkeys((task_id, task_name) for task_id, task_name, _ in images)
+    previous = _task_states(conn, {task_id for task_id, _ in touched})
+
+    for task_id, _, image in images:
+        if image is None:
+            conn.execute(delete(tasks).where(tasks.c.id == task_id))
+        else:
+            conn.execute(statements.restore, _restore_values(json.loads(image)))
+
+    return _record_changes(conn, statements, settings,
+                           [(op, task_id, task_name, None, None) for task_id, task_name in touched],
+                           previous, undoable=False)
+
+
+def _tasks_at(conn, revision):
+    snapshot = conn.execute(
+        select(task_snapshots.c.revision, task_snapshots.c.tasks)
+        .where(task_snapshots.c.revision <= revision)
+        .order_by(task_snapshots.c.revision.desc()).limit(1)
+    ).first()
+    if snapshot is None:
+        raise ValueError(f"Révision {revision} antérieure à l'historique conservé")
+
+    states = {task['id']: task for task in json.loads(snapshot.tasks)}
+
+    rows = conn.execute(
+        select(task_changes.c.task_id, task_changes.c.state)
+        .where(task_changes.c.revision > snapshot.revision, task_changes.c.revision <= revision)
+        .order_by(task_changes.c.revision, task_changes.c.id)
+    )
+    for task_id, state in rows:
+        if state is None:
+            states.pop(task_id, None)
+        else:
+            states[task_id] = json.loads(state)
+
+    for task in states.values():
+        task['color_int'] = pack_color(task['color_rgb'])
+
+    # Même ordre que list_tasks : tâches sans date de début en premier
+    return sorted(states.values(), key=lambda task: (task['start_date'] is not None,
+                                                     task['start_date'] or '', task['id']))
+
+
+def _revision(conn):
+    return conn.execute(select(roadmap_meta.c.value).where(roadmap_meta.c.key == 'revision')).scalar_one()
+
+
+CHANGE_COLUMNS = (task_changes.c.revision, task_changes.c.op, task_changes.c.task_id, task_changes.c.task_name,
+                  task_changes.c.fields, task_changes.c.raw_prompt, task_changes.c.changed_at)
+
+
+def _change_dict(row):
+    change = _format_timestamps(dict(row._mapping))
+    change['fields'] = json.loads(change['fields']) if change['fields'] else None
+    return change
+
+
+def _changes_since(conn, revision, limit):
+    rows = conn.execute(
+        select(*CHANGE_COLUMNS).where(task_changes.c.revision > revision)
+        .order_by(task_changes.c.revision, task_changes.c.id).limit(limit)
+    )
+    return [_change_dict(row) for row in rows]
+
+
+def _search_changes(conn, words, limit, offset):
+    rows = conn.execute(
+        select(*CHANGE_COLUMNS)
+        .where(*(task_changes.c.search_text.contains(word, autoescape=True) for word in words))
+        .order_by(task_changes.c.revision.desc(), task_changes.c.id.desc()).limit(limit).offset(offset)
+    )
+
+    results = []
+    for row in rows:
+        result = _change_dict(row)
+        result['snippet'], result['score'] = _snippet(result, words)
+        results.append(result)
+    return results
+
+
+def _search_words(query):
+    """Mots d'une recherche libre, en minuscules et sans accents (comme search_text)."""
+    return [fold_accents(word) for word in re.findall(r'\w+', query or '')]
+
+
+def _snippet(change, words):
+    """
+    Extrait du prompt (à défaut du nom) autour du premier mot trouvé, mots
+    trouvés entre <mark>, et nombre de mots trouvés (score).
+    """
+    for text in (change['raw_prompt'], change['task_name']):
+        tokens = list(re.finditer(r'\w+', text or ''))
+        found = {index for index, token in enumerate(tokens)
+                 if any(word in fold_accents(token.group()) for word in words)}
+        if found:
+            break
+    else:
+        return '', 0
+
+    first = max(min(found) - SNIPPET_TOKENS // 2, 0)
+    shown = range(first, min(first + SNIPPET_TOKENS, len(tokens)))
+
+    parts = ['…' if first > 0 else '']
+    position = tokens[first].start()
+    for index in shown:
+        token = tokens[index]
+        parts.append(text[position:token.start()])
+        parts.append(f'<mark>{token.group()}</mark>' if index in found else token.group())
+        position = token.end()
+    parts.append('…' if shown.stop < len(tokens) else '')
+
+    return ''.join(parts), len(found)
+
+
+def _resolve(conn, candidate, threshold, limit=None):
+    key = match_key(candidate)
+    if not key:
+        return []
+
+    # Sans index trigramme, toutes les clés de rapprochement sont notées
+    rows = conn.execute(select(tasks.c.id, tasks.c.task_name, tasks.c.match_key))
+    return rank_matches(key, rows, threshold)[:limit]
+
+
+def _resolve_target(conn, settings, task_name):
+    matches = _resolve(conn, task_name, settings.match_threshold)
+    return select_match(task_name, matches, settings.auto_match_threshold, settings.auto_match_margin)
+
+
+def _insert_task(conn, statements, settings, task_info):
+    values = task_values(task_info)
+    task_id = conn.execute(tasks.insert().values(**values).returning(tasks.c.id)).scalar_one()
+    _record_changes(conn, statements, settings,
+                    [('insert', task_id, values['task_name'], changed_fields(values), None)])
+    return task_id
+
+
+def _apply_actions(conn, statements, settings, actions, raw_prompt):
+    journal = {'changes': [], 'previous': {}, 'touched': set()}
+    results = []
+
+    for task_info in actions:
+        if task_info.get('type') in ('create', 'update'):
+            results.append(_upsert_task(conn, statements, settings, task_info, raw_prompt, journal))
+        elif task_info.get('type') == 'delete':
+            name_key = normalize_text(task_info.get('task_name') or '')
+            results.append(bool(name_key) and _delete_task(conn, statements, settings, name_key, raw_prompt, journal))
+        else:
+            raise ValueError(f"Type d'action inconnu : {task_info.get('type')}")
+
+    if journal['changes']:
+        _record_changes(conn, statements, settings, journal['changes'], journal['previous'])
+    return results
+
+
+def _update_task(conn, statements, settings, task_id, task_info, raw_prompt):
+    previous = _task_states(conn, [task_id])
+    if not previous:
+        return None
+
+    values = task_values(task_info)
+    updates = {column: values[column] for column in UPSERT_COLUMNS if values[column] is not None}
+    fields = changed_fields(values)
+    if task_info.get('task_name'):
+        updates.update(task_name=values['task_name'], name_key=values['name_key'], match_key=values['match_key'])
+        fields['task_name'] = values['task_name']
+
+    if updates:
+        if raw_prompt is not None:
+            updates['raw_prompt'] = raw_prompt
+        conn.execute(update(tasks).where(tasks.c.id == task_id)
+                     .values(**updates, updated_at=func.current_timestamp()))
+        task_name = updates.get('task_name', previous[task_id]['task_name'])
+        _record_changes(conn, statements, settings, [('update', task_id, task_name, fields, raw_prompt)], previous)
+
+    return _get_task(conn, task_id)
+
+
+def _upsert_task(conn, statements, settings, task_info, raw_prompt, journal=None):
+    values = _upsert_values(task_info, raw_prompt)
+    existing_ids = list(_ids_by_name(conn, [values['task_name']]).values())
+
+    # Une mise à jour vise une tâche existante : accepter un nom approché sans ambiguïté
+    if not existing_ids and task_info.get('type') == 'update':
+        match = _resolve_target(conn, settings, values['task_name'])
+        if match:
+            values.update(task_name=match['task_name'], name_key=match['task_name'],
+                          match_key=match_key(match['task_name']))
+            existing_ids = [match['id']]
+
+    previous = _task_states(conn, existing_ids)
+    task_id = conn.execute(statements.upsert.returning(tasks.c.id), values).scalar()
+    if task_id is None:
+        # Aucune mise à jour n'est nécessaire
+        return _ids_by_name(conn, [values['task_name']])[values['task_name']]
+
+    _journal(conn, statements, settings, journal, ('update' if existing_ids else 'insert', task_id,
+                                                   values['task_name'], changed_fields(values), raw_prompt), previous)
+    return task_id
+
+
+def _bulk_upsert(conn, statements, settings, task_stream, raw_prompt, chunk_size):
+    counts = {'imported': 0, 'created': 0, 'updated': 0}
+    revision = None
+
+    while True:
+        chunk = list(islice(task_stream, chunk_size))
+        if not chunk:
+            break
+
+        rows = [_upsert_values(task_info, task_info.get('raw_prompt', raw_prompt)) for task_info in chunk]
+        names = list({values['task_name'] for values in rows})
+        existing = _ids_by_name(conn, names)
+        # Images d'avant le paquet : annuler l'import rejoue les paquets à l'envers
+        previous = _task_states(conn, existing.values())
+
+        conn.execute(statements.upsert, rows)
+
+        ids = _ids_by_name(conn, names)
+        seen = set(existing)
+        changes = []
+        for values in rows:
+            conflict = values['task_name'] in seen
+            seen.add(values['task_name'])
+            counts['updated' if conflict else 'created'] += 1
+
+            if values['has_updates'] or not conflict:
+                changes.append(('update' if conflict else 'insert', ids[values['task_name']], values['task_name'],
+                                changed_fields(values), values['raw_prompt']))
+        counts['imported'] += len(rows)
+
+        # Journal écrit par paquet, sous la révision unique de l'import
+        if changes:
+            if revision is None:
+                revision = _open_revision(conn)
+            _log_changes(conn, revision, changes, previous)
+
+    if revision is not None:
+        _close_revision(conn, statements, settings, revision)
+    return counts
+
+
+def _delete_task(conn, statements, settings, name_key, raw_prompt, journal=None):
+    row = conn.execute(
+        select(tasks.c.id, tasks.c.task_name).where(tasks.c.name_key == name_key).order_by(tasks.c.id).limit(1)
+    ).first()
+    # À défaut, un nom approché sans ambiguïté
+    match = {'id': row.id, 'task_name': row.task_name} if row else _resolve_target(conn, settings, name_key)
+    if match is None:
+        return False
+
+    previous = _task_states(conn, [match['id']])
+    conn.execute(delete(tasks).where(tasks.c.id == match['id']))
+    _journal(conn, statements, settings, journal, ('delete', match['id'], match['task_name'], None, raw_prompt),
+             previous)
+    return True
+
+
+def _delete_task_by_id(conn, statements, settings, task_id, raw_prompt):
+    previous = _task_states(conn, [task_id])
+    if not previous:
+        return False
+
+    conn.execute(delete(tasks).where(tasks.c.id == task_id))
+    _record_changes(conn, statements, settings,
+                    [('delete', task_id, previous[task_id]['task_name'], None, raw_prompt)], previous)
+    return True
+
+
+def _delete_tasks(conn, statements, settings, name_keys):
+    task_ids = conn.execute(select(tasks.c.id).where(tasks.c.name_key.in_(name_keys))).scalars().all()
+    previous = _task_states(conn, task_ids)
+    if previous:
+        conn.execute(delete(tasks).where(tasks.c.id.in_(list(previous))))
+        _record_changes(conn, statements, settings,
+                        [('delete', task_id, state['task_name'], None, None) for task_id, state in previous.items()],
+                        previous)
+    return len(previous)
+
+
+def _get_task(conn, task_id):
+    row = conn.execute(select(tasks).where(tasks.c.id == task_id)).first()
+    return _task_dict(row) if row else None
+
+
+def _get_task_by_name(conn, task_name):
+    row = conn.execute(select(tasks).where(tasks.c.task_name == normalize_text(task_name))).first()
+    return _task_dict(row) if row else None
+
+
+def _task_page(conn, since, limit):
+    query = select(tasks).order_by(tasks.c.start_date.asc().nulls_first(), tasks.c.id).limit(limit)
+
+    if since is not None:
+        start_date, task_id = since
+        if start_date is not None:
+            query = query.where(tuple_(tasks.c.start_date, tasks.c.id) > tuple_(start_date, task_id))
+        else:
+            # Les tâches sans date (triées en premier) se parcourent par id
+            query = query.where(or_(and_(tasks.c.start_date.is_(None), tasks.c.id > task_id),
+                                    tasks.c.start_date.is_not(None)))
+
+    return [_task_dict(row) for row in conn.execute(query)]
+
+
+def _task_rows_query(columns, window):
+    """
+    Requête de iter_task_rows, et positions des colonnes color_int à calculer.
+
+    color_int est calculée côté Python à partir de color_rgb (_pack_row).
+    """
+    unknown = set(columns) - TASK_COLUMNS
+    if unknown:
+        raise ValueError(f"Colonnes inconnues : {sorted(unknown)}")
+
+    selected = [tasks.c.color_rgb if column == 'color_int' else tasks.c[column] for column in columns]
+    packed = [index for index, column in enumerate(columns) if column == 'color_int']
+
+    query = select(*selected).order_by(tasks.c.start_date.asc().nulls_first(), tasks.c.id)
+    if window is not None:
+        query = query.where(_window_condition(*window))
+    return query, packed
+
+
+def _pack_row(row, packed):
+    row = list(row)
+    for index in packed:
+        row[index] = pack_color(row[index])
+    return tuple(row)
+
+
+def _tasks_overlapping(conn, start, end):
+    query = (select(tasks).where(_window_condition(start, end))
+             .order_by(tasks.c.start_date.asc().nulls_first(), tasks.c.id))
+    return [_task_dict(row) for row in conn.execute(query)]
+
+
+def _name_keys(task_names):
+    return {normalize_text(task_name) for task_name in task_names if task_name} - {''}
+
+
+def _window_condition(start, end):
+    """Chevauchement de période, comparé sur les dates textuelles AAAA/MM/JJ."""
+    start_date = func.replace(tasks.c.start_date, '-', '/')
+    end_date = func.replace(tasks.c.end_date, '-', '/')
+    conditions = [tasks.c.start_date.is_not(None), tasks.c.end_date.is_not(None)]
+    if start is not None:
+        conditions.append(end_date >= start.replace('-', '/'))
+    if end is not None:
+        conditions.append(start_date <= end.replace('-', '/'))
+    return and_(*conditions)
+
+
+def _create_schema(conn, statements):
+    """Crée le schéma ; le premier instantané fait commencer l'historique à la révision courante."""
+    metadata.create_all(conn)
+    conn.execute(statements.init_revision)
+    if conn.execute(select(task_snapshots.c.revision).limit(1)).first() is None:
+        conn.execute(statements.init_snapshot, {'revision': _revision(conn), 'tasks': json.dumps(_all_states(conn))})
+
+
+class SQLAlchemyTaskRepository(TaskRepository):
+    def __init__(self, url, match_threshold=MATCH_THRESHOLD, auto_match_threshold=AUTO_MATCH_THRESHOLD,
+                 auto_match_margin=AUTO_MATCH_MARGIN, history_limit=None, snapshot_retention=SNAPSHOT_RETENTION,
+                 **engine_options):
+        """
+        Ouvre le moteur SQLAlchemy et crée le schéma s'il n'existe pas.
+
+        Args:
+            url (str): URL de la base (ex. postgresql+psycopg://..., sqlite:///tasks.db)
+            match_threshold, auto_match_threshold, auto_match_margin,
+            history_limit, snapshot_retention: Voir TaskDatabase
+            **engine_options: Options de create_engine (pool_size, max_overflow...)
+        """
+        self.engine = create_engine(url, pool_pre_ping=True, **engine_options)
+        _configure_sqlite(self.engine)
+        self._statements = _Statements(self.engine.dialect.name)
+        self._settings = _Settings(match_threshold, auto_match_threshold, auto_match_margin,
+                                   history_limit, snapshot_retention)
+
+        with self.engine.begin() as conn:
+            _create_schema(conn, self._statements)
+
+    def close(self):
+        self.engine.dispose()
+
+    def revision(self):
+        with self.engine.connect() as conn:
+            return _revision(conn)
+
+    def changes_since(self, revision, limit=CHANGES_PAGE_SIZE):
+        with self.engine.connect() as conn:
+            return _changes_since(conn, revision, limit)
+
+    def search_changes(self, query, limit=SEARCH_PAGE_SIZE, offset=0):
+        """
+        Recherche dans le journal des changements (noms de tâches et prompts).
+
+        Tous les mots doivent apparaître, accents et casse ignorés ; les
+        résultats sont classés du plus récent au plus ancien (pas de score
+        bm25 sans FTS5), avec un extrait et le nombre de mots trouvés.
+        """
+        words = _search_words(query)
+        if not words:
+            return []
+
+        with self.engine.connect() as conn:
+            return _search_changes(conn, words, limit, offset)
+
+    def insert_task(self, task_info):
+        with self.engine.begin() as conn:
+            return _insert_task(conn, self._statements, self._settings, task_info)
+
+    def upsert_task(self, task_info, raw_prompt=None):
+        with self.engine.begin() as conn:
+            return _upsert_task(conn, self._statements, self._settings, task_info, raw_prompt)
+
+    def update_task(self, task_id, task_info, raw_prompt=None):
+        with self.engine.begin() as conn:
+            return _update_task(conn, self._statements, self._settings, task_id, task_info, raw_prompt)
+
+    def apply_actions(self, actions, raw_prompt=None):
+        with self.engine.begin() as conn:
+            return _apply_actions(conn, self._statements, self._settings, list(actions), raw_prompt)
+
+    def bulk_upsert(self, tasks, raw_prompt=None, chunk_size=BULK_CHUNK_SIZE):
+        with self.engine.begin() as conn:
+            return _bulk_upsert(conn, self._statements, self._settings, iter(tasks), raw_prompt, chunk_size)
+
+    def delete_task(self, task_info, raw_prompt=None):
+        name_key = normalize_text(task_info.get('task_name') or '')
+        if not name_key:
+            return False
+
+        with self.engine.begin() as conn:
+            return _delete_task(conn, self._statements, self._settings, name_key, raw_prompt)
+
+    def delete_task_by_id(self, task_id, raw_prompt=None):
+        with self.engine.begin() as conn:
+            return _delete_task_by_id(conn, self._statements, self._settings, task_id, raw_prompt)
+
+    def delete_tasks(self, task_names):
+        name_keys = _name_keys(task_names)
+        if not name_keys:
+            return 0
+
+        with self.engine.begin() as conn:
+            return _delete_tasks(conn, self._statements, self._settings, name_keys)
+
+    def undo(self):
+        with self.engine.begin() as conn:
+            return _undo(conn, self._statements, self._settings)
+
+    def redo(self):
+        with self.engine.begin() as conn:
+            return _redo(conn, self._statements, self._settings)
+
+    def tasks_at(self, revision):
+        with self.engine.connect() as conn:
+            return _tasks_at(conn, revision)
+
+    def resolve_task_name(self, candidate, threshold=None, limit=5):
+        threshold = self._settings.match_threshold if threshold is None else threshold
+
+        with self.engine.connect() as conn:
+            return _resolve(conn, candidate, threshold, limit)
+
+    def get_task(self, task_id):
+        with self.engine.connect() as conn:
+            return _get_task(conn, task_id)
+
+    def get_task_by_name(self, task_name):
+        with self.engine.connect() as conn:
+            return _get_task_by_name(conn, task_name)
+
+    def iter_tasks(self, since=None, batch=ITER_BATCH_SIZE):
+        while True:
+            with self.engine.connect() as conn:
+                rows = _task_page(conn, since, batch)
+            yield from rows
+
+            if len(rows) < batch:
+                return
+            since = (rows[-1]['start_date'], rows[-1]['id'])
+
+    def iter_task_rows(self, columns, window=None):
+        query, packed = _task_rows_query(columns, window)
+
+        with self.engine.connect() as conn:
+            result = conn.execution_options(yield_per=ITER_BATCH_SIZE).execute(query)
+            for row in result:
+                yield _pack_row(row, packed)
+
+    def tasks_overlapping(self, start=None, end=None):
+        with self.engine.connect() as conn:
+            return _tasks_overlapping(conn, start, end)
+
+
+class AsyncSQLAlchemyTaskRepository:
+    def __init__(self, engine, statements, settings):
+        """
+        Version asynchrone du stockage SQLAlchemy (à créer avec open()).
+
+        Chaque opération emprunte une connexion au pool du moteur asynchrone
+        et exécute la même logique que la version synchrone (run_sync).
+        Les méthodes sont celles de TaskRepository en coroutines, et les
+        parcours (iter_tasks, iter_task_rows) des générateurs asynchrones.
+        """
+        self.engine = engine
+        self._statements = statements
+        self._settings = settings
+
+    @classmethod
+    async def open(cls, url, match_threshold=MATCH_THRESHOLD, auto_match_threshold=AUTO_MATCH_THRESHOLD,
+                   auto_match_margin=AUTO_MATCH_MARGIN, history_limit=None, snapshot_retention=SNAPSHOT_RETENTION,
+                   **engine_options):
+        """
+        Ouvre le moteur asynchrone et crée le schéma s'il n'existe pas.
+
+        Args:
+            url (str): URL asynchrone (ex. postgresql+asyncpg://..., sqlite+aiosqlite:///tasks.db)
+            match_threshold, auto_match_threshold, auto_match_margin,
+            history_limit, snapshot_retention: Voir TaskDatabase
+            **engine_options: Options de create_async_engine (pool_size, max_overflow...)
+
+        Returns:
+            AsyncSQLAlchemyTaskRepository: Stockage prêt à l'emploi
+        """
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        engine = create_async_engine(url, pool_pre_ping=True, **engine_options)
+        _configure_sqlite(engine.sync_engine)
+        statements = _Statements(engine.dialect.name)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(_create_schema, statements)
+
+        return cls(engine, statements, _Settings(match_threshold, auto_match_threshold, auto_match_margin,
+                                                 history_limit, snapshot_retention))
+
+    async def close(self):
+        await self.engine.dispose()
+
+    async def revision(self):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_revision)
+
+    async def changes_since(self, revision, limit=CHANGES_PAGE_SIZE):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_changes_since, revision, limit)
+
+    async def search_changes(self, query, limit=SEARCH_PAGE_SIZE, offset=0):
+        words = _search_words(query)
+        if not words:
+            return []
+
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_search_changes, words, limit, offset)
+
+    async def insert_task(self, task_info):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_insert_task, self._statements, self._settings, task_info)
+
+    async def upsert_task(self, task_info, raw_prompt=None):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_upsert_task, self._statements, self._settings, task_info, raw_prompt)
+
+    async def update_task(self, task_id, task_info, raw_prompt=None):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_update_task, self._statements, self._settings, task_id, task_info,
+                                       raw_prompt)
+
+    async def apply_actions(self, actions, raw_prompt=None):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_apply_actions, self._statements, self._settings, list(actions), raw_prompt)
+
+    async def bulk_upsert(self, tasks, raw_prompt=None, chunk_size=BULK_CHUNK_SIZE):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_bulk_upsert, self._statements, self._settings, iter(tasks), raw_prompt,
+                                       chunk_size)
+
+    async def delete_task(self, task_info, raw_prompt=None):
+        name_key = normalize_text(task_info.get('task_name') or '')
+        if not name_key:
+            return False
+
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_delete_task, self._statements, self._settings, name_key, raw_prompt)
+
+    async def delete_task_by_id(self, task_id, raw_prompt=None):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_delete_task_by_id, self._statements, self._settings, task_id, raw_prompt)
+
+    async def delete_tasks(self, task_names):
+        name_keys = _name_keys(task_names)
+        if not name_keys:
+            return 0
+
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_delete_tasks, self._statements, self._settings, name_keys)
+
+    async def undo(self):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_undo, self._statements, self._settings)
+
+    async def redo(self):
+        async with self.engine.begin() as conn:
+            return await conn.run_sync(_redo, self._statements, self._settings)
+
+    async def tasks_at(self, revision):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_tasks_at, revision)
+
+    async def resolve_task_name(self, candidate, threshold=None, limit=5):
+        threshold = self._settings.match_threshold if threshold is None else threshold
+
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_resolve, candidate, threshold, limit)
+
+    async def get_task(self, task_id):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_get_task, task_id)
+
+    async def get_task_by_name(self, task_name):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_get_task_by_name, task_name)
+
+    async def iter_tasks(self, since=None, batch=ITER_BATCH_SIZE):
+        while True:
+            async with self.engine.connect() as conn:
+                rows = await conn.run_sync(_task_page, since, batch)
+            for row in rows:
+                yield row
+
+            if len(rows) < batch:
+                return
+            since = (rows[-1]['start_date'], rows[-1]['id'])
+
+    async def iter_task_rows(self, columns, window=None):
+        query, packed = _task_rows_query(columns, window)
+
+        async with self.engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=ITER_BATCH_SIZE))
+            async for row in result:
+                yield _pack_row(row, packed)
+
+    async def list_tasks(self, limit=None):
+        tasks = []
+        async for task in self.iter_tasks():
+            if limit is not None and len(tasks) >= limit:
+                break
+            tasks.append(task)
+        return tasks
+
+    async def tasks_overlapping(self, start=None, end=None):
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(_tasks_overlapping, start, end)
+
+
+def _configure_sqlite(engine):
+    """Réglages de connexion de TaskDatabase (WAL, attente de verrou) quand le moteur est SQLite."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute('PRAGMA busy_timeout = 5000')
+        cursor.close()
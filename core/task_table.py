@@ -0,0 +1,133 @@
+"""
+Modèle de tâches en mémoire, compact et typé.
+
+Task est un enregistrement à __slots__ dont la couleur est un entier RGB sur
+24 bits. TaskTable garde un instantané complet de la base sous forme de
+colonnes NumPy en lecture seule, partagé entre l'API, la mise en page et le
+rendu : aucune allocation de dict ni décodage JSON par tâche.
+"""
+import numpy as np
+
+from core.layout import assign_lanes, month_bounds
+
+
+def unpack_rgb(color):
+    """Convertit un entier 0xRRGGBB en [R, G, B]."""
+    return [(color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF]
+
+
+class Task:
+    __slots__ = ('id', 'task_name', 'start_month', 'start_position',
+                 'end_month', 'end_position', 'color', 'start_date', 'end_date')
+
+    def __init__(self, id, task_name, start_month=None, start_position=None,
+                 end_month=None, end_position=None, color=None, start_date=None, end_date=None):
+        self.id = id
+        self.task_name = task_name
+        self.start_month = start_month
+        self.start_position = start_position
+        self.end_month = end_month
+        self.end_position = end_position
+        self.color = color
+        self.start_date = start_date
+        self.end_date = end_date
+
+    @property
+    def color_rgb(self):
+        return unpack_rgb(self.color) if self.color is not None else None
+
+    def __repr__(self):
+        return f"Task(id={self.id!r}, task_name={self.task_name!r})"
+
+
+class TaskTable:
+    # Colonnes lues en base, dans l'ordre attendu par from_rows
+    COLUMNS = ('id', 'task_name', 'start_month', 'start_position', 'end_month',
+               'end_position', 'color_int', 'start_date', 'end_date')
+
+    def __init__(self, ids, names, start_month, start_position, end_month, end_position,
+                 colors, start_dates, end_dates, revision=0, default_color=0x0000FF, lane_ends=None):
+        """
+        Initialise un instantané colonnaire des tâches.
+
+        Args:
+            ids: Identifiants des tâches
+            names (list): Noms des tâches
+            start_month, start_position, end_month, end_position: Bornes
+                (None autorisé, remplacé par les défauts de la mise en page)
+            colors: Couleurs 0xRRGGBB (None pour la couleur par défaut)
+            start_dates, end_dates (list): Dates textuelles
+            revision (int): Révision de la base de l'instantané
+            default_color (int): Couleur des tâches sans couleur
+            lane_ends (list, optional): État de répartition en lignes à
+                poursuivre (instantané partiel, page d'une pagination)
+        """
+        self.revision = revision
+        self.ids = _frozen(np.asarray(ids, dtype=np.int64))
+        self.names = tuple(names)
+        self.start_month = _frozen(np.asarray(start_month, dtype=np.float64))
+        self.start_position = _frozen(np.asarray(start_position, dtype=np.float64))
+        self.end_month = _frozen(np.asarray(end_month, dtype=np.float64))
+        self.end_position = _frozen(np.asarray(end_position, dtype=np.float64))
+        self.colors = _frozen(np.array([default_color if color is None else color for color in colors],
+                                       dtype=np.uint32))
+        self.start_dates = tuple(start_dates)
+        self.end_dates = tuple(end_dates)
+
+        starts, ends = month_bounds(*self.columns())
+        self.starts = _frozen(starts)
+        self.ends = _frozen(ends)
+        lanes, self.lane_ends = assign_lanes(starts, ends, lane_ends)
+        self.lanes = _frozen(lanes)
+
+    @classmethod
+    def from_rows(cls, rows, revision=0, **kwargs):
+        """
+        Construit l'instantané à partir de tuples ordonnés selon COLUMNS.
+
+        Args:
+            rows (iterable): Lignes (tuples) lues en base
+            revision (int): Révision de la base des lignes
+
+        Returns:
+            TaskTable: Instantané des tâches
+        """
+        columns = list(zip(*rows)) or [()] * len(cls.COLUMNS)
+        return cls(*columns, revision=revision, **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        return Task(
+            int(self.ids[index]),
+            self.names[index],
+            _optional(self.start_month[index], int),
+            _optional(self.start_position[index]),
+            _optional(self.end_month[index], int),
+            _optional(self.end_position[index]),
+            int(self.colors[index]),
+            self.start_dates[index],
+            self.end_dates[index],
+        )
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def columns(self):
+        """Retourne (start_month, start_position, end_month, end_position) pour la mise en page."""
+        return self.start_month, self.start_position, self.end_month, self.end_position
+
+    def colors_rgb(self):
+        """Retourne les couleurs décodées, une liste [R, G, B] par tâche."""
+        rgb = np.stack([(self.colors >> 16) & 0xFF, (self.colors >> 8) & 0xFF, self.colors & 0xFF], axis=1)
+        return rgb.tolist()
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+def _optional(value, cast=float):
+    return None if np.isnan(value) else cast(value)
@@ -0,0 +1,216 @@
+"""
+Normalisation des noms et conversion des tâches en valeurs de colonnes.
+
+Règles communes aux deux stockages (task_database sur sqlite3,
+core.sqlalchemy_repository sur SQLAlchemy) : un même nom donne la même
+clé, la même clé de rapprochement et les mêmes valeurs écrites, quel que
+soit le stockage.
+"""
+import json
+import re
+import unicodedata
+
+MATCH_THRESHOLD = 0.6  # similarité (Dice sur trigrammes) minimale d'un nom proposé comme candidat
+AUTO_MATCH_THRESHOLD = 0.9  # similarité minimale pour qu'une mise à jour ou suppression vise un nom approché
+AUTO_MATCH_MARGIN = 0.15  # avance minimale du meilleur candidat sur le deuxième pour l'appliquer
+
+# Mots ignorés pour rapprocher les noms ("Projet P1" et "P1" désignent la même tâche)
+NAME_STOPWORDS = {'projet', 'project', 'tache', 'task', 'le', 'la', 'les', 'l', 'de', 'du', 'des', 'd', 'the'}
+
+
+def normalize_text(text):
+    """
+    Normalise le texte en supprimant les caractères spéciaux et en uniformisant les espaces.
+    
+    Les espaces sont uniformisés après la suppression de la ponctuation
+    ("Alpha - Beta" donne "alpha beta") : normaliser un texte déjà
+    normalisé ne le change pas, ce qui permet de comparer une saisie aux
+    noms et clés stockés.
+    
+    Args:
+        text (str): Texte à normaliser
+    
+    Returns:
+        str: Texte normalisé
+    """
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)  # Supprimer la ponctuation
+    text = re.sub(r'\s+', ' ', text)  # Remplacer les espaces multiples par un seul
+    return text.strip()
+
+def fold_accents(text):
+    """Texte en minuscules et sans accents ("Créer" donne "creer")."""
+    folded = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in folded if not unicodedata.combining(char)).lower()
+
+def match_key(text):
+    """
+    Calcule la clé de rapprochement d'un nom : normalisé, sans accents ni mots vides.
+    
+    Args:
+        text (str): Nom de tâche
+    
+    Returns:
+        str: Clé comparée par l'index trigramme
+    """
+    folded = normalize_text(fold_accents(text))
+    words = [word for word in folded.split() if word not in NAME_STOPWORDS]
+    # Un nom composé uniquement de mots vides reste comparable à lui-même
+    return ' '.join(words) or folded
+
+def trigrams(key):
+    """Trigrammes d'une clé bordée d'espaces, pour que les noms courts ("p1") en aient."""
+    padded = f' {key} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+def name_similarity(left, right):
+    """
+    Similarité de Dice entre les trigrammes de deux clés de rapprochement.
+    
+    Des nombres différents ("phase 1" et "phase 2") désignent des tâches
+    distinctes : la similarité est alors nulle.
+    """
+    if re.findall(r'\d+', left) != re.findall(r'\d+', right):
+        return 0.0
+    
+    left_trigrams, right_trigrams = trigrams(left), trigrams(right)
+    return 2 * len(left_trigrams & right_trigrams) / (len(left_trigrams) + len(right_trigrams))
+
+
+class AmbiguousTaskName(LookupError):
+    def __init__(self, task_name, candidates):
+        """
+        Aucune tâche ne porte ce nom et aucun nom approché n'est assez sûr pour être modifié.
+        
+        Args:
+            task_name (str): Nom demandé
+            candidates (list): Noms proches ({id, task_name, score}), du plus
+                proche au moins proche
+        """
+        names = ', '.join(f"'{candidate['task_name']}'" for candidate in candidates)
+        super().__init__(f"Aucune tâche '{task_name}' ; noms proches : {names}")
+        self.task_name = task_name
+        self.candidates = candidates
+
+def rank_matches(key, rows, threshold):
+    """
+    Note des tâches candidates par similarité avec une clé de rapprochement.
+    
+    Args:
+        key (str): Clé de rapprochement du nom cherché
+        rows (iterable): Tuples (id, task_name, match_key) des candidats
+        threshold (float): Similarité minimale
+    
+    Returns:
+        list: Dicts {id, task_name, score}, du plus proche au moins proche
+    """
+    matches = []
+    for task_id, task_name, task_key in rows:
+        score = name_similarity(key, task_key or '')
+        if score >= threshold:
+            matches.append({'id': task_id, 'task_name': task_name, 'score': score})
+    
+    matches.sort(key=lambda match: -match['score'])
+    return matches
+
+def select_match(task_name, matches, auto_match_threshold, auto_match_margin):
+    """
+    Choisit la tâche visée par une mise à jour ou une suppression au nom inexact.
+    
+    Un nom approché n'est retenu que s'il est très proche et nettement
+    devant le deuxième candidat : "migration erp" ne doit pas modifier
+    "migration crm", ni "refonte site web" "refonte site mobile".
+    
+    Args:
+        task_name (str): Nom demandé
+        matches (list): Candidats classés par rank_matches
+        auto_match_threshold (float): Similarité minimale du candidat retenu
+        auto_match_margin (float): Avance minimale sur le deuxième candidat
+    
+    Returns:
+        dict or None: Candidat retenu, ou None si aucun nom n'est proche
+    
+    Raises:
+        AmbiguousTaskName: Si des noms sont proches sans qu'aucun soit
+            assez sûr ; rien n'est modifié
+    """
+    if not matches:
+        return None
+    
+    runner_up = matches[1]['score'] if len(matches) > 1 else 0.0
+    if matches[0]['score'] >= auto_match_threshold and matches[0]['score'] - runner_up >= auto_match_margin:
+        return matches[0]
+    
+    raise AmbiguousTaskName(task_name, matches[:5])
+
+
+# Colonnes lisibles de la table tasks
+TASK_COLUMNS = {'id', 'task_name', 'name_key', 'match_key', 'start_month', 'start_position', 'end_month',
+                'end_position', 'color_rgb', 'color_int', 'start_date', 'end_date',
+                'raw_prompt', 'created_at', 'updated_at'}
+
+# Colonnes conservées dans l'image d'une tâche (journal et instantanés) ;
+# name_key, match_key et color_int se recalculent à partir de celles-ci
+STATE_COLUMNS = ('id', 'task_name', 'start_month', 'start_position', 'end_month', 'end_position',
+                 'color_rgb', 'start_date', 'end_date', 'raw_prompt', 'created_at', 'updated_at')
+
+# Colonnes mises à jour par upsert_task lorsqu'une valeur non nulle est fournie
+UPSERT_COLUMNS = ['start_month', 'start_position', 'end_month', 'end_position',
+                  'color_rgb', 'start_date', 'end_date']
+
+
+def task_values(task_info):
+    """
+    Convertit les informations d'une tâche parsée en valeurs de colonnes.
+    
+    Args:
+        task_info (dict): Informations de la tâche parsées
+    
+    Returns:
+        dict: Valeurs nommées des colonnes de la table tasks
+    """
+    start_month = task_info.get('start_month') or [None, None]
+    end_month = task_info.get('end_month') or [None, None]
+    
+    # Convertir color_rgb en chaîne JSON si nécessaire
+    color_rgb = (json.dumps(task_info['color_rgb']) 
+                 if task_info.get('color_rgb') is not None 
+                 else None)
+    
+    task_name = normalize_text(task_info.get('task_name') or 'Unnamed Task')
+    
+    return {
+        'task_name': task_name,
+        'name_key': task_name,
+        'match_key': match_key(task_name),
+        'start_month': start_month[0],
+        'start_position': start_month[1],
+        'end_month': end_month[0],
+        'end_position': end_month[1],
+        'color_rgb': color_rgb,
+        'start_date': task_info.get('start_date'),
+        'end_date': task_info.get('end_date')
+    }
+
+def changed_fields(values):
+    """
+    Extrait les champs renseignés d'une écriture, pour le journal des changements.
+    
+    Args:
+        values (dict): Valeurs de colonnes produites par task_values
+    
+    Returns:
+        dict: Champs non nuls, couleur décodée en [R, G, B]
+    """
+    fields = {column: values[column] for column in UPSERT_COLUMNS if values[column] is not None}
+    if 'color_rgb' in fields:
+        fields['color_rgb'] = json.loads(fields['color_rgb'])
+    return fields
+
+
+def pack_color(color_rgb):
+    """Couleur 0xRRGGBB d'une couleur JSON '[R, G, B]' (comme la colonne color_int)."""
+    if not color_rgb:
+        return None
+    red, green, blue = json.loads(color_rgb)
+    return (red << 16) | (green << 8) | blue
@@ -0,0 +1,134 @@
+"""
+Vignettes PNG de la roadmap, dessinées avec Pillow à partir de la mise en page.
+
+Les vignettes sont mises en cache sur disque par (révision, taille) avec une
+éviction LRU, pour que les aperçus (Slack, Teams...) ne coûtent qu'une lecture
+de fichier tant que la base n'a pas changé.
+"""
+import io
+import os
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFont
+
+from core.layout import GRID_MARGIN_LEFT, GRID_MARGIN_TOP, HEADER_HEIGHT, MONTH_LABELS, MONTHS_PER_YEAR
+
+HEADER_COLOR = (79, 129, 189)
+GRID_COLOR = (222, 226, 230)
+
+# En dessous de cette largeur, les libellés seraient illisibles
+MIN_LABEL_WIDTH = 320
+
+
+def render_thumbnail(layout, names, colors, width, height):
+    """
+    Dessine la grille des mois et les barres de tâches dans une image PNG.
+
+    Args:
+        layout (RoadmapLayout): Géométrie des barres
+        names (sequence): Nom de chaque tâche, dans l'ordre de la mise en page
+        colors (list): Couleur [R, G, B] de chaque tâche
+        width (int): Largeur de l'image en pixels
+        height (int): Hauteur de l'image en pixels
+
+    Returns:
+        bytes: Image encodée en PNG
+    """
+    scale_x = width / layout.slide_width
+    scale_y = height / layout.slide_height
+
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default() if width >= MIN_LABEL_WIDTH else None
+
+    month_width = layout.grid_width / MONTHS_PER_YEAR
+    header_top = GRID_MARGIN_TOP * scale_y
+    header_bottom = (GRID_MARGIN_TOP + HEADER_HEIGHT) * scale_y
+
+    for index, month in enumerate(MONTH_LABELS):
+        left = (GRID_MARGIN_LEFT + index * month_width) * scale_x
+        right = (GRID_MARGIN_LEFT + (index + 1) * month_width) * scale_x
+        draw.line([(left, header_bottom), (left, height)], fill=GRID_COLOR)
+        draw.rectangle([left, header_top, right, header_bottom], fill=HEADER_COLOR, outline='white')
+        if font:
+            draw.text(((left + right) / 2, (header_top + header_bottom) / 2), month,
+                      fill='white', font=font, anchor='mm')
+
+    for index in range(len(layout)):
+        left = layout.x[index] * scale_x
+        top = layout.y[index] * scale_y
+        right = (layout.x[index] + layout.width[index]) * scale_x
+        bottom = (layout.y[index] + layout.height[index]) * scale_y
+        draw.rectangle([left, top, right, bottom], fill=tuple(colors[index]))
+        if font:
+            draw.text(((left + right) / 2, (top + bottom) / 2), names[index],
+                      fill='black', font=font, anchor='mm')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class ThumbnailCache:
+    def __init__(self, directory, max_entries=64):
+        """
+        Initialise le cache disque des vignettes.
+
+        Args:
+            directory (str): Dossier de stockage des vignettes
+            max_entries (int): Nombre maximum de vignettes conservées
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, revision, width, height):
+        return os.path.join(self.directory, f"roadmap-{revision}-{width}x{height}.png")
+
+    def get(self, revision, width, height):
+        """
+        Retourne le chemin de la vignette en cache, ou None.
+
+        Un accès rafraîchit la date de modification du fichier, qui sert
+        d'horodatage LRU pour l'éviction.
+        """
+        path = self.path_for(revision, width, height)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, revision, width, height, data):
+        """
+        Enregistre une vignette puis évince les moins récemment utilisées.
+
+        Returns:
+            str: Chemin de la vignette enregistrée
+        """
+        path = self.path_for(revision, width, height)
+
+        # Écriture atomique : un lecteur concurrent ne voit jamais un PNG tronqué
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+        self._evict()
+        return path
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.png'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
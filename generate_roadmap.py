@@ -1,11 +1,13 @@
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, send_file
 from flask_cors import CORS
 import socket
+import threading
 import json
+import sqlite3
 from dotenv import load_dotenv
-from task_database import TaskDatabase
+from task_database import AmbiguousTaskName, TaskDatabase
 from pptx import Presentation
-from pptx.util import Inches, Pt
+from pptx.util import Inches, Pt, Emu
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN
 from pptx.enum.shapes import MSO_CONNECTOR
@@ -20,11 +22,26 @@ import base64
 import imghdr
 from PIL import Image
 import re
+import csv
+import io
+import atexit
+import tempfile
 from datetime import datetime
+from itertools import islice
 import pptx
 from pptx.enum.shapes import MSO_AUTO_SHAPE_TYPE
 from pptx.enum.shapes import MSO_SHAPE
 from flask_restx import Api, Resource, fields
+import numpy as np
+from core.layout import SLIDE_WIDTH, SLIDE_HEIGHT, MONTH_LABELS, compute_layout, to_percent
+from core.roadmap_export import iter_layout_json, iter_svg
+from core.thumbnail import ThumbnailCache, render_thumbnail
+from core.task_table import TaskTable
+from core.revision_cache import RevisionCache
+from core.change_feed import ChangeFeed
+from core.micro_batch import MicroBatcher
+from core.llm_response import find_json_value, is_parsed_actions, validate_parsed_actions
+from core.admission import INTERACTIVE, PRIORITIES, Abandoned, AdmissionController, Overloaded, socket_closed
 
 # Charger les variables d'environnement du fichier .env
 load_dotenv()
@@ -42,8 +59,33 @@ app.config['EXPLAIN_TEMPLATE_LOADING'] = True  # Affiche les détails du chargem
 
 CORS(app)
 
-# Initialisation de la base de données
-task_db = TaskDatabase('tasks.db')
+# Initialisation de la base de données : SQLite local par défaut, ou base
+# serveur partagée (PostgreSQL...) via SQLAlchemy si TASKS_DATABASE_URL est défini
+# Réglages communs aux deux stockages
+task_db_settings = dict(
+    match_threshold=float(os.getenv('TASK_MATCH_THRESHOLD', '0.6')),
+    # Un nom approché n'est modifié ou supprimé qu'au-dessus de ce seuil, sans rival proche
+    auto_match_threshold=float(os.getenv('TASK_AUTO_MATCH_THRESHOLD', '0.9')),
+    # Révisions d'historique conservées (undo, reconstruction) ; tout l'historique si vide
+    history_limit=int(os.getenv('HISTORY_KEEP_REVISIONS')) if os.getenv('HISTORY_KEEP_REVISIONS') else None,
+    # Instantanés récents conservés (le premier l'est toujours)
+    snapshot_retention=int(os.getenv('SNAPSHOT_RETENTION', '10'))
+)
+
+if os.getenv('TASKS_DATABASE_URL'):
+    from sqlalchemy.exc import IntegrityError
+    from core.sqlalchemy_repository import SQLAlchemyTaskRepository
+    task_db = SQLAlchemyTaskRepository(
+        os.getenv('TASKS_DATABASE_URL'),
+        pool_size=int(os.getenv('TASKS_DATABASE_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('TASKS_DATABASE_MAX_OVERFLOW', '10')),
+        **task_db_settings
+    )
+    # Erreurs d'intégrité (nom déjà pris...) selon le stockage
+    STORAGE_CONFLICTS = (sqlite3.IntegrityError, IntegrityError)
+else:
+    STORAGE_CONFLICTS = (sqlite3.IntegrityError,)
+    task_db = TaskDatabase('tasks.db', **task_db_settings)
 
 # Configuration Ollama
 ollama_config = {
@@ -54,6 +96,35 @@ ollama_config = {
 # Client Ollama
 ollama_client = ollama.Client(ollama_config['host'])
 
+# Admission des appels au LLM : appels simultanés et file d'attente bornés,
+# refus immédiat (429) au-delà plutôt qu'une attente jusqu'au timeout du client ;
+# les demandes de fond (X-Priority: batch) n'utilisent que la capacité
+# laissée libre par les demandes interactives, partagée équitablement par appelant
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '2'))
+
+# Prompts regroupés au maximum dans un même appel au LLM (1 : pas de regroupement)
+LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', '1'))
+LLM_BATCH_WINDOW = float(os.getenv('LLM_BATCH_WINDOW_MS', '5')) / 1000
+
+llm_admission = AdmissionController(
+    # En regroupant, chacun des LLM_MAX_IN_FLIGHT appels sert jusqu'à LLM_BATCH_SIZE prompts
+    max_in_flight=LLM_MAX_IN_FLIGHT * LLM_BATCH_SIZE,
+    max_queue=int(os.getenv('LLM_MAX_QUEUE', '16')),
+    batch_max_in_flight=int(os.getenv('LLM_BATCH_MAX_IN_FLIGHT')) if os.getenv('LLM_BATCH_MAX_IN_FLIGHT') else None
+)
+
+# Cache disque des vignettes PNG
+thumbnail_cache = ThumbnailCache(
+    os.getenv('THUMBNAIL_DIR', os.path.join('generated', 'thumbnails')),
+    max_entries=int(os.getenv('THUMBNAIL_CACHE_SIZE', '64'))
+)
+THUMBNAIL_DEFAULT_WIDTH = 480
+THUMBNAIL_MAX_WIDTH = 1920
+
+# Couleur appliquée aux tâches sans couleur
+DEFAULT_COLOR_RGB = [0, 0, 255]
+DEFAULT_COLOR_INT = 0x0000FF
+
 # Définition de la fonction de conversion de couleur
 def convert_color_to_rgb(color):
     color_map = {
@@ -69,14 +140,10 @@ def convert_color_to_rgb(color):
         'noir': [0, 0, 0],
         'blanc': [255, 255, 255]
     }
-    return color_map.get(color.lower(), [0, 0, 255])  # Bleu par défaut
+    return color_map.get(color.lower(), DEFAULT_COLOR_RGB)  # Bleu par défaut
 
-# Définition de la fonction d'analyse du prompt
-def parse_project_prompt(client, prompt, config):
-    try:
-        model = config.get('model', 'mervinpraison/llama3.2-3B-instruct-test-2:8b')
-        
-        system_prompt = """
+# Prompt système de l'analyse des prompts de projet
+PROJECT_PARSER_PROMPT = """
         Tu es un assistant spécialisé dans l'analyse de prompts de projet.
         Tu dois identifier si le prompt est une création, une mise à jour ou une suppression de projet
 
@@ -201,12 +268,54 @@ def parse_project_prompt(client, prompt, config):
             "end_month": null,
             "color_rgb": null
         }
+
+        PROMPTS À PLUSIEURS ACTIONS :
+        Si le prompt demande plusieurs actions, réponds avec un tableau JSON
+        contenant un objet par action, dans l'ordre du prompt. Un prompt à une
+        seule action reste un objet JSON seul.
+
+        Prompt: "crée 'P1' du 1er mars au 30 juin en vert et supprime 'P2'"
+        Réponse: [
+            {
+                "type": "create",
+                "task_name": "P1",
+                "start_date": "2025/03/01",
+                "end_date": "2025/06/30",
+                "start_month": [2, 0.0],
+                "end_month": [5, 1.0],
+                "color_rgb": [0, 255, 0]
+            },
+            {
+                "type": "delete",
+                "task_name": "P2",
+                "start_date": null,
+                "end_date": null,
+                "start_month": null,
+                "end_month": null,
+                "color_rgb": null
+            }
+        ]
+        """
+
+# Consigne ajoutée au prompt système pour analyser plusieurs prompts en un seul appel
+BATCH_PARSER_PROMPT = """
+        TRAITEMENT PAR LOT :
+        Le message utilisateur est un tableau JSON de prompts indépendants.
+        Analyse chaque prompt séparément avec les règles ci-dessus.
+        Réponds UNIQUEMENT avec un tableau JSON contenant une réponse par prompt,
+        dans le même ordre et avec exactement le même nombre d'éléments.
+        La réponse d'un prompt à plusieurs actions est elle-même un tableau.
         """
+
+# Définition de la fonction d'analyse du prompt
+def parse_project_prompt(client, prompt, config):
+    try:
+        model = config.get('model', 'mervinpraison/llama3.2-3B-instruct-test-2:8b')
         
         response = client.chat(
             model=model,
             messages=[
-                {'role': 'system', 'content': system_prompt},
+                {'role': 'system', 'content': PROJECT_PARSER_PROMPT},
                 {'role': 'user', 'content': prompt}
             ]
         )
@@ -214,83 +323,86 @@ def parse_project_prompt(client, prompt, config):
         result = response['message']['content'].strip()
 
         try:
-            start_index = result.find('{')
-            end_index = result.rfind('}') + 1
-            
-            if start_index != -1 and end_index != -1:
-                result = result[start_index:end_index]
-            
-            parsed_res = json.loads(result)
-            
-            required_keys = ['type', 'task_name']
-            if not all(key in parsed_res for key in required_keys):
-                raise ValueError("JSON incomplet")
-            
-            if parsed_res['type'] == 'update':
-                parsed_res = {k: v for k, v in parsed_res.items() if v is not None}
-                                        
-            return parsed_res
+            # Objet seul ou tableau d'actions, éventuellement entouré de texte
+            return validate_parsed_actions(find_json_value(result, is_parsed_actions))
         
-        except json.JSONDecodeError as e:
-            print(f"Erreur de décodage JSON : {e}")
-            print(f"Contenu problématique : {result}")
-            return None
         except ValueError as e:
             print(f"Erreur de validation JSON : {e}")
+            print(f"Contenu problématique : {result}")
             return None
     
     except Exception as e:
         print(f"Erreur lors de l'analyse du prompt : {e}")
         return None
 
-# Définition de la fonction de création de tâche sur la roadmap
-def create_task_on_roadmap(prs, task_info):
-    task_name = task_info['task_name']
+# Définition de la fonction d'analyse d'un lot de prompts en un seul appel
+# Retourne une réponse par prompt, None pour un élément invalide (à rejouer seul)
+def parse_project_prompts(client, prompts, config):
+    model = config.get('model', 'mervinpraison/llama3.2-3B-instruct-test-2:8b')
     
-    start_month = task_info['start_month'][0] if isinstance(task_info['start_month'], (list, tuple)) else task_info['start_month']
-    start_pos = task_info['start_month'][1] if isinstance(task_info['start_month'], (list, tuple)) else task_info['start_month']
+    response = client.chat(
+        model=model,
+        messages=[
+            {'role': 'system', 'content': PROJECT_PARSER_PROMPT + BATCH_PARSER_PROMPT},
+            {'role': 'user', 'content': json.dumps(prompts, ensure_ascii=False)}
+        ]
+    )
     
-    end_month = task_info['end_month'][0] if isinstance(task_info['end_month'], (list, tuple)) else task_info['end_month']
-    end_pos = task_info['end_month'][1] if isinstance(task_info['end_month'], (list, tuple)) else task_info['end_month']
+    result = response['message']['content'].strip()
     
-    start_month = 0 if start_month is None else start_month
-    end_month = 11 if end_month is None else end_month
+    try:
+        parsed = find_json_value(result, lambda value: isinstance(value, list) and len(value) == len(prompts))
+    except ValueError:
+        print(f"Lot invalide : {len(prompts)} réponses attendues")
+        return [None] * len(prompts)
     
-    start_pos = 0.5 if start_pos is None else start_pos
-    end_pos = 1.0 if end_pos is None else end_pos
+    results = []
+    for element in parsed:
+        try:
+            results.append(validate_parsed_actions(element))
+        except ValueError as e:
+            print(f"Erreur de validation JSON : {e}")
+            results.append(None)
     
-    color_rgb = task_info['color_rgb']         # Couleur RGB
+    return results
 
-    roadmap_slide = prs.slides[0]  # Première slide (roadmap)
-
-    slide_width = prs.slide_width
-    slide_height = prs.slide_height
-
-    grid_margin_top = Inches(1.5)  # Marge en haut
-    grid_margin_bottom = Inches(0.5)  # Marge en bas
-    grid_margin_left = Inches(0.5)  # Marge à gauche
-    grid_margin_right = Inches(0.5)  # Marge à droite
+# Définition de la fonction de configuration du modèle d'analyse des prompts
+def prompt_parser_config():
+    return {
+        'host': os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
+        'model': os.getenv('OLLAMA_MODEL', 'mervinpraison/llama3.2-3B-instruct-test-2:8b')
+    }
 
-    grid_height = slide_height - grid_margin_top - grid_margin_bottom
-    grid_width = slide_width - grid_margin_left - grid_margin_right
+# Définition des fonctions d'analyse utilisées par le regroupement des prompts
+def parse_prompt_batch(prompts):
+    config = prompt_parser_config()
+    return parse_project_prompts(ollama.Client(config['host']), prompts, config)
 
-    month_width = grid_width / 12
+def parse_single_prompt(prompt):
+    config = prompt_parser_config()
+    return parse_project_prompt(ollama.Client(config['host']), prompt, config)
 
-    start_x = grid_margin_left + (start_month * month_width) + (start_pos * month_width)
-    end_x = grid_margin_left + (end_month * month_width) + (end_pos * month_width)
+# Regroupement des prompts concurrents : le prompt système n'est évalué
+# qu'une fois par lot, au lieu d'une fois par prompt
+prompt_batcher = MicroBatcher(
+    parse_prompt_batch, parse_single_prompt,
+    max_batch=LLM_BATCH_SIZE, window=LLM_BATCH_WINDOW, max_concurrent=LLM_MAX_IN_FLIGHT
+) if LLM_BATCH_SIZE > 1 else None
 
-    task_height = Inches(0.5)
-    
-    existing_shapes = [shape for shape in roadmap_slide.shapes if shape.has_text_frame]
-    
-    task_y = grid_margin_top + Inches(0.5) + (len(existing_shapes) * Inches(0.6))
+# Définition de la fonction de mise en page de l'ensemble des tâches
+def layout_tasks(table, slide_width=SLIDE_WIDTH, slide_height=SLIDE_HEIGHT):
+    # Une ligne par tâche ; la ligne 0 reste occupée par le titre "ROADMAP"
+    lanes = np.arange(1, len(table) + 1)
+    return compute_layout(*table.columns(), lanes, slide_width, slide_height)
 
-    task_shape = roadmap_slide.shapes.add_shape(
+# Définition de la fonction d'ajout d'une barre de tâche sur la slide
+def add_task_shape(slide, task_name, color_rgb, x, y, width, height):
+    task_shape = slide.shapes.add_shape(
         MSO_AUTO_SHAPE_TYPE.RECTANGLE, 
-        start_x, 
-        task_y, 
-        end_x - start_x, 
-        task_height
+        Emu(int(x)), 
+        Emu(int(y)), 
+        Emu(int(width)), 
+        Emu(int(height))
     )
 
     task_shape.fill.solid()
@@ -303,6 +415,44 @@ def create_task_on_roadmap(prs, task_info):
     text_frame.paragraphs[0].font.color.rgb = RGBColor(0, 0, 0)  # Texte en noir
     text_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
 
+# Définition de la fonction de création de tâche sur la roadmap
+def create_task_on_roadmap(prs, task_info):
+    task_name = task_info['task_name']
+    
+    start_month = task_info['start_month'][0] if isinstance(task_info['start_month'], (list, tuple)) else task_info['start_month']
+    start_pos = task_info['start_month'][1] if isinstance(task_info['start_month'], (list, tuple)) else task_info['start_month']
+    
+    end_month = task_info['end_month'][0] if isinstance(task_info['end_month'], (list, tuple)) else task_info['end_month']
+    end_pos = task_info['end_month'][1] if isinstance(task_info['end_month'], (list, tuple)) else task_info['end_month']
+    
+    color_rgb = task_info['color_rgb'] or DEFAULT_COLOR_RGB  # Couleur RGB
+
+    roadmap_slide = prs.slides[0]  # Première slide (roadmap)
+
+    existing_shapes = [shape for shape in roadmap_slide.shapes if shape.has_text_frame]
+
+    layout = compute_layout(
+        [start_month], [start_pos], [end_month], [end_pos], [len(existing_shapes)],
+        prs.slide_width, prs.slide_height
+    )
+
+    add_task_shape(roadmap_slide, task_name, color_rgb,
+                   layout.x[0], layout.y[0], layout.width[0], layout.height[0])
+
+# Définition de la fonction de rendu de toutes les tâches de la base
+def render_roadmap(prs, table):
+    slide = create_roadmap_slide(prs)
+    layout = layout_tasks(table, prs.slide_width, prs.slide_height)
+
+    colors = table.colors_rgb()
+
+    for index, task_name in enumerate(table.names):
+        add_task_shape(slide, task_name, colors[index],
+                       layout.x[index], layout.y[index],
+                       layout.width[index], layout.height[index])
+
+    return slide
+
 # Définition de la fonction de création de slide de roadmap
 def create_roadmap_slide(prs, task_info=None):
     if len(prs.slides) > 0:
@@ -339,9 +489,7 @@ def create_roadmap_slide(prs, task_info=None):
             Inches(0.5)  # Hauteur
         ).table
         
-        months = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
-        
-        for i, month in enumerate(months):
+        for i, month in enumerate(MONTH_LABELS):
             cell = months_box.cell(0, i)
             cell.text = month
             cell.text_frame.paragraphs[0].font.size = Pt(8)
@@ -436,60 +584,54 @@ def list_powerpoint_objects(file_path):
     return [normalize_text(obj['text']) for obj in objects_list if obj['type'] == 'texte']
 
 # Définition de la fonction de traitement de ligne de prompt
-def process_prompt_line(prompt_line):
-    templates_dir = "templates"
-    output_dir = "generated"
-    
-    os.makedirs(templates_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-    
-    template_path = os.path.join(templates_dir, "roadmap.pptx")
-    output_path = os.path.join(output_dir, "roadmap.pptx")
-    
-    config = {
-        'host': os.getenv('OLLAMA_HOST', 'http://localhost:11434'),
-        'model': os.getenv('OLLAMA_MODEL', 'mervinpraison/llama3.2-3B-instruct-test-2:8b')
-    }
+def process_prompt_line(prompt_line, is_abandoned=None, caller=None, priority=INTERACTIVE):
+    config = prompt_parser_config()
     client = ollama.Client(config['host'])
     
     print(f"\n--- Traitement du prompt : {prompt_line} ---")
     
     try:
-        task_info = parse_project_prompt(client, prompt_line, config)
-        
-        if task_info and task_info.get('type') in ['create', 'update']:
-            task_id = task_db.upsert_task(task_info, raw_prompt=prompt_line)
-            print(f"Tâche créée ou mise à jour avec l'ID : {task_info}")
-        elif task_info and task_info.get('type') == 'delete':
-            task_db.delete_task(task_info, raw_prompt=prompt_line)
-            print(f"Tâche supprimée : {task_info.get('task_name')}")
-        
-        if os.path.exists(template_path):
-            prs = Presentation(template_path)
-        else:
-            prs = Presentation()
-            prs.save(template_path)
-        
-        all_tasks = task_db.list_tasks()
-        
-        while len(prs.slides) > 0:
-            prs.slides._sldIdLst.remove(prs.slides._sldIdLst[0])
+        # La place d'exécution n'est réservée que pour l'appel au LLM
+        with llm_admission.admit(is_abandoned, caller, priority):
+            if prompt_batcher is not None:
+                actions = prompt_batcher.submit(prompt_line)
+            else:
+                actions = parse_project_prompt(client, prompt_line, config)
         
-        for task in all_tasks:
-            task_info = convert_db_task_to_task_info(task)
-            
-            create_roadmap_slide(prs, task_info)
+        if actions:
+            # Toutes les actions du prompt dans une seule transaction : une
+            # révision, annulable d'un bloc, et rien d'appliqué si l'une échoue
+            task_db.apply_actions(actions, raw_prompt=prompt_line)
+            for task_info in actions:
+                print(f"Action appliquée ({task_info.get('type')}) : {task_info.get('task_name')}")
         
-        prs.save(output_path)
-        print(f"Présentation mise à jour : {output_path}")
+        # Un seul rendu par prompt, quel que soit le nombre d'actions
+        update_presentation()
         
-        return task_info
+        return actions
     
+    except (Overloaded, Abandoned, AmbiguousTaskName):
+        raise
     except Exception as e:
         print(f"Erreur lors du traitement du prompt '{prompt_line}' : {e}")
         traceback.print_exc()
         return None
 
+# Définition de la fonction de détection de déconnexion du client d'une requête
+def client_disconnected(environ):
+    # Socket fourni par le serveur de développement Werkzeug ; inconnu ailleurs
+    sock = environ.get('werkzeug.socket')
+    return lambda: socket_closed(sock)
+
+# Définition de la fonction d'identification de l'appelant et de la priorité d'une requête
+def llm_request_class(body):
+    # Part équitable par clé d'API, à défaut par roadmap, à défaut par adresse
+    caller = request.headers.get('X-API-Key') or body.get('roadmap') or request.remote_addr
+    priority = request.headers.get('X-Priority', INTERACTIVE).lower()
+    if priority not in PRIORITIES:
+        raise ValueError(f"X-Priority doit valoir {' ou '.join(PRIORITIES)}")
+    return caller, priority
+
 # Définition de la fonction de traitement de prompt
 def process_prompt(body):
     try:
@@ -497,14 +639,21 @@ def process_prompt(body):
         if not prompt:
             return {'error': 'Prompt manquant'}, 400
         
-        task_info = process_prompt_line(prompt)
-        
-        update_presentation()
+        actions = process_prompt_line(prompt)
         
-        return task_info, 200
+        return actions, 200
+    except Overloaded as e:
+        return {'error': str(e)}, 429, {'Retry-After': str(e.retry_after)}
+    except AmbiguousTaskName as e:
+        return {'error': str(e), 'candidates': e.candidates}, 409
     except Exception as e:
         return {'error': str(e)}, 500
 
+# Un seul rendu de la présentation à la fois (prompts, éditions structurées
+# via le rendu différé, imports...) : deux écritures du même .pptx ne
+# s'entrelacent jamais
+presentation_lock = threading.Lock()
+
 # Définition de la fonction de mise à jour de la présentation
 def update_presentation():
     templates_dir = "templates"
@@ -513,24 +662,107 @@ def update_presentation():
     template_path = os.path.join(templates_dir, "roadmap.pptx")
     output_path = os.path.join(output_dir, "roadmap.pptx")
     
-    if os.path.exists(template_path):
-        prs = Presentation(template_path)
-    else:
-        prs = Presentation()
-        prs.save(template_path)
+    with presentation_lock:
+        # Ce rendu inclut les éditions qui attendaient le rendu différé
+        cancel_presentation_update()
+        
+        # Chaque chemin de rendu (prompt, édition structurée, import, undo,
+        # minuteur ou arrêt) peut être le premier sur une copie neuve
+        os.makedirs(templates_dir, exist_ok=True)
+        os.makedirs(output_dir, exist_ok=True)
+        
+        if os.path.exists(template_path):
+            prs = Presentation(template_path)
+        else:
+            prs = Presentation()
+            prs.save(template_path)
+        
+        while len(prs.slides) > 0:
+            prs.slides._sldIdLst.remove(prs.slides._sldIdLst[0])
+        
+        render_roadmap(prs, current_task_table())
+        
+        # Écriture dans un fichier temporaire puis remplacement : un lecteur
+        # ne voit jamais une présentation à moitié écrite
+        temporary_path = f"{output_path}.tmp"
+        prs.save(temporary_path)
+        os.replace(temporary_path, output_path)
+        print(f"Présentation mise à jour : {output_path}")
     
-    all_tasks = task_db.list_tasks()
+    # Les clients du flux SSE voient l'écriture sans attendre la surveillance
+    change_feed.notify()
+
+# Valeurs dérivées de la base (instantané colonnaire des tâches, exports),
+# invalidées dès qu'un processus valide une écriture : plusieurs workers
+# peuvent servir le même tasks.db sans jamais renvoyer une roadmap périmée
+roadmap_cache = RevisionCache(task_db.revision)
+
+# Flux des changements poussés aux navigateurs (/api/tasks/stream)
+change_feed = ChangeFeed(roadmap_cache.revision, poll_interval=float(os.getenv('TASKS_STREAM_POLL', '0.25')))
+STREAM_HEARTBEAT = 15.0  # secondes entre deux commentaires keep-alive
+
+# Définition de la fonction d'accès à l'instantané courant des tâches
+def current_task_table():
+    # Instantané partagé en lecture seule par l'API, la mise en page et le rendu
+    return roadmap_cache.get_or_build('table', lambda revision: TaskTable.from_rows(
+        task_db.iter_task_rows(TaskTable.COLUMNS), revision, default_color=DEFAULT_COLOR_INT
+    ))
+
+INVALID_WINDOW_ERROR = 'Période invalide (dates attendues au format AAAA-MM-JJ)'
+
+# Définition de la fonction de lecture de la période demandée (?from=&to=)
+def requested_window():
+    bounds = []
+    for name in ('from', 'to'):
+        value = request.args.get(name)
+        if value:
+            # Lève ValueError si la date n'est ni AAAA-MM-JJ ni AAAA/MM/JJ
+            value = datetime.strptime(value.replace('/', '-'), '%Y-%m-%d').strftime('%Y-%m-%d')
+        bounds.append(value or None)
     
-    while len(prs.slides) > 0:
-        prs.slides._sldIdLst.remove(prs.slides._sldIdLst[0])
+    return tuple(bounds) if any(bounds) else None
+
+# Définition de la fonction de suffixe d'ETag propre à une période
+def window_tag(window):
+    return f"-{window[0] or ''}..{window[1] or ''}" if window else ''
+
+# Définition de la fonction d'accès aux tâches d'une période (toutes si window est None)
+def roadmap_table(window=None):
+    if window is None:
+        return current_task_table()
     
-    for task in all_tasks:
-        task_info = convert_db_task_to_task_info(task)
-        
-        create_roadmap_slide(prs, task_info)
+    # Une période ne lit que les tâches trouvées par l'index R*Tree : pas de cache
+    return TaskTable.from_rows(task_db.iter_task_rows(TaskTable.COLUMNS, window=window),
+                               task_db.revision(), default_color=DEFAULT_COLOR_INT)
+
+# Définition de la fonction de comparaison d'un ETag avec l'en-tête If-None-Match
+def client_has_etag(etag):
+    # En-tête analysé en liste d'ETags : comparaison faible (W/"..." accepté)
+    # et '*', comme le demande la RFC 7232 pour If-None-Match
+    return request.if_none_match.contains_weak(etag.strip('"'))
+
+# Définition de la fonction de diffusion d'un export mis en cache par révision
+def stream_export(export_format, mimetype, render, window=None):
+    revision = roadmap_cache.revision()
+    etag = f'"{export_format}-{revision}{window_tag(window)}"'
+    
+    if client_has_etag(etag):
+        return Response(status=304, headers={'ETag': etag})
     
-    prs.save(output_path)
-    print(f"Présentation mise à jour : {output_path}")
+    cached = roadmap_cache.get(('export', export_format), revision) if window is None else None
+    if cached is not None:
+        body = iter(cached)
+    else:
+        def generate():
+            chunks = []
+            for chunk in render(revision):
+                chunks.append(chunk)
+                yield chunk
+            if window is None:
+                roadmap_cache.put(('export', export_format), revision, chunks)
+        body = generate()
+    
+    return Response(body, mimetype=mimetype, headers={'ETag': etag, 'Cache-Control': 'no-cache'})
 
 # Fonction pour trouver un port libre
 def find_free_port():
@@ -564,6 +796,7 @@ class ProcessPrompt(Resource):
     @ns.expect(prompt_model)
     @ns.response(200, 'Success')
     @ns.response(400, 'Invalid request')
+    @ns.response(409, 'Ambiguous task name')
     def post(self):
         body = api.payload
         
@@ -572,40 +805,573 @@ class ProcessPrompt(Resource):
         
         prompt = body['prompt']
         
+        try:
+            caller, priority = llm_request_class(body)
+        except ValueError as e:
+            api.abort(400, str(e))
+        
         try:
             # ... logique existante de process_prompt() ...
-            task_info = process_prompt_line(prompt)
-            return {'message': 'Projet créé', 'task': task_info}, 200
+            actions = process_prompt_line(prompt, client_disconnected(request.environ), caller, priority)
+            return {'message': 'Projet créé', 'task': actions[0] if actions else None, 'actions': actions}, 200
+        except Overloaded as e:
+            return {'error': str(e)}, 429, {'Retry-After': str(e.retry_after)}
+        except Abandoned:
+            # Le client est parti pendant l'attente : personne ne lira cette réponse
+            return {'error': 'Client déconnecté'}, 499
+        except AmbiguousTaskName as e:
+            # Rien n'est modifié : le client choisit parmi les noms proches
+            return {'error': str(e), 'candidates': e.candidates}, 409
         except Exception as e:
             return {'error': str(e)}, 500
 
 api.add_resource(ProcessPrompt, '/process_prompt')
 
+# Taille maximale d'une page de /api/tasks
+TASKS_PAGE_MAX = 1000
+
+# Nombre maximum de résultats par page de /api/search
+SEARCH_PAGE_MAX = 100
+
+# Définition des fonctions d'encodage du curseur de pagination de /api/tasks
+# Le curseur porte la position (start_date, id) de la dernière tâche servie
+# et l'état de la répartition en lignes, pour que les pages suivantes
+# continuent la même répartition.
+def encode_tasks_cursor(table):
+    payload = [table.start_dates[-1], int(table.ids[-1]), [float(end) for end in table.lane_ends]]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+def decode_tasks_cursor(cursor):
+    start_date, task_id, lane_ends = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return (start_date, int(task_id)), [float(end) for end in lane_ends]
+
+# Définition de la fonction de calcul des barres de prévisualisation
+def preview_entries(table):
+    layout = compute_layout(*table.columns(), table.lanes)
+    start_percent, duration_percent = to_percent(layout)
+    
+    return [{
+        'id': task_id,
+        'task_name': task_name,
+        'start_percent': start,
+        'duration_percent': duration,
+        'color_rgb': color_rgb,
+        'lane': lane
+    } for task_id, task_name, start, duration, color_rgb, lane in zip(
+        table.ids.tolist(), table.names, start_percent.tolist(), duration_percent.tolist(),
+        table.colors_rgb(), table.lanes.tolist()
+    )]
+
+# Définition de la réponse de /api/tasks (liste complète), conditionnelle et mise en cache par révision
+def tasks_snapshot_response():
+    revision = roadmap_cache.revision()
+    etag = f'"tasks-{revision}"'
+    
+    # Le client a déjà cette révision : ni lecture, ni mise en page, ni sérialisation
+    if client_has_etag(etag):
+        return Response(status=304, headers={'ETag': etag})
+    
+    body = roadmap_cache.get('tasks.json', revision)
+    if body is None:
+        table = current_task_table()
+        revision, body = table.revision, json.dumps(preview_entries(table))
+        roadmap_cache.put('tasks.json', revision, body)
+        etag = f'"tasks-{revision}"'
+    
+    return Response(body, mimetype='application/json', headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+
 @app.route('/api/tasks')
 def get_tasks():
-    tasks = task_db.list_tasks()
-    lanes = {}
-    processed_tasks = []
-    
-    for task in tasks:
-        start = task['start_month']
-        end = task['end_month']
-        lane = 0
+    limit = request.args.get('limit', type=int)
+    since, lane_ends = None, None
+    
+    if request.args.get('cursor'):
+        try:
+            since, lane_ends = decode_tasks_cursor(request.args['cursor'])
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Curseur invalide'}), 400
+    
+    try:
+        window = requested_window()
+    except ValueError:
+        return jsonify({'error': INVALID_WINDOW_ERROR}), 400
+    
+    if window is not None:
+        if limit or since is not None:
+            return jsonify({'error': 'Les paramètres from/to ne se combinent pas avec la pagination'}), 400
         
-        while any(t['end_month'] > start and lanes.get(t['id'], -1) == lane 
-                 for t in processed_tasks):
-            lane += 1
+        etag = f'"tasks-{roadmap_cache.revision()}{window_tag(window)}"'
+        if client_has_etag(etag):
+            return Response(status=304, headers={'ETag': etag})
+        
+        table = roadmap_table(window)
+        response = jsonify(preview_entries(table))
+        response.headers['ETag'] = f'"tasks-{table.revision}{window_tag(window)}"'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    at = request.args.get('at', type=int)
+    if at is not None:
+        # Roadmap telle qu'elle était à une révision passée
+        try:
+            tasks = task_db.tasks_at(at)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+        return jsonify(preview_entries(TaskTable.from_rows(
+            [tuple(task[column] for column in TaskTable.COLUMNS) for task in tasks],
+            at, default_color=DEFAULT_COLOR_INT
+        )))
+    
+    if not limit and since is None:
+        return tasks_snapshot_response()
+    
+    limit = min(max(limit or TASKS_PAGE_MAX, 1), TASKS_PAGE_MAX)
+    tasks = list(islice(task_db.iter_tasks(since=since, batch=limit + 1), limit + 1))
+    
+    has_more = len(tasks) > limit
+    table = TaskTable.from_rows([tuple(task[column] for column in TaskTable.COLUMNS) for task in tasks[:limit]],
+                                default_color=DEFAULT_COLOR_INT, lane_ends=lane_ends)
+    
+    response = jsonify(preview_entries(table))
+    
+    if has_more:
+        next_cursor = encode_tasks_cursor(table)
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'</api/tasks?limit={limit}&cursor={next_cursor}>; rel="next"'
+    
+    return response
+
+# Délai de regroupement des rendus PowerPoint après des éditions structurées
+PRESENTATION_DEBOUNCE = float(os.getenv('PRESENTATION_DEBOUNCE', '0.5'))
+presentation_timer = {'timer': None}
+presentation_timer_lock = threading.Lock()
+
+# Définition de la fonction de rendu différé de la présentation
+# Une rafale d'éditions (redimensionnement par glisser...) ne produit qu'un rendu
+def schedule_presentation_update():
+    with presentation_timer_lock:
+        if presentation_timer['timer'] is not None:
+            presentation_timer['timer'].cancel()
+        timer = threading.Timer(PRESENTATION_DEBOUNCE, update_presentation)
+        timer.daemon = True
+        timer.start()
+        presentation_timer['timer'] = timer
+    
+    # L'aperçu (SSE) n'attend pas le rendu PowerPoint
+    change_feed.notify()
+
+# Définition de la fonction d'annulation du rendu différé
+# Retourne True si un rendu était en attente
+def cancel_presentation_update():
+    with presentation_timer_lock:
+        timer, presentation_timer['timer'] = presentation_timer['timer'], None
+    
+    if timer is None:
+        return False
+    timer.cancel()
+    # Le minuteur peut déjà avoir démarré son rendu : il est alors sérialisé par presentation_lock
+    return timer is not threading.current_thread()
+
+# Définition de la fonction d'arrêt du rendu différé
+# À l'arrêt, un rendu en attente est fait tout de suite plutôt que perdu
+# avec son thread (daemon)
+def flush_presentation_update():
+    if cancel_presentation_update():
+        update_presentation()
+
+atexit.register(flush_presentation_update)
+
+# Définition de la fonction de conversion d'une date en [index_mois, position_dans_mois]
+def month_position(date):
+    # Mêmes règles que le prompt : 0.0 (jours 1-10), 0.5 (11-20), 1.0 (21-31)
+    position = 0.0 if date.day <= 10 else 0.5 if date.day <= 20 else 1.0
+    return [date.month - 1, position]
+
+# Définition de la fonction de lecture d'une date enregistrée (None si absente ou illisible)
+def stored_date(value):
+    try:
+        return datetime.strptime(str(value).replace('-', '/'), '%Y/%m/%d') if value else None
+    except ValueError:
+        return None
+
+# Définition de la fonction de vérification de l'ordre des bornes d'une tâche
+# Une édition partielle est complétée par la tâche enregistrée (current) :
+# modifier une seule borne ne peut pas placer la fin avant le début
+def check_task_range(task_info, current=None):
+    current = current or {}
+    
+    dates = [stored_date(task_info.get(field) or current.get(field)) for field in ('start_date', 'end_date')]
+    if all(dates):
+        inverted = dates[0] > dates[1]
+    else:
+        # À défaut des deux dates, les positions dans les mois
+        bounds = []
+        for bound in ('start', 'end'):
+            if task_info.get(f'{bound}_month') is not None:
+                bounds.append(tuple(task_info[f'{bound}_month']))
+            elif current.get(f'{bound}_month') is not None:
+                bounds.append((current[f'{bound}_month'], current.get(f'{bound}_position') or 0.0))
+        inverted = len(bounds) == 2 and bounds[0] > bounds[1]
+    
+    if inverted:
+        raise ValueError('start_date est postérieure à end_date')
+
+# Définition de la fonction de validation d'une édition structurée
+def structured_task_info(body, partial=False, current=None):
+    if not isinstance(body, dict):
+        raise ValueError('Corps JSON attendu')
+    
+    task_info = {}
+    
+    task_name = body.get('task_name')
+    if task_name is not None:
+        if not isinstance(task_name, str) or not task_name.strip():
+            raise ValueError('task_name doit être une chaîne non vide')
+        task_info['task_name'] = task_name
+    elif not partial:
+        raise ValueError('task_name manquant')
+    
+    for field in ('start_date', 'end_date'):
+        if body.get(field) is not None:
+            try:
+                date = datetime.strptime(str(body[field]).replace('-', '/'), '%Y/%m/%d')
+            except ValueError:
+                raise ValueError(f'{field} invalide (format AAAA-MM-JJ attendu)')
+            task_info[field] = date.strftime('%Y/%m/%d')
+            task_info[field.replace('_date', '_month')] = month_position(date)
+    
+    check_task_range(task_info, current)
+    
+    color = body.get('color_rgb')
+    if color is not None:
+        if isinstance(color, str):
+            if re.fullmatch(r'#?[0-9a-fA-F]{6}', color):
+                color = [int(color.lstrip('#')[index:index + 2], 16) for index in (0, 2, 4)]
+            else:
+                color = convert_color_to_rgb(color)
+        if (not isinstance(color, list) or len(color) != 3
+                or not all(isinstance(value, int) and 0 <= value <= 255 for value in color)):
+            raise ValueError('color_rgb invalide ([R, G, B], #RRGGBB ou nom de couleur)')
+        task_info['color_rgb'] = color
+    
+    if partial and not task_info:
+        raise ValueError('Aucun champ à modifier')
+    
+    return task_info
+
+# Définition de la fonction de représentation d'une tâche dans l'API REST
+def task_resource(task):
+    return {
+        'id': task['id'],
+        'task_name': task['task_name'],
+        'start_date': task['start_date'],
+        'end_date': task['end_date'],
+        'start_month': [task['start_month'], task['start_position']],
+        'end_month': [task['end_month'], task['end_position']],
+        'color_rgb': json.loads(task['color_rgb']) if task['color_rgb'] else None,
+        'updated_at': task['updated_at']
+    }
+
+@app.route('/api/tasks', methods=['POST'])
+def create_task():
+    try:
+        task_info = structured_task_info(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        task_id = task_db.insert_task(task_info)
+    except STORAGE_CONFLICTS:
+        return jsonify({'error': 'Une tâche porte déjà ce nom'}), 409
+    
+    schedule_presentation_update()
+    
+    response = jsonify(task_resource(task_db.get_task(task_id)))
+    response.status_code = 201
+    response.headers['Location'] = f'/api/tasks/{task_id}'
+    return response
+
+@app.route('/api/tasks/<int:task_id>')
+def get_task(task_id):
+    task = task_db.get_task(task_id)
+    if task is None:
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    return jsonify(task_resource(task))
+
+@app.route('/api/tasks/<int:task_id>', methods=['PATCH'])
+def patch_task(task_id):
+    current = task_db.get_task(task_id)
+    if current is None:
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    
+    try:
+        # Les bornes sont vérifiées sur la tâche complétée par l'édition
+        task_info = structured_task_info(request.get_json(silent=True), partial=True, current=current)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        task = task_db.update_task(task_id, task_info, raw_prompt=f'PATCH /api/tasks/{task_id}')
+    except STORAGE_CONFLICTS:
+        return jsonify({'error': 'Une tâche porte déjà ce nom'}), 409
+    
+    if task is None:
+        # Supprimée entre la lecture et l'écriture
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    
+    schedule_presentation_update()
+    return jsonify(task_resource(task))
+
+@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+def remove_task(task_id):
+    if not task_db.delete_task_by_id(task_id, raw_prompt=f'DELETE /api/tasks/{task_id}'):
+        return jsonify({'error': 'Tâche introuvable'}), 404
+    
+    schedule_presentation_update()
+    return Response(status=204)
+
+@app.route('/api/tasks/changes')
+def get_task_changes():
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), TASKS_PAGE_MAX)
+    
+    revision = task_db.revision()
+    changes = task_db.changes_since(since, limit=limit)
+    
+    return jsonify({
+        'revision': revision,
+        # Les changements sont paginés : repartir de la dernière révision reçue
+        'has_more': len(changes) == limit,
+        'changes': changes
+    })
+
+# Définition de la fonction de formatage d'un événement SSE
+def sse_event(event, revision, data):
+    return f"event: {event}\nid: {revision}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/tasks/stream')
+def stream_tasks():
+    def events():
+        # Délai de reconnexion du navigateur après une coupure
+        yield 'retry: 2000\n\n'
         
-        processed_tasks.append({**task, 'lane': lane})
-        lanes[task['id']] = lane
-    
-    return jsonify([{
-        'task_name': t['task_name'],
-        'start_percent': (t['start_month']/12)*100,
-        'duration_percent': ((t['end_month']-t['start_month'])/12)*100,
-        'color_rgb': json.loads(t['color_rgb']),
-        'lane': t['lane']
-    } for t in processed_tasks])
+        entries, revision = {}, None
+        while True:
+            if revision is not None and change_feed.wait(revision, STREAM_HEARTBEAT) <= revision:
+                yield ': keep-alive\n\n'
+                continue
+            
+            table = current_task_table()
+            latest = {entry['id']: entry for entry in preview_entries(table)}
+            
+            if revision is None:
+                # Première réponse (ou reconnexion) : état complet
+                yield sse_event('snapshot', table.revision, list(latest.values()))
+            else:
+                upserted = [entry for task_id, entry in latest.items() if entries.get(task_id) != entry]
+                removed = [task_id for task_id in entries if task_id not in latest]
+                if upserted or removed:
+                    yield sse_event('changes', table.revision, {'upserted': upserted, 'removed': removed})
+            
+            entries, revision = latest, table.revision
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Définition de la fonction commune aux routes d'annulation et de rétablissement
+def apply_history_step(step, empty_message):
+    try:
+        result = step()
+    except STORAGE_CONFLICTS as e:
+        return jsonify({'error': f"Impossible de restaurer l'état précédent : {e}"}), 409
+    
+    if result is None:
+        return jsonify({'error': empty_message}), 409
+    
+    update_presentation()
+    return jsonify(result)
+
+@app.route('/api/tasks/undo', methods=['POST'])
+def undo_task_change():
+    return apply_history_step(task_db.undo, 'Aucune opération à annuler')
+
+@app.route('/api/tasks/redo', methods=['POST'])
+def redo_task_change():
+    return apply_history_step(task_db.redo, 'Aucune opération à rétablir')
+
+@app.route('/api/search')
+def search_task_changes():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Paramètre q manquant'}), 400
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), SEARCH_PAGE_MAX)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    # Un résultat de plus que demandé indique s'il reste une page
+    results = task_db.search_changes(query, limit=limit + 1, offset=offset)
+    has_more = len(results) > limit
+    
+    return jsonify({
+        'query': query,
+        'results': results[:limit],
+        'has_more': has_more,
+        'next_offset': offset + limit if has_more else None
+    })
+
+# Octets d'import validé gardés en mémoire avant de déborder sur disque
+IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Définition de la fonction de lecture en flux d'un import de tâches (JSONL ou CSV)
+# Produit des couples (numéro de ligne, tâche)
+def iter_imported_tasks(stream, content_type):
+    if 'csv' in content_type:
+        # Colonnes plates : task_name, start_date, end_date, start_month,
+        # start_position, end_month, end_position, color_rgb ("R,G,B")
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8'))
+        for row in reader:
+            try:
+                task_info = {'task_name': row.get('task_name'),
+                             'start_date': row.get('start_date') or None,
+                             'end_date': row.get('end_date') or None}
+                for bound in ('start', 'end'):
+                    if row.get(f'{bound}_month'):
+                        task_info[f'{bound}_month'] = [int(row[f'{bound}_month']),
+                                                       float(row.get(f'{bound}_position') or 0.0)]
+                if row.get('color_rgb'):
+                    task_info['color_rgb'] = [int(value) for value in row['color_rgb'].split(',')]
+            except ValueError as e:
+                raise ValueError(f'ligne {reader.line_num} : {e}')
+            yield reader.line_num, task_info
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f'ligne {line_number} : {e}')
+
+# Définition de la fonction de validation d'une tâche importée
+def imported_task_info(task_info):
+    if not isinstance(task_info, dict):
+        raise ValueError('objet JSON attendu')
+    
+    task_name = task_info.get('task_name')
+    if not isinstance(task_name, str) or not task_name.strip():
+        raise ValueError('task_name doit être une chaîne non vide')
+    
+    for field in ('start_month', 'end_month'):
+        bound = task_info.get(field)
+        if bound is not None and (not isinstance(bound, list) or len(bound) != 2
+                                  or not all(isinstance(value, (int, float)) for value in bound)):
+            raise ValueError(f'{field} invalide ([mois, position] attendu)')
+    
+    color = task_info.get('color_rgb')
+    if color is not None and (not isinstance(color, list) or len(color) != 3
+                              or not all(isinstance(value, int) and 0 <= value <= 255 for value in color)):
+        raise ValueError('color_rgb invalide ([R, G, B] attendu)')
+    
+    for field in ('start_date', 'end_date', 'raw_prompt'):
+        if task_info.get(field) is not None and not isinstance(task_info[field], str):
+            raise ValueError(f'{field} doit être une chaîne')
+    
+    return task_info
+
+# Définition de la fonction de lecture et de validation d'un import
+# Le corps de la requête est lu et validé dans le thread de la requête, et
+# les tâches validées gardées dans un tampon local (débordant sur disque) :
+# l'écrivain de la base ne lit ensuite que ce tampon, jamais le réseau, et
+# une ligne invalide est refusée avant toute écriture
+def spool_imported_tasks(stream, content_type):
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE, mode='w+', encoding='utf-8')
+    try:
+        for line_number, task_info in iter_imported_tasks(stream, content_type):
+            try:
+                imported_task_info(task_info)
+            except ValueError as e:
+                raise ValueError(f'ligne {line_number} : {e}')
+            spool.write(json.dumps(task_info) + '\n')
+    except Exception:
+        spool.close()
+        raise
+    
+    spool.seek(0)
+    return spool
+
+@app.route('/api/tasks/import', methods=['POST'])
+def import_tasks():
+    try:
+        spool = spool_imported_tasks(request.stream, request.content_type or '')
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Import invalide : {e}'}), 400
+    
+    with spool:
+        counts = task_db.bulk_upsert((json.loads(line) for line in spool), raw_prompt='import')
+    
+    update_presentation()
+    
+    return jsonify(counts)
+
+@app.route('/api/roadmap.svg')
+def get_roadmap_svg():
+    try:
+        window = requested_window()
+    except ValueError:
+        return jsonify({'error': INVALID_WINDOW_ERROR}), 400
+    
+    def render(revision):
+        table = roadmap_table(window)
+        return iter_svg(layout_tasks(table), table.names, table.colors_rgb())
+    
+    return stream_export('svg', 'image/svg+xml', render, window)
+
+@app.route('/api/roadmap/layout.json')
+def get_roadmap_layout():
+    try:
+        window = requested_window()
+    except ValueError:
+        return jsonify({'error': INVALID_WINDOW_ERROR}), 400
+    
+    def render(revision):
+        table = roadmap_table(window)
+        return iter_layout_json(layout_tasks(table), table.ids.tolist(), table.names,
+                                table.colors_rgb(), revision)
+    
+    return stream_export('layout', 'application/json', render, window)
+
+@app.route('/api/roadmap.png')
+def get_roadmap_thumbnail():
+    width = min(max(request.args.get('width', THUMBNAIL_DEFAULT_WIDTH, type=int), 16), THUMBNAIL_MAX_WIDTH)
+    height = request.args.get('height', width * SLIDE_HEIGHT // SLIDE_WIDTH, type=int)
+    height = min(max(height, 16), THUMBNAIL_MAX_WIDTH)
+    
+    try:
+        window = requested_window()
+    except ValueError:
+        return jsonify({'error': INVALID_WINDOW_ERROR}), 400
+    
+    revision = roadmap_cache.revision()
+    etag = f'"png-{revision}-{width}x{height}{window_tag(window)}"'
+    
+    if client_has_etag(etag):
+        return Response(status=304, headers={'ETag': etag})
+    
+    if window is not None:
+        # Vues par période : rendu direct, le cache disque reste réservé à la vue complète
+        table = roadmap_table(window)
+        data = render_thumbnail(layout_tasks(table), table.names, table.colors_rgb(), width, height)
+        return Response(data, mimetype='image/png', headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+    
+    path = thumbnail_cache.get(revision, width, height)
+    if path is None:
+        table = current_task_table()
+        data = render_thumbnail(layout_tasks(table), table.names, table.colors_rgb(), width, height)
+        path = thumbnail_cache.put(revision, width, height, data)
+    
+    response = send_file(os.path.abspath(path), mimetype='image/png', conditional=False, etag=False)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 # Lancement de l'application
 if __name__ == '__main__':
@@ -2,229 +2,1365 @@ import sqlite3
 import json
 from datetime import datetime
 import re
+import threading
+import time
+from concurrent.futures import Future
+from itertools import islice
+from queue import Empty, SimpleQueue
 
-def normalize_text(text):
+from core.repository import TaskRepository
+from core.task_values import (AUTO_MATCH_MARGIN, AUTO_MATCH_THRESHOLD, MATCH_THRESHOLD, STATE_COLUMNS, TASK_COLUMNS,
+                               UPSERT_COLUMNS, AmbiguousTaskName, changed_fields, match_key, normalize_text,
+                               pack_color, rank_matches, select_match, task_values, trigrams)
+
+# Réglages appliqués à chaque connexion persistante
+BUSY_TIMEOUT = 5.0  # secondes d'attente sur un verrou avant 'database is locked'
+CACHE_SIZE_KIB = 16384  # cache de pages de 16 Mio par connexion
+MMAP_SIZE = 256 * 1024 * 1024  # lecture des pages par mmap (256 Mio)
+STATEMENT_CACHE_SIZE = 256  # requêtes préparées conservées par connexion
+MIGRATION_LOCK_TIMEOUT = 60.0  # secondes d'attente d'un autre processus qui migre
+BULK_CHUNK_SIZE = 500  # lignes par executemany lors des imports en masse
+ITER_BATCH_SIZE = 500  # tâches lues par requête lors des parcours paginés
+CHANGES_PAGE_SIZE = 1000  # changements retournés au plus par changes_since
+WRITE_BATCH_WINDOW = 0.002  # secondes pendant lesquelles l'écrivain regroupe les écritures reçues
+WRITE_BATCH_MAX = 256  # écritures au plus par transaction groupée
+MATCH_CANDIDATES = 20  # candidats lus dans l'index trigramme avant le calcul de similarité
+MAX_KEY_LENGTH = 256  # caractères de la clé de rapprochement indexés en trigrammes
+SEARCH_PAGE_SIZE = 20  # résultats retournés par défaut par search_changes
+SNAPSHOT_INTERVAL = 100  # révisions entre deux instantanés complets de la roadmap
+SNAPSHOT_RETENTION = 10  # instantanés récents conservés, en plus du premier (base de l'historique)
+SNIPPET_TOKENS = 12  # mots autour des termes trouvés dans un extrait
+
+def fts_query(text):
     """
-    Normalise le texte en supprimant les caractères spéciaux et en uniformisant les espaces.
+    Convertit une saisie libre en requête FTS5 : tous les mots, le dernier en préfixe.
+    
+    Chaque mot est mis entre guillemets, pour que la ponctuation ou les mots
+    réservés (AND, OR, NEAR) de la saisie ne soient pas interprétés.
     
     Args:
-        text (str): Texte à normaliser
+        text (str): Recherche saisie par l'utilisateur
     
     Returns:
-        str: Texte normalisé
+        str: Requête MATCH, vide si la saisie ne contient aucun mot
     """
-    text = text.strip()
-    text = re.sub(r'\s+', ' ', text)  # Remplacer les espaces multiples par un seul
-    text = re.sub(r'[^\w\s]', '', text)  # Supprimer la ponctuation
-    return text.lower()
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return ''
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+RESTORE_SQL = f'''
+    INSERT INTO tasks ({', '.join(STATE_COLUMNS)}, name_key, match_key)
+    VALUES ({', '.join(':' + column for column in STATE_COLUMNS)}, :name_key, :match_key)
+    ON CONFLICT (id) DO UPDATE SET
+        {', '.join(f'{column} = excluded.{column}' for column in STATE_COLUMNS[1:])},
+        name_key = excluded.name_key,
+        match_key = excluded.match_key
+'''
+
+UPSERT_SQL = '''
+    INSERT INTO tasks (
+        task_name,
+        name_key,
+        match_key,
+        start_month, start_position,
+        end_month, end_position,
+        color_rgb,
+        start_date,
+        end_date,
+        raw_prompt,
+        updated_at
+    ) VALUES (
+        :task_name,
+        :name_key,
+        :match_key,
+        :start_month, :start_position,
+        :end_month, :end_position,
+        :color_rgb,
+        :start_date,
+        :end_date,
+        :raw_prompt,
+        CURRENT_TIMESTAMP
+    )
+    ON CONFLICT (task_name) DO UPDATE SET
+        start_month = COALESCE(excluded.start_month, start_month),
+        start_position = COALESCE(excluded.start_position, start_position),
+        end_month = COALESCE(excluded.end_month, end_month),
+        end_position = COALESCE(excluded.end_position, end_position),
+        color_rgb = COALESCE(excluded.color_rgb, color_rgb),
+        start_date = COALESCE(excluded.start_date, start_date),
+        end_date = COALESCE(excluded.end_date, end_date),
+        raw_prompt = COALESCE(excluded.raw_prompt, raw_prompt),
+        updated_at = CURRENT_TIMESTAMP
+    WHERE :has_updates
+    RETURNING id
+'''
+
+def _day_number(expression):
+    """Expression SQL du numéro de jour (entier) d'une date 'AAAA/MM/JJ' ou 'AAAA-MM-JJ'."""
+    return f"CAST(julianday(replace({expression}, '/', '-')) AS INTEGER)"
+
+def _task_span_sql(prefix, source=''):
+    """Requête alimentant task_spans pour les tâches dont les deux dates sont lisibles."""
+    return f'''
+        INSERT OR REPLACE INTO task_spans (id, start_day, end_day)
+        SELECT id, min(start_day, end_day), max(start_day, end_day) FROM (
+            SELECT {prefix}id AS id,
+                   {_day_number(prefix + 'start_date')} AS start_day,
+                   {_day_number(prefix + 'end_date')} AS end_day
+            {source}
+        ) WHERE start_day IS NOT NULL AND end_day IS NOT NULL
+    '''
+
+def _dumps_state(state):
+    return json.dumps(state) if state is not None else None
+
+def _column_exists(cursor, table, column):
+    cursor.execute(f'PRAGMA table_info({table})')
+    return any(row[1] == column for row in cursor.fetchall())
+
+def _add_column(cursor, table, column, column_type):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+# Migrations du schéma, appliquées dans l'ordre : la migration N amène la base
+# à user_version = N. Chaque étape est idempotente, pour reprendre sans
+# erreur les bases créées avant l'introduction de user_version.
+
+def _migration_base_schema(cursor):
+    """Table des tâches et colonnes start_date, end_date et raw_prompt."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_name TEXT NOT NULL,
+            start_month INTEGER,
+            start_position REAL,
+            end_month INTEGER,
+            end_position REAL,
+            color_rgb TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    _add_column(cursor, 'tasks', 'start_date', 'DATETIME')
+    _add_column(cursor, 'tasks', 'end_date', 'DATETIME')
+    _add_column(cursor, 'tasks', 'raw_prompt', 'TEXT')
+
+def _migration_revision_counter(cursor):
+    """Compteur de révision, incrémenté à chaque écriture."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS roadmap_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO roadmap_meta (key, value) VALUES ('revision', 0)")
 
-class TaskDatabase:
-    def __init__(self, db_path='tasks.db'):
+def _migration_unique_task_name(cursor):
+    """Index unique sur le nom normalisé, après fusion des doublons (la plus récente est conservée)."""
+    cursor.execute('''
+        DELETE FROM tasks WHERE id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY task_name ORDER BY created_at DESC, id DESC
+                ) AS rank
+                FROM tasks
+            ) WHERE rank = 1
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_task_name ON tasks (task_name)')
+
+def _migration_name_key(cursor):
+    """Clé de recherche normalisée, indexée, renseignée pour les lignes existantes."""
+    _add_column(cursor, 'tasks', 'name_key', 'TEXT')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_name_key ON tasks (name_key)')
+    cursor.execute('SELECT id, task_name FROM tasks WHERE name_key IS NULL')
+    cursor.executemany(
+        'UPDATE tasks SET name_key = ? WHERE id = ?',
+        [(normalize_text(task_name), task_id) for task_id, task_name in cursor.fetchall()]
+    )
+
+def _migration_start_date_index(cursor):
+    """Index de tri et de pagination par date de début."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_start_date ON tasks (start_date, id)')
+
+def _migration_change_log(cursor):
+    """Journal des changements : une ligne par tâche touchée, avec la révision produite."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            revision INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            task_name TEXT,
+            fields TEXT,
+            raw_prompt TEXT,
+            changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_changes_revision ON task_changes (revision)')
+
+def _migration_packed_color(cursor):
+    """Couleur 0xRRGGBB calculée par SQLite à partir de color_rgb (colonne virtuelle)."""
+    if not _column_exists(cursor, 'tasks', 'color_int'):
+        cursor.execute('''
+            ALTER TABLE tasks ADD COLUMN color_int INTEGER GENERATED ALWAYS AS (
+                (json_extract(color_rgb, '$[0]') << 16)
+                | (json_extract(color_rgb, '$[1]') << 8)
+                | json_extract(color_rgb, '$[2]')
+            ) VIRTUAL
+        ''')
+
+def _migration_task_spans(cursor):
+    """Index R*Tree des périodes (jours de début et de fin), tenu à jour par des triggers."""
+    cursor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS task_spans USING rtree_i32(id, start_day, end_day)')
+    
+    new_span = _task_span_sql('NEW.')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_spans_insert AFTER INSERT ON tasks BEGIN
+            {new_span};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_spans_update AFTER UPDATE OF start_date, end_date ON tasks BEGIN
+            DELETE FROM task_spans WHERE id = OLD.id;
+            {new_span};
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_spans_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM task_spans WHERE id = OLD.id;
+        END
+    ''')
+    
+    cursor.execute('DELETE FROM task_spans')
+    cursor.execute(_task_span_sql('', 'FROM tasks'))
+
+def _trigram_sql(prefix, source='', length=MAX_KEY_LENGTH):
+    """Requête alimentant task_name_trigrams à partir de la clé bordée d'espaces."""
+    return f'''
+        INSERT OR IGNORE INTO task_name_trigrams (trigram, task_id)
+        WITH RECURSIVE positions (n) AS (
+            SELECT 1 UNION ALL SELECT n + 1 FROM positions WHERE n < min({length}, {MAX_KEY_LENGTH})
+        )
+        SELECT substr(' ' || {prefix}match_key || ' ', n, 3), {prefix}id FROM positions
+        {source}
+        WHERE {prefix}match_key IS NOT NULL AND n <= length({prefix}match_key)
+    '''
+
+def _migration_name_trigrams(cursor):
+    """Clé de rapprochement des noms et index de ses trigrammes, tenu à jour par des triggers."""
+    _add_column(cursor, 'tasks', 'match_key', 'TEXT')
+    cursor.execute('SELECT id, task_name FROM tasks')
+    cursor.executemany(
+        'UPDATE tasks SET match_key = ? WHERE id = ?',
+        [(match_key(task_name), task_id) for task_id, task_name in cursor.fetchall()]
+    )
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_name_trigrams (
+            trigram TEXT NOT NULL,
+            task_id INTEGER NOT NULL,
+            PRIMARY KEY (trigram, task_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    new_trigrams = _trigram_sql('NEW.', length='length(NEW.match_key)')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_name_trigrams_insert AFTER INSERT ON tasks BEGIN
+            {new_trigrams};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS task_name_trigrams_update AFTER UPDATE OF match_key ON tasks BEGIN
+            DELETE FROM task_name_trigrams WHERE task_id = OLD.id;
+            {new_trigrams};
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_name_trigrams_delete AFTER DELETE ON tasks BEGIN
+            DELETE FROM task_name_trigrams WHERE task_id = OLD.id;
+        END
+    ''')
+    
+    cursor.execute('DELETE FROM task_name_trigrams')
+    cursor.execute(_trigram_sql('', 'CROSS JOIN tasks'))
+
+def _migration_change_search(cursor):
+    """Index plein texte (FTS5) des noms et prompts du journal, tenu à jour par des triggers."""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS task_changes_fts USING fts5(
+            task_name, raw_prompt,
+            content = 'task_changes', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_changes_fts_insert AFTER INSERT ON task_changes BEGIN
+            INSERT INTO task_changes_fts (rowid, task_name, raw_prompt)
+            VALUES (NEW.id, NEW.task_name, NEW.raw_prompt);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_changes_fts_update AFTER UPDATE OF task_name, raw_prompt ON task_changes BEGIN
+            INSERT INTO task_changes_fts (task_changes_fts, rowid, task_name, raw_prompt)
+            VALUES ('delete', OLD.id, OLD.task_name, OLD.raw_prompt);
+            INSERT INTO task_changes_fts (rowid, task_name, raw_prompt)
+            VALUES (NEW.id, NEW.task_name, NEW.raw_prompt);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_changes_fts_delete AFTER DELETE ON task_changes BEGIN
+            INSERT INTO task_changes_fts (task_changes_fts, rowid, task_name, raw_prompt)
+            VALUES ('delete', OLD.id, OLD.task_name, OLD.raw_prompt);
+        END
+    ''')
+    cursor.execute("INSERT INTO task_changes_fts (task_changes_fts) VALUES ('rebuild')")
+
+# Toutes les tâches sous forme de tableau JSON d'images (STATE_COLUMNS)
+_SNAPSHOT_SELECT = (
+    "(SELECT json_group_array(json_object("
+    + ', '.join(f"'{column}', {column}" for column in STATE_COLUMNS)
+    + ")) FROM tasks)"
+)
+
+def _migration_event_store(cursor):
+    """
+    Journal en images complètes, instantanés et pile d'annulation.
+    
+    Chaque changement garde l'image de la tâche avant (previous) et après
+    (state). Un instantané de toutes les tâches est pris à la révision
+    courante : l'historique reconstructible commence là.
+    """
+    _add_column(cursor, 'tasks', 'updated_at', 'DATETIME')
+    cursor.execute('UPDATE tasks SET updated_at = created_at WHERE updated_at IS NULL')
+    _add_column(cursor, 'task_changes', 'state', 'TEXT')
+    _add_column(cursor, 'task_changes', 'previous', 'TEXT')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_snapshots (
+            revision INTEGER PRIMARY KEY,
+            tasks TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Opérations annulables : 'done' ou 'undone' (undone_at : révision de l'annulation)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_operations (
+            revision INTEGER PRIMARY KEY,
+            status TEXT NOT NULL DEFAULT 'done',
+            undone_at INTEGER
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_operations_status ON task_operations (status, undone_at)')
+    
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO task_snapshots (revision, tasks)
+        SELECT (SELECT value FROM roadmap_meta WHERE key = 'revision'), {_SNAPSHOT_SELECT}
+    ''')
+
+def _migration_renormalize_names(cursor):
+    """
+    Noms et clés recalculés avec normalize_text idempotent.
+    
+    Les noms ponctués ("Alpha - Beta") étaient stockés avec des espaces
+    doubles ("alpha  beta") et ne correspondaient plus à la clé d'une
+    saisie normalisée une seule fois. Deux noms devenus identiques sont
+    fusionnés comme dans _migration_unique_task_name (la plus récente est
+    conservée).
+    """
+    cursor.execute('SELECT id, task_name, name_key, match_key FROM tasks ORDER BY created_at DESC, id DESC')
+    seen = set()
+    duplicates = []
+    updates = []
+    for task_id, task_name, name_key, task_match_key in cursor.fetchall():
+        normalized = normalize_text(task_name)
+        if normalized in seen:
+            duplicates.append((task_id,))
+            continue
+        seen.add(normalized)
+        if (task_name, name_key, task_match_key) != (normalized, normalized, match_key(normalized)):
+            updates.append((normalized, normalized, match_key(normalized), task_id))
+    
+    cursor.executemany('DELETE FROM tasks WHERE id = ?', duplicates)
+    cursor.executemany('UPDATE tasks SET task_name = ?, name_key = ?, match_key = ? WHERE id = ?', updates)
+
+MIGRATIONS = [
+    _migration_base_schema,
+    _migration_revision_counter,
+    _migration_unique_task_name,
+    _migration_name_key,
+    _migration_start_date_index,
+    _migration_change_log,
+    _migration_packed_color,
+    _migration_task_spans,
+    _migration_name_trigrams,
+    _migration_change_search,
+    _migration_event_store,
+    _migration_renormalize_names,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+class TaskDatabase(TaskRepository):
+    def __init__(self, db_path='tasks.db', match_threshold=MATCH_THRESHOLD, history_limit=None,
+                 auto_match_threshold=AUTO_MATCH_THRESHOLD, auto_match_margin=AUTO_MATCH_MARGIN,
+                 snapshot_retention=SNAPSHOT_RETENTION):
         """
         Initialise la connexion à la base de données SQLite.
         
         Args:
             db_path (str): Chemin vers le fichier de base de données
+            match_threshold (float): Similarité minimale d'un nom approché
+                proposé comme candidat (resolve_task_name, AmbiguousTaskName)
+            history_limit (int, optional): Nombre de révisions d'historique
+                conservées ; au-delà, le journal est compacté à chaque
+                instantané (historique complet par défaut)
+            snapshot_retention (int, optional): Instantanés récents
+                conservés en plus du premier ; les instantanés
+                intermédiaires plus anciens sont supprimés (tous conservés
+                si None)
+            auto_match_threshold (float): Similarité minimale pour qu'une
+                mise à jour ou une suppression vise une tâche au nom approché
+            auto_match_margin (float): Avance minimale de ce nom sur le
+                deuxième candidat
         """
         self.db_path = db_path
-        self._create_table()
+        self.match_threshold = match_threshold
+        self.auto_match_threshold = auto_match_threshold
+        self.auto_match_margin = auto_match_margin
+        self.history_limit = history_limit
+        self.snapshot_retention = snapshot_retention
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._write_queue = SimpleQueue()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        # Écritures validées par ce processus (voir revision)
+        self._commits = 0
+        self._migrate()
     
-    def _create_table(self):
+    def _connection(self):
         """
-        Crée la table des tâches si elle n'existe pas.
-        Vérifie et ajoute les colonnes start_date, end_date et raw_prompt si nécessaire.
+        Retourne la connexion persistante du thread courant, ouverte à la demande.
+        
+        Chaque thread garde sa connexion : elle est configurée une seule fois
+        (WAL, synchronous=NORMAL, cache de pages, mmap) et conserve son cache
+        de requêtes préparées. En mode WAL, les lectures ne sont jamais
+        bloquées par une écriture en cours.
+        
+        Returns:
+            sqlite3.Connection: Connexion du thread courant
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=BUSY_TIMEOUT,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+            conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+            conn.execute('PRAGMA temp_store = MEMORY')
             
-            # Créer la table de base
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_name TEXT NOT NULL,
-                    start_month INTEGER,
-                    start_position REAL,
-                    end_month INTEGER,
-                    end_position REAL,
-                    color_rgb TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        
+        return conn
+    
+    def close(self):
+        """
+        Arrête l'écrivain (après les écritures en attente) et ferme toutes les connexions.
+        """
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._write_queue.put(None)
+            writer.join()
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        for conn in connections:
+            conn.close()
+        
+        self._local = threading.local()
+    
+    def _migrate(self):
+        """
+        Amène le schéma à la dernière version (PRAGMA user_version).
+        
+        Une fois le schéma à jour, le démarrage ne coûte qu'une lecture de
+        pragma. Sinon, les migrations restantes s'exécutent dans une
+        transaction BEGIN IMMEDIATE : le verrou d'écriture sérialise les
+        processus qui démarrent en même temps, et la version est relue une
+        fois le verrou obtenu pour ne rien appliquer deux fois.
+        """
+        conn = self._connection()
+        
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+        
+        # Une migration peut être longue : attendre le verrou plus longtemps
+        conn.execute(f'PRAGMA busy_timeout = {int(MIGRATION_LOCK_TIMEOUT * 1000)}')
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = conn.cursor()
+                version = cursor.execute('PRAGMA user_version').fetchone()[0]
+                
+                for target_version, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                    migration(cursor)
+                    cursor.execute(f'PRAGMA user_version = {target_version}')
+                
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            conn.execute(f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}')
+    
+    def _submit(self, operation, *args):
+        """
+        Confie une écriture au thread écrivain et attend son résultat.
+        
+        Toutes les écritures passent par un seul thread, qui possède la seule
+        connexion écrivant dans la base : les appelants ne se disputent
+        jamais le verrou d'écriture de SQLite.
+        
+        Args:
+            operation (callable): Écriture appelée avec un curseur dans la
+                transaction de l'écrivain, puis args
+        
+        Returns:
+            Résultat de l'opération, une fois la transaction validée
+        
+        Raises:
+            Exception: Erreur levée par l'opération ou par la validation
+        """
+        if threading.current_thread() is self._writer:
+            # Écriture imbriquée depuis l'écrivain : déjà dans sa transaction
+            return operation(self._connection().cursor(), *args)
+        
+        future = Future()
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='TaskDatabaseWriter', daemon=True)
+                self._writer.start()
+            self._write_queue.put((operation, args, future))
+        
+        return future.result()
+    
+    def _write_loop(self):
+        """
+        Boucle du thread écrivain : regroupe les écritures reçues en transactions.
+        
+        Les écritures arrivées pendant la transaction précédente, et sous
+        concurrence jusqu'à WRITE_BATCH_WINDOW après, partagent une seule
+        transaction, donc une seule synchronisation disque : le débit
+        augmente avec le nombre d'écrivains concurrents au lieu de
+        s'effondrer sur le verrou.
+        """
+        expected = 1
+        
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                return
             
-            # Vérifier et ajouter les colonnes start_date, end_date et raw_prompt
-            columns_to_add = [
-                ('start_date', 'DATETIME'),
-                ('end_date', 'DATETIME'),
-                ('raw_prompt', 'TEXT')
-            ]
+            batch = [item]
+            deadline = time.monotonic() + WRITE_BATCH_WINDOW
+            stopping = False
+            
+            # Tout ce qui est déjà en file est pris ; au-delà, l'écrivain
+            # n'attend que tant que le lot est plus petit que le précédent
+            # (un appelant seul n'attend jamais)
+            while len(batch) < WRITE_BATCH_MAX:
+                timeout = deadline - time.monotonic() if len(batch) < expected else 0
+                try:
+                    item = self._write_queue.get(timeout=max(timeout, 0))
+                except Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+            expected = len(batch)
+            if stopping:
+                return
+    
+    def _write_batch(self, batch):
+        """
+        Applique un lot d'écritures dans une transaction, chacune isolée par un SAVEPOINT.
+        
+        Une écriture en erreur est annulée seule et son appelant reçoit
+        l'exception ; les autres sont validées ensemble. Les résultats ne
+        sont transmis qu'après la validation.
+        """
+        conn = self._connection()
+        results = []
+        
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.cursor()
             
-            for column_name, column_type in columns_to_add:
+            for operation, args, future in batch:
+                cursor.execute('SAVEPOINT write_operation')
                 try:
-                    # Essayer de sélectionner la colonne
-                    cursor.execute(f'SELECT {column_name} FROM tasks LIMIT 1')
-                except sqlite3.OperationalError:
-                    # La colonne n'existe pas, l'ajouter
-                    cursor.execute(f'ALTER TABLE tasks ADD COLUMN {column_name} {column_type}')
+                    results.append((future, operation(cursor, *args), None))
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO write_operation')
+                    results.append((future, None, e))
+                cursor.execute('RELEASE write_operation')
             
             conn.commit()
+            self._commits += 1
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
     
-    def insert_task(self, task_info):
+    def _record_changes(self, cursor, changes, previous=None, undoable=True):
         """
-        Insère une nouvelle tâche dans la base de données.
+        Incrémente la révision et journalise les changements dans la transaction courante.
+        
+        Une opération d'écriture produit une seule révision, quel que soit le
+        nombre de tâches touchées. Chaque changement garde l'image complète
+        de la tâche avant et après l'opération, ce qui permet de l'annuler
+        et de reconstruire la roadmap à n'importe quelle révision.
         
         Args:
-            task_info (dict): Informations de la tâche parsées
+            cursor (sqlite3.Cursor): Curseur de la transaction d'écriture
+            changes (list): Tuples (op, task_id, task_name, fields, raw_prompt)
+            previous (dict, optional): Images des tâches avant l'opération,
+                par id (absente pour une tâche créée par l'opération)
+            undoable (bool): Empiler l'opération pour undo (False pour les
+                annulations et rétablissements eux-mêmes)
         
         Returns:
-            int: ID de la tâche insérée
+            int: Nouvelle révision
         """
-        with sqlite3.connect(self.db_path) as conn:
+        revision = self._open_revision(cursor, undoable)
+        self._log_changes(cursor, revision, changes, previous)
+        self._close_revision(cursor, revision)
+        return revision
+    
+    def _open_revision(self, cursor, undoable=True):
+        """Alloue la révision d'une opération (voir _record_changes) ; retourne la révision."""
+        cursor.execute("UPDATE roadmap_meta SET value = value + 1 WHERE key = 'revision' RETURNING value")
+        revision = cursor.fetchone()[0]
+        
+        if undoable:
+            # Une nouvelle modification rend impossible le rétablissement des opérations annulées
+            cursor.execute("DELETE FROM task_operations WHERE status = 'undone'")
+            cursor.execute('INSERT INTO task_operations (revision) VALUES (?)', (revision,))
+        
+        return revision
+    
+    def _log_changes(self, cursor, revision, changes, previous=None):
+        """
+        Journalise des changements sous une révision déjà allouée.
+        
+        Une opération longue (import en masse) journalise chaque paquet dès
+        qu'il est écrit ; l'image d'après est celle de la fin du paquet.
+        """
+        previous = previous or {}
+        states = self._task_states(cursor, {task_id for _, task_id, _, _, _ in changes})
+        
+        cursor.executemany('''
+            INSERT INTO task_changes (revision, op, task_id, task_name, fields, raw_prompt, state, previous)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (revision, op, task_id, task_name, json.dumps(fields) if fields is not None else None, raw_prompt,
+             _dumps_state(states.get(task_id)), _dumps_state(previous.get(task_id)))
+            for op, task_id, task_name, fields, raw_prompt in changes
+        ])
+    
+    def _close_revision(self, cursor, revision):
+        """Termine une révision : instantané périodique de la roadmap."""
+        if revision % SNAPSHOT_INTERVAL == 0:
+            self._take_snapshot(cursor, revision)
+    
+    def _journal(self, cursor, journal, change, previous):
+        """
+        Journalise un changement : immédiatement (nouvelle révision), ou dans
+        le journal d'une opération composée qui l'enregistrera avec les autres.
+        """
+        if journal is None:
+            self._record_changes(cursor, [change], previous)
+            return
+        
+        journal['changes'].append(change)
+        
+        # L'image d'avant est celle du début de l'opération composée (aucune
+        # pour une tâche qu'elle a créée)
+        task_id = change[1]
+        if task_id not in journal['touched']:
+            journal['touched'].add(task_id)
+            if task_id in previous:
+                journal['previous'][task_id] = previous[task_id]
+    
+    def _task_states(self, cursor, task_ids):
+        """
+        Lit l'image complète (STATE_COLUMNS) de tâches existantes.
+        
+        Returns:
+            dict: {task_id: image}, sans entrée pour une tâche absente
+        """
+        task_ids = list(task_ids)
+        states = {}
+        
+        for start in range(0, len(task_ids), BULK_CHUNK_SIZE):
+            chunk = task_ids[start:start + BULK_CHUNK_SIZE]
+            cursor.execute(f'''
+                SELECT {', '.join(STATE_COLUMNS)} FROM tasks WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            states.update((row[0], dict(zip(STATE_COLUMNS, row))) for row in cursor.fetchall())
+        
+        return states
+    
+    def _take_snapshot(self, cursor, revision):
+        """Matérialise toutes les tâches à la révision donnée, puis compacte si demandé."""
+        cursor.execute(f'INSERT OR REPLACE INTO task_snapshots (revision, tasks) SELECT ?, {_SNAPSHOT_SELECT}',
+                       (revision,))
+        if self.history_limit is not None:
+            self._compact_history(cursor, self.history_limit)
+        if self.snapshot_retention is not None:
+            self._prune_snapshots(cursor, self.snapshot_retention)
+    
+    def _prune_snapshots(self, cursor, keep):
+        """
+        Supprime les instantanés intermédiaires au-delà des keep plus récents.
+        
+        Le premier instantané est toujours conservé : c'est la base de la
+        reconstruction des révisions anciennes (tasks_at), qui rejoue alors
+        plus de changements mais reste possible.
+        """
+        cursor.execute('''
+            DELETE FROM task_snapshots
+            WHERE revision > (SELECT min(revision) FROM task_snapshots)
+              AND revision NOT IN (SELECT revision FROM task_snapshots ORDER BY revision DESC LIMIT ?)
+        ''', (keep,))
+    
+    def undo(self):
+        """
+        Annule la dernière opération non annulée en restaurant les images d'avant.
+        
+        L'annulation est elle-même une nouvelle révision du journal (op
+        'undo') : l'historique reste en ajout seul.
+        
+        Returns:
+            dict or None: {'revision': révision produite, 'target': révision
+                annulée}, ou None s'il n'y a rien à annuler
+        
+        Raises:
+            sqlite3.IntegrityError: Si une tâche restaurée porte le nom
+                d'une tâche créée depuis
+        """
+        return self._submit(self._undo)
+    
+    def _undo(self, cursor):
+        cursor.execute("SELECT revision FROM task_operations WHERE status = 'done' ORDER BY revision DESC LIMIT 1")
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        target = row[0]
+        # Les images d'avant sont réappliquées en ordre inverse de l'opération
+        cursor.execute('SELECT task_id, task_name, previous FROM task_changes WHERE revision = ? ORDER BY id DESC',
+                       (target,))
+        revision = self._apply_images(cursor, 'undo', cursor.fetchall())
+        
+        cursor.execute("UPDATE task_operations SET status = 'undone', undone_at = ? WHERE revision = ?",
+                       (revision, target))
+        return {'revision': revision, 'target': target}
+    
+    def redo(self):
+        """
+        Rétablit la dernière opération annulée en réappliquant ses images d'après.
+        
+        Returns:
+            dict or None: {'revision': révision produite, 'target': révision
+                rétablie}, ou None s'il n'y a rien à rétablir
+        """
+        return self._submit(self._redo)
+    
+    def _redo(self, cursor):
+        cursor.execute("""
+            SELECT revision FROM task_operations WHERE status = 'undone' ORDER BY undone_at DESC LIMIT 1
+        """)
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        
+        target = row[0]
+        cursor.execute('SELECT task_id, task_name, state FROM task_changes WHERE revision = ? ORDER BY id',
+                       (target,))
+        revision = self._apply_images(cursor, 'redo', cursor.fetchall())
+        
+        cursor.execute("UPDATE task_operations SET status = 'done', undone_at = NULL WHERE revision = ?", (target,))
+        return {'revision': revision, 'target': target}
+    
+    def _apply_images(self, cursor, op, images):
+        """
+        Remet des tâches dans l'état décrit par leurs images (None : tâche absente).
+        
+        Args:
+            cursor (sqlite3.Cursor): Curseur de la transaction d'écriture
+            op (str): Opération journalisée ('undo' ou 'redo')
+            images (list): Lignes (task_id, task_name, image JSON), appliquées
+                dans l'ordre
+        
+        Returns:
+            int: Révision produite
+        """
+        touched = dict.fromkeys((task_id, task_name) for task_id, task_name, _ in images)
+        previous = self._task_states(cursor, {task_id for task_id, _ in touched})
+        
+        for task_id, _, image in images:
+            if image is None:
+                cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            else:
+                state = json.loads(image)
+                cursor.execute(RESTORE_SQL, {**state, 'name_key': normalize_text(state['task_name']),
+                                             'match_key': match_key(state['task_name'])})
+        
+        return self._record_changes(cursor, [(op, task_id, task_name, None, None) for task_id, task_name in touched],
+                                    previous, undoable=False)
+    
+    def tasks_at(self, revision):
+        """
+        Reconstruit les tâches telles qu'elles étaient à une révision.
+        
+        La reconstruction part de l'instantané le plus proche en dessous de
+        la révision et rejoue seulement les changements suivants : son coût
+        dépend de l'écart à l'instantané, pas de la longueur de l'historique.
+        
+        Args:
+            revision (int): Révision voulue
+        
+        Returns:
+            list: Tâches (STATE_COLUMNS et color_int) triées par date de début
+        
+        Raises:
+            ValueError: Si la révision précède l'historique conservé
+        """
+        with self._connection() as conn:
             cursor = conn.cursor()
+            cursor.execute('SELECT revision, tasks FROM task_snapshots WHERE revision <= ? ORDER BY revision DESC LIMIT 1',
+                           (revision,))
+            snapshot = cursor.fetchone()
+            if snapshot is None:
+                raise ValueError(f"Révision {revision} antérieure à l'historique conservé")
             
-            # Préparer les valeurs
-            task_name = normalize_text(task_info.get('task_name', 'Unnamed Task'))
+            tasks = {task['id']: task for task in json.loads(snapshot['tasks'])}
             
-            # Extraire start_month et end_month
-            start_month = task_info.get('start_month', [None, None])
-            end_month = task_info.get('end_month', [None, None])
+            cursor.execute('''
+                SELECT task_id, state FROM task_changes WHERE revision > ? AND revision <= ?
+                ORDER BY revision, id
+            ''', (snapshot['revision'], revision))
+            for task_id, state in cursor.fetchall():
+                if state is None:
+                    tasks.pop(task_id, None)
+                else:
+                    tasks[task_id] = json.loads(state)
+        
+        for task in tasks.values():
+            task['color_int'] = pack_color(task['color_rgb'])
+        
+        # Même ordre que list_tasks : tâches sans date de début en premier
+        return sorted(tasks.values(), key=lambda task: (task['start_date'] is not None,
+                                                        task['start_date'] or '', task['id']))
+    
+    def compact_history(self, keep_revisions):
+        """
+        Compacte le journal antérieur aux keep_revisions dernières révisions.
+        
+        Le journal n'est compacté qu'au niveau d'un instantané, qui remplace
+        les changements compactés pour la reconstruction. Les images
+        complètes (state, previous), l'essentiel du volume, sont effacées ;
+        les lignes du journal restent, avec leurs noms et prompts : la
+        recherche (search_changes) et changes_since couvrent toujours tout
+        l'historique. Les opérations compactées ne peuvent plus être
+        annulées, ni les révisions antérieures à l'instantané reconstruites.
+        
+        Args:
+            keep_revisions (int): Nombre de révisions récentes conservées
+        
+        Returns:
+            int: Nombre de changements compactés
+        """
+        return self._submit(self._compact_history, keep_revisions)
+    
+    def _compact_history(self, cursor, keep_revisions):
+        cursor.execute('''
+            SELECT max(revision) FROM task_snapshots
+            WHERE revision <= (SELECT value FROM roadmap_meta WHERE key = 'revision') - ?
+        ''', (keep_revisions,))
+        base = cursor.fetchone()[0]
+        if base is None:
+            return 0
+        
+        cursor.execute('''
+            UPDATE task_changes SET state = NULL, previous = NULL
+            WHERE revision <= ? AND (state IS NOT NULL OR previous IS NOT NULL)
+        ''', (base,))
+        compacted = cursor.rowcount
+        cursor.execute('DELETE FROM task_snapshots WHERE revision < ?', (base,))
+        cursor.execute('DELETE FROM task_operations WHERE revision <= ?', (base,))
+        return compacted
+    
+    def revision(self):
+        """
+        Retourne la révision courante de la base.
+        
+        La révision change à chaque écriture validée : elle sert de clé
+        d'invalidation aux caches d'export et de rendu, y compris entre
+        plusieurs processus servant le même fichier. Elle est mémorisée par
+        connexion et relue seulement quand PRAGMA data_version signale une
+        écriture validée par une autre connexion (autre thread ou autre
+        processus), ou quand l'écrivain de ce processus a validé un lot.
+        
+        Returns:
+            int: Révision courante
+        """
+        conn = self._connection()
+        version = (conn.execute('PRAGMA data_version').fetchone()[0], self._commits)
+        
+        cached = getattr(self._local, 'revision', None)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        row = conn.execute("SELECT value FROM roadmap_meta WHERE key = 'revision'").fetchone()
+        revision = row[0] if row else 0
+        
+        self._local.revision = (version, revision)
+        return revision
+    
+    def changes_since(self, revision, limit=CHANGES_PAGE_SIZE):
+        """
+        Retourne les changements postérieurs à une révision.
+        
+        Args:
+            revision (int): Dernière révision connue du client
+            limit (int): Nombre maximum de changements retournés
+        
+        Returns:
+            list: Changements (revision, op, task_id, task_name, fields,
+                raw_prompt, changed_at) dans l'ordre d'application
+        """
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT revision, op, task_id, task_name, fields, raw_prompt, changed_at
+                FROM task_changes WHERE revision > ?
+                ORDER BY revision, id LIMIT ?
+            ''', (revision, limit))
             
-            # Extraire start_date et end_date
-            start_date = task_info.get('start_date', None)
-            end_date = task_info.get('end_date', None)
+            changes = []
+            for row in cursor.fetchall():
+                change = dict(row)
+                change['fields'] = json.loads(change['fields']) if change['fields'] else None
+                changes.append(change)
             
-            # Convertir color_rgb en chaîne JSON si nécessaire
-            color_rgb = (json.dumps(task_info['color_rgb']) 
-                         if 'color_rgb' in task_info and task_info['color_rgb'] is not None 
-                         else None)
+            return changes
+    
+    def search_changes(self, query, limit=SEARCH_PAGE_SIZE, offset=0):
+        """
+        Recherche dans le journal des changements (noms de tâches et prompts).
+        
+        La recherche passe par l'index FTS5 task_changes_fts et les
+        résultats sont classés par pertinence (bm25) : son coût dépend du
+        nombre de changements trouvés, pas de la taille de l'historique.
+        
+        Args:
+            query (str): Recherche libre, tous les mots doivent apparaître
+            limit (int): Nombre maximum de résultats
+            offset (int): Nombre de résultats à sauter (pagination)
+        
+        Returns:
+            list: Changements (revision, op, task_id, task_name, fields,
+                raw_prompt, changed_at) avec un extrait (snippet) et un score
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT task_changes.revision, task_changes.op, task_changes.task_id,
+                       task_changes.task_name, task_changes.fields, task_changes.raw_prompt,
+                       task_changes.changed_at,
+                       snippet(task_changes_fts, -1, '<mark>', '</mark>', '…', {SNIPPET_TOKENS}) AS snippet,
+                       -task_changes_fts.rank AS score
+                FROM task_changes_fts JOIN task_changes ON task_changes.id = task_changes_fts.rowid
+                WHERE task_changes_fts MATCH ?
+                ORDER BY task_changes_fts.rank LIMIT ? OFFSET ?
+            ''', (match, limit, offset))
             
-            cursor.execute('''
-                INSERT INTO tasks (
-                    task_name, 
-                    start_month, start_position, 
-                    end_month, end_position, 
-                    color_rgb,
-                    start_date,
-                    end_date
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                task_name,
-                start_month[0] if start_month[0] is not None else None, 
-                start_month[1] if start_month[1] is not None else None,
-                end_month[0] if end_month[0] is not None else None, 
-                end_month[1] if end_month[1] is not None else None,
+            results = []
+            for row in cursor.fetchall():
+                result = dict(row)
+                result['fields'] = json.loads(result['fields']) if result['fields'] else None
+                results.append(result)
+            
+            return results
+    
+    def insert_task(self, task_info):
+        """
+        Insère une nouvelle tâche dans la base de données.
+        
+        Args:
+            task_info (dict): Informations de la tâche parsées
+        
+        Returns:
+            int: ID de la tâche insérée
+        
+        Raises:
+            sqlite3.IntegrityError: Si une tâche porte déjà ce nom
+        """
+        return self._submit(self._insert_task, task_info)
+    
+    def _insert_task(self, cursor, task_info):
+        values = task_values(task_info)
+        
+        cursor.execute('''
+            INSERT INTO tasks (
+                task_name, 
+                name_key,
+                match_key,
+                start_month, start_position, 
+                end_month, end_position, 
                 color_rgb,
                 start_date,
-                end_date
-            ))
-            conn.commit()
-            
-            return cursor.lastrowid
+                end_date,
+                updated_at
+            ) VALUES (
+                :task_name,
+                :name_key,
+                :match_key,
+                :start_month, :start_position,
+                :end_month, :end_position,
+                :color_rgb,
+                :start_date,
+                :end_date,
+                CURRENT_TIMESTAMP
+            )
+        ''', values)
+        task_id = cursor.lastrowid
+        self._record_changes(cursor, [('insert', task_id, values['task_name'], changed_fields(values), None)])
+        
+        return task_id
     
     def upsert_task(self, task_info, raw_prompt=None):
         """
         Insère une nouvelle tâche ou met à jour une tâche existante basée sur le task_name.
         
+        L'écriture est une seule requête INSERT ... ON CONFLICT appuyée sur
+        l'index unique du nom : seuls les champs fournis et non nuls
+        écrasent les valeurs existantes.
+        
         Args:
             task_info (dict): Informations de la tâche parsées
             raw_prompt (str, optional): Texte brut du prompt
         
         Returns:
             int: ID de la tâche insérée ou mise à jour
+        
+        Raises:
+            AmbiguousTaskName: Si une mise à jour vise un nom absent, proche
+                d'autres sans désigner l'un d'eux avec certitude
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        return self._submit(self._upsert_task, task_info, raw_prompt)
+    
+    def _upsert_task(self, cursor, task_info, raw_prompt, journal=None):
+        values = task_values(task_info)
+        values['raw_prompt'] = raw_prompt
+        # Une tâche existante n'est modifiée que si un champ est fourni
+        values['has_updates'] = any(values[column] is not None for column in UPSERT_COLUMNS)
+        
+        existing_ids = list(self._ids_by_name(cursor, [values['task_name']]).values())
+        
+        # Une mise à jour vise une tâche existante : accepter un nom approché sans ambiguïté
+        if not existing_ids and task_info.get('type') == 'update':
+            match = self._resolve_target(cursor, values['task_name'])
+            if match:
+                print(f"Tâche '{values['task_name']}' rapprochée de '{match['task_name']}'")
+                values.update(task_name=match['task_name'], name_key=match['task_name'],
+                              match_key=match_key(match['task_name']))
+                existing_ids = [match['id']]
+        
+        previous = self._task_states(cursor, existing_ids)
+        cursor.execute(UPSERT_SQL, values)
+        row = cursor.fetchone()
+        
+        if row:
+            task_id = row[0]
+            op = 'update' if existing_ids else 'insert'
+            self._journal(cursor, journal, (op, task_id, values['task_name'], changed_fields(values), raw_prompt),
+                          previous)
+        else:
+            # Aucune mise à jour n'est nécessaire
+            cursor.execute('SELECT id FROM tasks WHERE task_name = ?', (values['task_name'],))
+            task_id = cursor.fetchone()[0]
+        
+        return task_id
+    
+    def apply_actions(self, actions, raw_prompt=None):
+        """
+        Applique les actions d'un prompt composé dans une seule transaction.
+        
+        Les créations et mises à jour suivent les règles de upsert_task, les
+        suppressions celles de delete_task. L'ensemble produit une seule
+        révision (annulée d'un bloc par undo) ; si une action échoue, aucune
+        n'est appliquée.
+        
+        Args:
+            actions (list): Tâches parsées, chacune avec son type
+                ('create', 'update' ou 'delete')
+            raw_prompt (str, optional): Texte brut du prompt
+        
+        Returns:
+            list: Pour chaque action, l'ID de la tâche créée ou mise à jour,
+                ou un booléen indiquant si la suppression a eu lieu
+        
+        Raises:
+            ValueError: Si une action a un type inconnu
+            AmbiguousTaskName: Si une action vise un nom ambigu
+        """
+        return self._submit(self._apply_actions, list(actions), raw_prompt)
+    
+    def _apply_actions(self, cursor, actions, raw_prompt):
+        journal = {'changes': [], 'previous': {}, 'touched': set()}
+        results = []
+        
+        for task_info in actions:
+            if task_info.get('type') in ('create', 'update'):
+                results.append(self._upsert_task(cursor, task_info, raw_prompt, journal))
+            elif task_info.get('type') == 'delete':
+                task_name = normalize_text(task_info.get('task_name') or '')
+                results.append(bool(task_name) and self._delete_task(cursor, task_name, raw_prompt, journal))
+            else:
+                raise ValueError(f"Type d'action inconnu : {task_info.get('type')}")
+        
+        if journal['changes']:
+            self._record_changes(cursor, journal['changes'], journal['previous'])
+        
+        return results
+    
+    def update_task(self, task_id, task_info, raw_prompt=None):
+        """
+        Met à jour une tâche désignée par son id (édition structurée, sans LLM).
+        
+        Seuls les champs fournis et non nuls sont modifiés ; un task_name
+        fourni renomme la tâche.
+        
+        Args:
+            task_id (int): ID de la tâche
+            task_info (dict): Champs à modifier, au format des tâches parsées
+            raw_prompt (str, optional): Texte décrivant la modification
+        
+        Returns:
+            dict or None: Tâche après modification, ou None si elle n'existe pas
+        
+        Raises:
+            sqlite3.IntegrityError: Si le nouveau nom est celui d'une autre tâche
+        """
+        return self._submit(self._update_task, task_id, task_info, raw_prompt)
+    
+    def _update_task(self, cursor, task_id, task_info, raw_prompt):
+        previous = self._task_states(cursor, [task_id])
+        if not previous:
+            return None
+        
+        values = task_values(task_info)
+        columns = [column for column in UPSERT_COLUMNS if values[column] is not None]
+        fields = changed_fields(values)
+        if task_info.get('task_name'):
+            columns += ['task_name', 'name_key', 'match_key']
+            fields['task_name'] = values['task_name']
+        
+        if columns:
+            values.update(id=task_id, raw_prompt=raw_prompt)
+            cursor.execute(f'''
+                UPDATE tasks SET {', '.join(f'{column} = :{column}' for column in columns)},
+                    raw_prompt = COALESCE(:raw_prompt, raw_prompt),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = :id
+            ''', values)
             
-            # Préparer les valeurs
-            task_name = normalize_text(task_info.get('task_name', 'Unnamed Task'))
+            task_name = values['task_name'] if 'task_name' in fields else previous[task_id]['task_name']
+            self._record_changes(cursor, [('update', task_id, task_name, fields, raw_prompt)], previous)
+        
+        cursor.execute('SELECT * FROM tasks WHERE id = ?', (task_id,))
+        return dict(cursor.fetchone())
+    
+    def bulk_upsert(self, tasks, raw_prompt=None, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Insère ou met à jour un flux de tâches dans une seule transaction.
+        
+        Les tâches sont consommées par paquets de chunk_size (executemany) :
+        le flux n'est jamais chargé entièrement en mémoire, ce qui permet de
+        passer directement un générateur lisant un fichier JSONL ou CSV.
+        Chaque paquet est journalisé dès qu'il est écrit, sous la révision
+        unique de l'import. Les règles de mise à jour sont celles de
+        upsert_task.
+        
+        Le flux est lu dans la transaction de l'écrivain : il doit être
+        local (fichier, tampon), pas une connexion réseau lente.
+        
+        Args:
+            tasks (iterable): Informations des tâches parsées (dict)
+            raw_prompt (str, optional): Prompt appliqué aux tâches qui n'en
+                fournissent pas (clé 'raw_prompt')
+            chunk_size (int): Nombre de tâches par paquet
+        
+        Returns:
+            dict: Nombre de tâches lues (imported), créées (created) et
+                portant le nom d'une tâche existante (updated, conflits)
+        """
+        return self._submit(self._bulk_upsert, iter(tasks), raw_prompt, chunk_size)
+    
+    def _bulk_upsert(self, cursor, tasks, raw_prompt, chunk_size):
+        counts = {'imported': 0, 'created': 0, 'updated': 0}
+        revision = None
+        
+        while True:
+            chunk = list(islice(tasks, chunk_size))
+            if not chunk:
+                break
             
-            # Convertir color_rgb en chaîne JSON si nécessaire
-            color_rgb = (json.dumps(task_info['color_rgb']) 
-                         if 'color_rgb' in task_info and task_info['color_rgb'] is not None 
-                         else None)
+            rows = []
+            for task_info in chunk:
+                values = task_values(task_info)
+                values['raw_prompt'] = task_info.get('raw_prompt', raw_prompt)
+                values['has_updates'] = any(values[column] is not None for column in UPSERT_COLUMNS)
+                rows.append(values)
             
-            # Vérifier si la tâche existe déjà
-            cursor.execute('SELECT * FROM tasks WHERE task_name = ?', (task_name,))
-            existing_task = cursor.fetchone()
+            names = list({values['task_name'] for values in rows})
+            existing = self._ids_by_name(cursor, names)
+            # Images d'avant le paquet : annuler l'import rejoue les paquets à l'envers
+            previous = self._task_states(cursor, existing.values())
             
-            if existing_task:
-                # Préparer les colonnes à mettre à jour
-                update_fields = {}
-                
-                # Colonnes possibles à mettre à jour
-                columns_mapping = {
-                    'start_month': task_info.get('start_month', [None, None])[0],
-                    'start_position': task_info.get('start_month', [None, None])[1],
-                    'end_month': task_info.get('end_month', [None, None])[0],
-                    'end_position': task_info.get('end_month', [None, None])[1],
-                    'color_rgb': color_rgb,
-                    'start_date': task_info.get('start_date'),
-                    'end_date': task_info.get('end_date'),
-                    'raw_prompt': raw_prompt
-                }
-                
-                # Ne conserver que les valeurs explicitement fournies et non-None
-                keys_to_check = ['start_month', 'start_position', 'end_month', 'end_position', 
-                                 'color_rgb', 'start_date', 'end_date', 'raw_prompt']
-                
-                update_fields = {
-                    k: columns_mapping[k] 
-                    for k in keys_to_check 
-                    if k in task_info and columns_mapping[k] is not None
-                }
-                
-                if update_fields:
-                    # Construire la requête de mise à jour
-                    set_clause = ", ".join([f"{col} = ?" for col in update_fields.keys()])
-                    update_query = f"""
-                        UPDATE tasks 
-                        SET {set_clause}, created_at = CURRENT_TIMESTAMP
-                        WHERE task_name = ?
-                    """
-                    
-                    # Préparer les valeurs
-                    update_values = list(update_fields.values()) + [task_name]
-                    
-                    cursor.execute(update_query, update_values)
-                    task_id = existing_task[0]
-                else:
-                    # Aucune mise à jour n'est nécessaire
-                    task_id = existing_task[0]
+            cursor.executemany(UPSERT_SQL, rows)
             
-            else:
-                # Insérer une nouvelle tâche
-                start_month = task_info.get('start_month', [None, None])
-                end_month = task_info.get('end_month', [None, None])
+            ids = self._ids_by_name(cursor, names)
+            seen = set(existing)
+            changes = []
+            for values in rows:
+                conflict = values['task_name'] in seen
+                seen.add(values['task_name'])
+                counts['updated' if conflict else 'created'] += 1
                 
-                # Extraire start_date et end_date
-                start_date = task_info.get('start_date', None)
-                end_date = task_info.get('end_date', None)
-                
-                cursor.execute('''
-                    INSERT INTO tasks (
-                        task_name, 
-                        start_month, start_position, 
-                        end_month, end_position, 
-                        color_rgb,
-                        start_date,
-                        end_date,
-                        raw_prompt
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    task_name,
-                    start_month[0] if start_month[0] is not None else None, 
-                    start_month[1] if start_month[1] is not None else None,
-                    end_month[0] if end_month[0] is not None else None, 
-                    end_month[1] if end_month[1] is not None else None,
-                    color_rgb,
-                    start_date,
-                    end_date,
-                    raw_prompt
-                ))
-                task_id = cursor.lastrowid
-            
-            conn.commit()
+                if values['has_updates'] or not conflict:
+                    changes.append(('update' if conflict else 'insert', ids[values['task_name']],
+                                    values['task_name'], changed_fields(values), values['raw_prompt']))
+            counts['imported'] += len(rows)
             
-            return task_id
+            if changes:
+                if revision is None:
+                    revision = self._open_revision(cursor)
+                self._log_changes(cursor, revision, changes, previous)
+        
+        if revision is not None:
+            self._close_revision(cursor, revision)
+        
+        return counts
+    
+    def _ids_by_name(self, cursor, task_names):
+        """
+        Retourne les identifiants des tâches existantes, indexés par nom normalisé.
+        
+        Args:
+            cursor (sqlite3.Cursor): Curseur de la transaction courante
+            task_names (list): Noms normalisés recherchés
+        
+        Returns:
+            dict: {task_name: id}
+        """
+        placeholders = ', '.join('?' * len(task_names))
+        cursor.execute(f'SELECT task_name, id FROM tasks WHERE task_name IN ({placeholders})', task_names)
+        return {task_name: task_id for task_name, task_id in cursor.fetchall()}
+    
+    def resolve_task_name(self, candidate, threshold=None, limit=5):
+        """
+        Recherche les tâches dont le nom est proche d'un nom candidat.
+        
+        L'index des trigrammes fournit les candidats qui en partagent le plus
+        avec le nom cherché, sans parcourir la table ; seuls ces candidats
+        sont ensuite notés (similarité de Dice).
+        
+        Args:
+            candidate (str): Nom cherché, tel que produit par le LLM
+            threshold (float, optional): Similarité minimale (seuil de
+                l'instance par défaut)
+            limit (int): Nombre maximum de résultats
+        
+        Returns:
+            list: Dicts {id, task_name, score}, du plus proche au moins proche
+        """
+        threshold = self.match_threshold if threshold is None else threshold
+        
+        with self._connection() as conn:
+            return self._resolve(conn.cursor(), candidate, threshold, limit)
+    
+    def _resolve(self, cursor, candidate, threshold, limit):
+        key = match_key(candidate)
+        if not key:
+            return []
+        
+        key_trigrams = sorted(trigrams(key))
+        placeholders = ', '.join('?' * len(key_trigrams))
+        cursor.execute(f'''
+            SELECT tasks.id, tasks.task_name, tasks.match_key FROM (
+                SELECT task_id, count(*) AS shared FROM task_name_trigrams
+                WHERE trigram IN ({placeholders})
+                GROUP BY task_id ORDER BY shared DESC LIMIT ?
+            ) AS candidates JOIN tasks ON tasks.id = candidates.task_id
+        ''', (*key_trigrams, MATCH_CANDIDATES))
+        
+        return rank_matches(key, cursor.fetchall(), threshold)[:limit]
+    
+    def _resolve_target(self, cursor, task_name):
+        """
+        Choisit la tâche visée par une mise à jour ou une suppression au nom
+        inexact (voir select_match) parmi les noms proches.
+        
+        Raises:
+            AmbiguousTaskName: Si des noms sont proches sans qu'aucun soit
+                assez sûr ; rien n'est modifié
+        """
+        matches = self._resolve(cursor, task_name, self.match_threshold, MATCH_CANDIDATES)
+        return select_match(task_name, matches, self.auto_match_threshold, self.auto_match_margin)
+    
+    def get_task(self, task_id):
+        """
+        Récupère une tâche par son id.
+        
+        Args:
+            task_id (int): ID de la tâche
+        
+        Returns:
+            dict or None: Informations de la tâche
+        """
+        with self._connection() as conn:
+            row = conn.execute('SELECT * FROM tasks WHERE id = ?', (task_id,)).fetchone()
+            return dict(row) if row else None
     
     def get_task_by_name(self, task_name):
         """
@@ -236,8 +1372,7 @@ class TaskDatabase:
         Returns:
             dict or None: Informations de la tâche
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('SELECT * FROM tasks WHERE task_name = ? ORDER BY created_at DESC LIMIT 1', (normalize_text(task_name),))
@@ -245,24 +1380,157 @@ class TaskDatabase:
             
             return dict(row) if row else None
     
-    def list_tasks(self, limit=50):
+    def list_tasks(self, limit=None):
         """
-        Liste les tâches récentes.
+        Liste les tâches triées par date de début.
         
         Args:
-            limit (int): Nombre maximum de tâches à retourner
+            limit (int, optional): Nombre maximum de tâches à retourner
+                (toutes par défaut)
         
         Returns:
             list: Liste des tâches
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+        return list(islice(self.iter_tasks(), limit))
+    
+    def iter_task_rows(self, columns, window=None):
+        """
+        Parcourt toutes les tâches sous forme de tuples, par date de début.
+        
+        Variante sans dict de iter_tasks, pour construire des instantanés
+        colonnaires (voir core.task_table.TaskTable).
+        
+        Args:
+            columns (tuple): Noms des colonnes à lire, dans l'ordre voulu
+            window (tuple, optional): Période (début, fin) ; seules les tâches
+                datées qui la chevauchent sont lues (voir tasks_overlapping)
+        
+        Yields:
+            tuple: Valeurs des colonnes demandées
+        """
+        unknown = set(columns) - TASK_COLUMNS
+        if unknown:
+            raise ValueError(f"Colonnes inconnues : {sorted(unknown)}")
+        
+        cursor = self._connection().cursor()
+        cursor.row_factory = None
+        selected = ', '.join(f'tasks.{column}' for column in columns)
+        
+        if window is None:
+            cursor.execute(f'SELECT {selected} FROM tasks ORDER BY start_date, id')
+        else:
+            where, params = self._window_clause(*window)
+            cursor.execute(f'''
+                SELECT {selected} FROM task_spans CROSS JOIN tasks ON tasks.id = task_spans.id
+                WHERE {where} ORDER BY tasks.start_date, tasks.id
+            ''', params)
+        
+        while True:
+            rows = cursor.fetchmany(ITER_BATCH_SIZE)
+            if not rows:
+                return
+            yield from rows
+    
+    def tasks_overlapping(self, start=None, end=None):
+        """
+        Liste les tâches dont la période [start_date, end_date] chevauche [start, end].
+        
+        La recherche passe par l'index R*Tree task_spans : son coût dépend
+        du nombre de tâches trouvées, pas de la taille de la table. Les
+        tâches sans date de début ou de fin lisible ne sont jamais retournées.
+        
+        Args:
+            start (str, optional): Début de la période ('AAAA/MM/JJ' ou
+                'AAAA-MM-JJ'), ouverte si None
+            end (str, optional): Fin de la période, ouverte si None
+        
+        Returns:
+            list: Tâches triées par date de début
+        """
+        where, params = self._window_clause(start, end)
+        
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT tasks.* FROM task_spans CROSS JOIN tasks ON tasks.id = task_spans.id
+                WHERE {where} ORDER BY tasks.start_date, tasks.id
+            ''', params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def _window_clause(start, end):
+        """Contraintes sur task_spans pour une période, bornes None ouvertes."""
+        clauses, params = ['1'], []
+        if start is not None:
+            clauses.append(f"task_spans.end_day >= {_day_number('?')}")
+            params.append(start)
+        if end is not None:
+            clauses.append(f"task_spans.start_day <= {_day_number('?')}")
+            params.append(end)
+        return ' AND '.join(clauses), params
+    
+    def iter_tasks(self, since=None, batch=ITER_BATCH_SIZE):
+        """
+        Parcourt les tâches par date de début, par pages (pagination par clé).
+        
+        Chaque page est une requête sur l'index (start_date, id) qui reprend
+        après la dernière tâche lue : le coût d'une page ne dépend pas de sa
+        position et la mémoire reste bornée à une page.
+        
+        Args:
+            since (tuple, optional): Curseur (start_date, id) de la dernière
+                tâche déjà lue ; le parcours commence juste après
+            batch (int): Nombre de tâches lues par requête
+        
+        Yields:
+            dict: Tâches dans l'ordre (start_date, id), sans date en premier
+        """
+        while True:
+            rows = self._task_page(since, batch)
+            for row in rows:
+                yield dict(row)
+            
+            if len(rows) < batch:
+                return
+            since = (rows[-1]['start_date'], rows[-1]['id'])
+    
+    def _task_page(self, since, limit):
+        """
+        Lit une page de tâches après le curseur since.
+        
+        Les tâches sans start_date sont triées en premier (NULL en tête
+        dans SQLite) et ne sont pas comparables par valeur de ligne : elles
+        sont parcourues par id avant de passer aux tâches datées.
+        """
+        with self._connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('SELECT * FROM tasks ORDER BY start_date ASC LIMIT ?', (limit,))
+            if since is None:
+                cursor.execute('SELECT * FROM tasks ORDER BY start_date, id LIMIT ?', (limit,))
+                return cursor.fetchall()
+            
+            start_date, task_id = since
+            if start_date is not None:
+                cursor.execute('''
+                    SELECT * FROM tasks WHERE (start_date, id) > (?, ?)
+                    ORDER BY start_date, id LIMIT ?
+                ''', (start_date, task_id, limit))
+                return cursor.fetchall()
+            
+            cursor.execute('''
+                SELECT * FROM tasks WHERE start_date IS NULL AND id > ?
+                ORDER BY start_date, id LIMIT ?
+            ''', (task_id, limit))
             rows = cursor.fetchall()
             
-            return [dict(row) for row in rows]
+            if len(rows) < limit:
+                cursor.execute('''
+                    SELECT * FROM tasks WHERE start_date IS NOT NULL
+                    ORDER BY start_date, id LIMIT ?
+                ''', (limit - len(rows),))
+                rows += cursor.fetchall()
+            
+            return rows
     
     def delete_task(self, task_info, raw_prompt=None):
         """
@@ -274,9 +1542,13 @@ class TaskDatabase:
         
         Returns:
             bool: True si la suppression a réussi, False sinon
+        
+        Raises:
+            AmbiguousTaskName: Si le nom n'existe pas mais ressemble à
+                d'autres sans désigner l'un d'eux avec certitude
         """
         # Extraire et normaliser le nom de la tâche
-        task_name = normalize_text(task_info.get('task_name'))
+        task_name = normalize_text(task_info.get('task_name') or '')
         
         # Vérifier que le nom de tâche est présent
         if not task_name:
@@ -284,33 +1556,84 @@ class TaskDatabase:
             return False
         
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Récupérer tous les noms de tâches
-                cursor.execute('SELECT task_name FROM tasks')
-                existing_tasks = cursor.fetchall()
-                
-                # Trouver la tâche correspondante après normalisation
-                matching_task = None
-                for (existing_task_name,) in existing_tasks:
-                    if normalize_text(existing_task_name) == task_name:
-                        matching_task = existing_task_name
-                        break
-                
-                if matching_task:
-                    # Exécuter la suppression avec le nom de tâche original
-                    cursor.execute('DELETE FROM tasks WHERE task_name = ?', (matching_task,))
-                    
-                    # Vérifier si une ligne a été supprimée
-                    if cursor.rowcount > 0:
-                        print(f"Tâche '{matching_task}' supprimée avec succès")
-                        conn.commit()
-                        return True
-                
-                print(f"Aucune tâche trouvée correspondant à '{task_name}'")
-                return False
+            return self._submit(self._delete_task, task_name, raw_prompt)
         
         except sqlite3.Error as e:
             print(f"Erreur lors de la suppression de la tâche : {e}")
             return False
+    
+    def _delete_task(self, cursor, task_name, raw_prompt, journal=None):
+        # Trouver la tâche correspondante via l'index de la clé normalisée
+        cursor.execute('SELECT id, task_name FROM tasks WHERE name_key = ? ORDER BY id LIMIT 1',
+                       (task_name,))
+        matching_task = cursor.fetchone()
+        
+        # À défaut, un nom approché sans ambiguïté
+        if not matching_task:
+            matching_task = self._resolve_target(cursor, task_name)
+        
+        if matching_task:
+            previous = self._task_states(cursor, [matching_task['id']])
+            cursor.execute('DELETE FROM tasks WHERE id = ?', (matching_task['id'],))
+            
+            # Vérifier si une ligne a été supprimée
+            if cursor.rowcount > 0:
+                print(f"Tâche '{matching_task['task_name']}' supprimée avec succès")
+                self._journal(cursor, journal, ('delete', matching_task['id'], matching_task['task_name'],
+                                                None, raw_prompt), previous)
+                return True
+        
+        print(f"Aucune tâche trouvée correspondant à '{task_name}'")
+        return False
+    
+    def delete_task_by_id(self, task_id, raw_prompt=None):
+        """
+        Supprime une tâche désignée par son id.
+        
+        Args:
+            task_id (int): ID de la tâche
+            raw_prompt (str, optional): Texte décrivant la suppression
+        
+        Returns:
+            bool: True si la tâche existait
+        """
+        return self._submit(self._delete_task_by_id, task_id, raw_prompt)
+    
+    def _delete_task_by_id(self, cursor, task_id, raw_prompt):
+        previous = self._task_states(cursor, [task_id])
+        if not previous:
+            return False
+        
+        cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+        self._record_changes(cursor, [('delete', task_id, previous[task_id]['task_name'], None, raw_prompt)],
+                             previous)
+        return True
+    
+    def delete_tasks(self, task_names):
+        """
+        Supprime plusieurs tâches par leur nom dans une seule transaction.
+        
+        Args:
+            task_names (iterable): Noms des tâches à supprimer
+        
+        Returns:
+            int: Nombre de tâches supprimées
+        """
+        name_keys = {normalize_text(task_name) for task_name in task_names if task_name}
+        name_keys.discard('')
+        
+        return self._submit(self._delete_tasks, name_keys)
+    
+    def _delete_tasks(self, cursor, name_keys):
+        changes = []
+        previous = {}
+        for name_key in name_keys:
+            cursor.execute(f'DELETE FROM tasks WHERE name_key = ? RETURNING {", ".join(STATE_COLUMNS)}', (name_key,))
+            for row in cursor.fetchall():
+                previous[row[0]] = dict(zip(STATE_COLUMNS, row))
+                changes.append(('delete', row[0], row[1], None, None))
+        
+        if changes:
+            self._record_changes(cursor, changes, previous)
+        
+        return len(changes)
@@ -0,0 +1,80 @@
+"""
+Benchmark du moteur de mise en page.
+
+Mesure toute la chaîne d'une mise en page (bornes en mois, répartition en
+lignes, géométrie) et vérifie qu'elle croît quasi linéairement avec le
+nombre de tâches, jusqu'à 100 000 tâches : sur des tâches aléatoires triées
+par début, et sur le pire cas de la répartition (toutes les tâches se
+chevauchent, une ligne ouverte par tâche).
+
+Usage : python tests/bench_layout.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.layout import assign_lanes, compute_layout, month_bounds
+
+SIZES = [1_000, 10_000, 100_000]
+REPEAT = 3
+
+
+def random_tasks(size, rng):
+    # Tâches triées par début, comme les lit TaskTable
+    start_month = np.sort(rng.integers(0, 12, size))
+    end_month = np.minimum(start_month + rng.integers(0, 6, size), 11)
+    start_position = rng.choice([0.0, 0.5, 1.0], size)
+    end_position = rng.choice([0.0, 0.5, 1.0], size)
+    return start_month, start_position, end_month, end_position
+
+
+def overlapping_tasks(size, rng):
+    # Toutes les tâches durent jusqu'à la fin de l'année : une ligne chacune
+    start_month = np.sort(rng.integers(0, 6, size))
+    return start_month, np.zeros(size), np.full(size, 11), np.ones(size)
+
+
+def layout(columns):
+    starts, ends = month_bounds(*columns)
+    lanes, _ = assign_lanes(starts, ends)
+    return compute_layout(*columns, lanes)
+
+
+def bench(workload, size, rng):
+    columns = workload(size, rng)
+
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        layout(columns)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    rng = np.random.default_rng(0)
+    status = 0
+
+    for workload in (random_tasks, overlapping_tasks):
+        print(workload.__name__)
+        timings = [(size, bench(workload, size, rng)) for size in SIZES]
+
+        for size, elapsed in timings:
+            print(f"{size:>7} tâches : {elapsed * 1000:8.2f} ms ({elapsed / size * 1e9:6.1f} ns/tâche)")
+
+        # Quasi linéaire : le coût par tâche à 100k ne dépasse pas 3x celui à 10k
+        per_task = {size: elapsed / size for size, elapsed in timings}
+        ratio = per_task[SIZES[-1]] / per_task[SIZES[-2]]
+        print(f"Rapport coût/tâche {SIZES[-1]} vs {SIZES[-2]} : {ratio:.2f}")
+        if ratio >= 3:
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Benchmark de la construction d'une TaskTable.
+
+Mesure TaskTable.from_rows (lecture des lignes, bornes, répartition en
+lignes) sur le pire cas de la répartition — chaque tâche chevauche toutes
+les précédentes, une ligne ouverte par tâche — et vérifie que le coût par
+tâche reste quasi constant quand le nombre de tâches croît.
+
+Usage : python tests/bench_task_table.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.task_table import TaskTable
+
+SIZES = [2_000, 40_000]
+REPEAT = 5
+
+
+def overlapping_rows(size):
+    # Chaque tâche chevauche toutes les précédentes : une ligne ouverte par tâche
+    return [(index, f'p{index}', index % 6, 0.0, 11, 1.0, None, '2025/01/01', '2025/12/31')
+            for index in range(size)]
+
+
+def bench(size):
+    rows = overlapping_rows(size)
+
+    best = float('inf')
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        TaskTable.from_rows(rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    timings = [(size, bench(size)) for size in SIZES]
+
+    for size, elapsed in timings:
+        print(f"{size:>7} tâches : {elapsed * 1000:8.2f} ms ({elapsed / size * 1e9:6.1f} ns/tâche)")
+
+    # Quasi linéaire : 20x plus de tâches ne coûtent pas 5x plus par tâche
+    # (une répartition quadratique coûterait 20x plus)
+    per_task = {size: elapsed / size for size, elapsed in timings}
+    ratio = per_task[SIZES[-1]] / per_task[SIZES[0]]
+    print(f"Rapport coût/tâche {SIZES[-1]} vs {SIZES[0]} : {ratio:.2f}")
+    return 0 if ratio < 5 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
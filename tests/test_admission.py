@@ -0,0 +1,129 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from core.admission import (BATCH, INTERACTIVE, Abandoned, AdmissionController, DeficitRoundRobin, Overloaded,
+                            socket_closed)
+
+
+def _hold(controller, release, admitted=None):
+    with controller.admit():
+        if admitted is not None:
+            admitted.set()
+        release.wait(5.0)
+
+
+def test_full_queue_is_rejected_with_retry_after():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, initial_service_time=4.0,
+                                     check_interval=0.01)
+    release = threading.Event()
+    admitted = threading.Event()
+
+    running = threading.Thread(target=_hold, args=(controller, release, admitted))
+    running.start()
+    admitted.wait(5.0)
+    queued = threading.Thread(target=_hold, args=(controller, release))
+    queued.start()
+    time.sleep(0.05)
+
+    with pytest.raises(Overloaded) as error:
+        with controller.admit():
+            pass
+    # Deux appels devant (un en cours, un en file) de 4 s chacun
+    assert error.value.retry_after == 8
+
+    release.set()
+    running.join(5.0)
+    queued.join(5.0)
+
+    # Les durées mesurées remplacent progressivement l'estimation initiale
+    assert controller.service_time < 4.0
+    assert controller.retry_after() == 1
+
+
+def test_abandoned_request_leaves_the_queue():
+    controller = AdmissionController(max_in_flight=1, max_queue=1, check_interval=0.01)
+    release = threading.Event()
+    admitted = threading.Event()
+    running = threading.Thread(target=_hold, args=(controller, release, admitted))
+    running.start()
+    admitted.wait(5.0)
+
+    gone = threading.Event()
+    threading.Timer(0.05, gone.set).start()
+    with pytest.raises(Abandoned):
+        with controller.admit(gone.is_set):
+            pass
+
+    # La place libérée dans la file est de nouveau disponible
+    queued = threading.Thread(target=_hold, args=(controller, release))
+    queued.start()
+    time.sleep(0.05)
+    release.set()
+    running.join(5.0)
+    queued.join(5.0)
+    assert not queued.is_alive()
+
+
+def test_socket_closed_detects_peer_shutdown():
+    server, client = socket.socketpair()
+    try:
+        assert not socket_closed(server)
+        client.sendall(b'GET')
+        assert not socket_closed(server)
+
+        client.close()
+        server.recv(3)
+        assert socket_closed(server)
+        assert not socket_closed(None)
+    finally:
+        server.close()
+
+
+def test_deficit_round_robin_shares_between_callers():
+    queue = DeficitRoundRobin(weights={'vip': 2})
+    for index in range(4):
+        queue.push('script', f'script-{index}')
+    for index in range(2):
+        queue.push('alice', f'alice-{index}')
+    for index in range(4):
+        queue.push('vip', f'vip-{index}')
+
+    order = [queue.pop() for _ in range(10)]
+
+    # Un appelant très actif n'obtient pas plus que sa part ; vip a un poids double
+    assert order[:5] == ['script-0', 'alice-0', 'vip-0', 'vip-1', 'script-1']
+    assert order.index('alice-1') < order.index('script-2')
+    assert queue.pop() is None and len(queue) == 0
+
+
+def test_interactive_requests_overtake_batch_work():
+    controller = AdmissionController(max_in_flight=2, max_queue=8, check_interval=0.01)
+    release = threading.Event()
+    started = []
+    lock = threading.Lock()
+
+    def run(name, priority):
+        with controller.admit(caller=name, priority=priority):
+            with lock:
+                started.append(name)
+            release.wait(5.0)
+
+    # Le travail de fond ne prend qu'une place : la seconde reste aux interactifs
+    threads = [threading.Thread(target=run, args=(f'batch-{index}', BATCH)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    assert started == ['batch-0']
+
+    interactive = threading.Thread(target=run, args=('user', INTERACTIVE))
+    interactive.start()
+    time.sleep(0.05)
+    assert started == ['batch-0', 'user']
+
+    release.set()
+    for thread in threads + [interactive]:
+        thread.join(5.0)
+    assert sorted(started) == ['batch-0', 'batch-1', 'batch-2', 'user']
@@ -0,0 +1,131 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture(params=['sqlite', 'sqlalchemy'])
+def roadmap(request, tmp_path, monkeypatch):
+    # Application importée depuis un répertoire vide, comme sur une copie
+    # neuve : ni tasks.db, ni templates/, ni generated/
+    monkeypatch.chdir(tmp_path)
+    if request.param == 'sqlalchemy':
+        monkeypatch.setenv('TASKS_DATABASE_URL', f"sqlite:///{tmp_path / 'shared.db'}")
+    else:
+        monkeypatch.delenv('TASKS_DATABASE_URL', raising=False)
+    # Le rendu différé ne part pas tout seul pendant un test
+    monkeypatch.setenv('PRESENTATION_DEBOUNCE', '60')
+    sys.modules.pop('generate_roadmap', None)
+    module = importlib.import_module('generate_roadmap')
+    yield module
+    module.cancel_presentation_update()
+    module.task_db.close()
+    sys.modules.pop('generate_roadmap', None)
+
+
+@pytest.fixture
+def client(roadmap):
+    return roadmap.app.test_client()
+
+
+def _create(client, name, start='2025-03-01', end='2025-05-31'):
+    response = client.post('/api/tasks', json={'task_name': name, 'start_date': start, 'end_date': end})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_structured_edit_renders_from_an_empty_directory(roadmap, client, tmp_path):
+    task = _create(client, 'P1')
+    assert client.patch(f"/api/tasks/{task['id']}", json={'color_rgb': 'rouge'}).status_code == 200
+
+    # Le rendu différé (ici celui de l'arrêt) crée ses répertoires
+    roadmap.flush_presentation_update()
+
+    assert (tmp_path / 'templates' / 'roadmap.pptx').exists()
+    assert (tmp_path / 'generated' / 'roadmap.pptx').exists()
+    assert not (tmp_path / 'generated' / 'roadmap.pptx.tmp').exists()
+
+
+def test_undo_and_redo_routes(client, tmp_path):
+    task = _create(client, 'P1')
+    assert client.delete(f"/api/tasks/{task['id']}").status_code == 204
+
+    response = client.post('/api/tasks/undo')
+    assert response.status_code == 200
+    assert [entry['task_name'] for entry in client.get('/api/tasks').get_json()] == ['p1']
+    # La présentation est rendue après l'annulation, même sur une copie neuve
+    assert (tmp_path / 'generated' / 'roadmap.pptx').exists()
+
+    response = client.post('/api/tasks/redo')
+    assert response.status_code == 200
+    assert client.get('/api/tasks').get_json() == []
+
+    assert client.post('/api/tasks/redo').status_code == 409
+
+
+def test_import_route_returns_the_counts(client, tmp_path):
+    _create(client, 'P1')
+    body = ('{"task_name": "P1", "start_month": [1, 0.0], "end_month": [3, 1.0]}\n'
+            '{"task_name": "P2", "color_rgb": [255, 0, 0]}\n')
+
+    response = client.post('/api/tasks/import', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'imported': 2, 'created': 1, 'updated': 1}
+    assert (tmp_path / 'generated' / 'roadmap.pptx').exists()
+
+    csv_body = 'task_name,start_month,start_position,end_month,end_position,color_rgb\nP3,4,0.5,6,1.0,"0,0,255"\n'
+    response = client.post('/api/tasks/import', data=csv_body, content_type='text/csv')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'imported': 1, 'created': 1, 'updated': 0}
+
+
+def test_patch_cannot_invert_the_stored_range(client):
+    task = _create(client, 'P1', start='2025-03-01', end='2025-05-31')
+
+    response = client.patch(f"/api/tasks/{task['id']}", json={'end_date': '2025-01-05'})
+    assert response.status_code == 400
+    response = client.patch(f"/api/tasks/{task['id']}", json={'start_date': '2025-07-01'})
+    assert response.status_code == 400
+
+    assert client.get(f"/api/tasks/{task['id']}").get_json()['end_date'] == '2025/05/31'
+    assert client.patch(f"/api/tasks/{task['id']}", json={'end_date': '2025-03-20'}).status_code == 200
+    assert client.get('/api/roadmap.png').status_code == 200
+
+    assert client.patch('/api/tasks/999', json={'end_date': '2025-03-20'}).status_code == 404
+
+
+def test_history_search_and_time_travel_routes(client):
+    task = _create(client, 'P1')
+    client.patch(f"/api/tasks/{task['id']}", json={'end_date': '2025-06-30'})
+
+    results = client.get('/api/search?q=patch').get_json()['results']
+    assert [result['op'] for result in results] == ['update']
+
+    tasks = client.get('/api/tasks?at=1').get_json()
+    assert [entry['task_name'] for entry in tasks] == ['p1']
+
+
+def test_task_list_is_served_conditionally(client):
+    _create(client, 'P1')
+
+    response = client.get('/api/tasks')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    for header in (etag, f'W/{etag}', f'"autre", {etag}', '*'):
+        response = client.get('/api/tasks', headers={'If-None-Match': header})
+        assert response.status_code == 304, header
+        assert response.headers['ETag'] == etag
+
+    assert client.get('/api/tasks', headers={'If-None-Match': '"tasks-0"'}).status_code == 200
+
+    _create(client, 'P2')
+    response = client.get('/api/tasks', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [entry['task_name'] for entry in response.get_json()] == ['p1', 'p2']
@@ -0,0 +1,54 @@
+import threading
+
+from core.change_feed import ChangeFeed
+
+
+def test_wait_returns_as_soon_as_the_revision_moves():
+    revisions = [1]
+    feed = ChangeFeed(lambda: revisions[0], poll_interval=0.01)
+
+    assert feed.wait(None, timeout=1.0) == 1
+
+    # Délai expiré sans écriture : la révision est inchangée
+    assert feed.wait(1, timeout=0.05) == 1
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(feed.wait(1, timeout=5.0)))
+    waiter.start()
+    revisions[0] = 2
+    waiter.join(timeout=5.0)
+    assert result == [2]
+
+
+def test_notify_wakes_waiters_without_polling():
+    revisions = [1]
+    feed = ChangeFeed(lambda: revisions[0], poll_interval=60.0)
+    assert feed.wait(None, timeout=1.0) == 1
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(feed.wait(1, timeout=5.0)))
+    waiter.start()
+    revisions[0] = 2
+    feed.notify()
+    waiter.join(timeout=1.0)
+    assert result == [2]
+
+
+def test_waiter_ahead_of_the_feed_blocks_until_it_is_passed():
+    revisions = [1]
+    feed = ChangeFeed(lambda: revisions[0], poll_interval=60.0)
+    assert feed.wait(None, timeout=1.0) == 1
+
+    # Le client a lu la révision 2 en base avant que le flux ne la voie
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(feed.wait(2, timeout=5.0)))
+    waiter.start()
+    revisions[0] = 2
+    feed.notify()
+    waiter.join(timeout=0.2)
+    assert waiter.is_alive() and result == []
+
+    revisions[0] = 3
+    feed.notify()
+    waiter.join(timeout=1.0)
+    assert result == [3]
@@ -0,0 +1,56 @@
+import numpy as np
+from core.layout import (EMU_PER_INCH, SLIDE_WIDTH, assign_lanes, compute_layout,
+                         month_bounds, to_percent)
+
+
+def test_layout_matches_scalar_geometry():
+    layout = compute_layout([4, 2], [0.5, 1.0], [11, 7], [1.0, 0.0], [1, 2])
+    month_width = (SLIDE_WIDTH - EMU_PER_INCH) / 12
+
+    assert layout.x.dtype == np.int64
+    assert layout.x[0] == round(EMU_PER_INCH / 2 + 4.5 * month_width)
+    assert layout.x[0] + layout.width[0] == round(EMU_PER_INCH / 2 + 12 * month_width)
+    assert layout.y[1] - layout.y[0] == int(0.6 * EMU_PER_INCH)
+
+
+def test_missing_bounds_use_defaults():
+    layout = compute_layout([None], [None], [None], [None], [0])
+    start_percent, duration_percent = to_percent(layout)
+
+    assert round(start_percent[0], 3) == round(0.5 / 12 * 100, 3)
+    assert round(start_percent[0] + duration_percent[0]) == 100
+
+
+def test_assign_lanes_reuses_free_lane():
+    starts, ends = month_bounds([0, 1, 6], [0.0, 0.0, 0.0], [5, 3, 8], [0.0, 0.0, 0.0])
+    lanes, lane_ends = assign_lanes(starts, ends)
+
+    # La ligne 1 (fin en 3) est libérée avant la ligne 0 (fin en 5)
+    assert lanes.tolist() == [0, 1, 1]
+    assert lane_ends == [5.0, 8.0]
+
+
+def test_assign_lanes_resumes_and_never_overlaps():
+    rng = np.random.default_rng(0)
+    starts = np.sort(rng.uniform(0, 12, 500))
+    ends = starts + rng.uniform(0, 4, 500)
+
+    lanes, lane_ends = assign_lanes(starts, ends)
+    head, head_ends = assign_lanes(starts[:200], ends[:200])
+    tail, tail_ends = assign_lanes(starts[200:], ends[200:], head_ends)
+    assert np.concatenate([head, tail]).tolist() == lanes.tolist()
+    assert tail_ends == lane_ends
+
+    for lane in np.unique(lanes):
+        spans = sorted(zip(starts[lanes == lane], ends[lanes == lane]))
+        assert all(previous[1] <= current[0] for previous, current in zip(spans, spans[1:]))
+
+    # Triées par début : autant de lignes que de tâches simultanées au maximum
+    events = sorted([(start, 1) for start in starts] + [(end, -1) for end in ends], key=lambda e: (e[0], e[1]))
+    assert len(lane_ends) == max(np.cumsum([delta for _, delta in events]))
+
+
+def test_end_before_start_gives_an_empty_bar():
+    layout = compute_layout([2], [0.0], [0], [0.0], [0])
+
+    assert layout.width.tolist() == [0]
@@ -0,0 +1,35 @@
+import pytest
+
+from core.llm_response import find_json_value, is_parsed_actions, validate_parsed_actions
+
+ACTION = '{"type": "create", "task_name": "P1", "color_rgb": [0, 255, 0]}'
+
+
+def _parse(text):
+    return validate_parsed_actions(find_json_value(text, is_parsed_actions))
+
+
+def test_prose_prefixed_object_is_a_single_action():
+    actions = _parse(f'[note] Voici la réponse : {ACTION} [fin]')
+
+    assert actions == [{'type': 'create', 'task_name': 'P1', 'color_rgb': [0, 255, 0]}]
+
+
+def test_array_reply_is_a_compound_prompt():
+    text = f'Réponse : [{ACTION}, {{"type": "update", "task_name": "P2", "end_date": null}}]'
+
+    assert _parse(text) == [{'type': 'create', 'task_name': 'P1', 'color_rgb': [0, 255, 0]},
+                            {'type': 'update', 'task_name': 'P2'}]
+
+
+def test_rejected_values_are_skipped_whole():
+    # [1, [2, 3]] est refusé : son tableau intérieur ne doit pas être retenu
+    pairs = lambda value: isinstance(value, list) and len(value) == 2
+    assert find_json_value('[1, [2, 3], 4] puis [5, 6]', pairs) == [5, 6]
+
+
+def test_reply_without_json_is_rejected():
+    with pytest.raises(ValueError):
+        find_json_value('[note] pas de réponse', is_parsed_actions)
+    with pytest.raises(ValueError):
+        _parse('{"type": "create"}')
@@ -0,0 +1,52 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.micro_batch import MicroBatcher
+
+
+def test_concurrent_items_share_one_call_and_invalid_ones_are_retried():
+    batches = []
+    singles = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def run_batch(items):
+        batches.append(list(items))
+        # L'élément 'bad' est invalide dans le lot
+        return [None if item == 'bad' else item.upper() for item in items]
+
+    def run_single(item):
+        singles.append(item)
+        if item == 'first':
+            started.set()
+            release.wait(5.0)
+        return item.upper()
+
+    batcher = MicroBatcher(run_batch, run_single, max_batch=8, window=0.01, max_concurrent=1)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        first = executor.submit(batcher.submit, 'first')
+        started.wait(5.0)
+        # Pendant l'appel en cours, les demandes suivantes s'accumulent
+        others = [executor.submit(batcher.submit, item) for item in ('a', 'bad', 'b', 'c')]
+        time.sleep(0.05)
+        release.set()
+
+        assert first.result(5.0) == 'FIRST'
+        assert [future.result(5.0) for future in others] == ['A', 'BAD', 'B', 'C']
+
+    assert len(batches) == 1 and sorted(batches[0]) == ['a', 'b', 'bad', 'c']
+    assert singles == ['first', 'bad']
+
+
+def test_failed_batch_falls_back_to_individual_calls():
+    def run_batch(items):
+        raise RuntimeError('réponse illisible')
+
+    batcher = MicroBatcher(run_batch, str.upper, max_batch=4, window=0.05)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(batcher.submit, ['x', 'y', 'z']))
+
+    assert results == ['X', 'Y', 'Z']
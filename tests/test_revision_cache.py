@@ -0,0 +1,32 @@
+from core.revision_cache import RevisionCache
+
+
+def test_entries_are_built_once_per_revision():
+    revisions = [1]
+    builds = []
+    cache = RevisionCache(lambda: revisions[0])
+
+    def build(revision):
+        builds.append(revision)
+        return f'table-{revision}'
+
+    assert cache.get_or_build('table', build) == 'table-1'
+    assert cache.get_or_build('table', build) == 'table-1'
+
+    revisions[0] = 2
+    assert cache.get_or_build('table', build) == 'table-2'
+    assert builds == [1, 2]
+
+
+def test_late_put_for_an_old_revision_is_ignored():
+    revisions = [1]
+    cache = RevisionCache(lambda: revisions[0])
+
+    revision = cache.revision()
+    revisions[0] = 2
+    assert cache.revision() == 2
+
+    # Un export terminé après une écriture ne doit pas être servi
+    cache.put('svg', revision, ['<svg/>'])
+    assert cache.get('svg', 2) is None
+    assert cache.get('svg', revision) is None
@@ -0,0 +1,28 @@
+import json
+from xml.dom import minidom
+
+from core.layout import compute_layout
+from core.roadmap_export import iter_layout_json, iter_svg
+
+IDS = [1, 2]
+NAMES = ['p1 & co', 'p2']
+COLORS = [[0, 255, 0], [0, 0, 255]]
+
+
+def _layout():
+    return compute_layout([0, 3], [0.5, 0.0], [5, 8], [1.0, 0.5], [1, 2])
+
+
+def test_svg_is_well_formed():
+    document = minidom.parseString(''.join(iter_svg(_layout(), NAMES, COLORS)))
+
+    assert len(document.getElementsByTagName('g')) == 1 + len(NAMES)
+
+
+def test_layout_json_matches_layout():
+    layout = _layout()
+    payload = json.loads(''.join(iter_layout_json(layout, IDS, NAMES, COLORS, revision=7)))
+
+    assert payload['revision'] == 7
+    assert [task['x'] for task in payload['tasks']] == layout.x.tolist()
+    assert payload['tasks'][0]['task_name'] == 'p1 & co'
@@ -0,0 +1,437 @@
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+import task_database
+from task_database import SCHEMA_VERSION, AmbiguousTaskName, TaskDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = TaskDatabase(str(tmp_path / 'tasks.db'))
+    yield database
+    database.close()
+
+
+def _task(name, **fields):
+    return {'type': 'create', 'task_name': name, 'start_month': [2, 0.5],
+            'end_month': [5, 1.0], 'color_rgb': [0, 255, 0], **fields}
+
+
+def test_revision_increases_on_each_write(db):
+    assert db.revision() == 0
+
+    db.upsert_task(_task('P1'))
+    db.upsert_task({'task_name': 'P1', 'end_date': '2025/07/01'})
+    assert db.revision() == 2
+
+    assert db.delete_task({'task_name': 'P1'})
+    assert db.revision() == 3
+
+
+def test_delete_missing_task_keeps_revision(db):
+    assert not db.delete_task({'task_name': 'absent'})
+    assert db.revision() == 0
+
+
+def test_connection_is_persistent_and_tuned(db):
+    conn = db._connection()
+
+    assert db._connection() is conn
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+
+
+def test_reads_do_not_block_on_pending_write(db, tmp_path):
+    db.upsert_task(_task('P1'))
+
+    writer = sqlite3.connect(str(tmp_path / 'tasks.db'), timeout=0)
+    writer.execute('BEGIN EXCLUSIVE')
+    writer.execute("INSERT INTO tasks (task_name) VALUES ('p2')")
+
+    assert [task['task_name'] for task in db.list_tasks()] == ['p1']
+    writer.rollback()
+    writer.close()
+
+
+def test_upsert_only_overwrites_provided_fields(db):
+    task_id = db.upsert_task(_task('P1'), raw_prompt='créer P1')
+
+    assert db.upsert_task({'task_name': ' p1 ', 'end_month': [7, 0.0]}, raw_prompt='prolonger P1') == task_id
+    task = db.get_task_by_name('P1')
+    assert (task['start_month'], task['start_position']) == (2, 0.5)
+    assert (task['end_month'], task['end_position']) == (7, 0.0)
+    assert task['color_rgb'] == '[0, 255, 0]'
+    assert task['raw_prompt'] == 'prolonger P1'
+
+
+def test_upsert_without_fields_is_a_no_op(db):
+    task_id = db.upsert_task(_task('P1'))
+    revision = db.revision()
+
+    assert db.upsert_task({'task_name': 'P1'}) == task_id
+    assert db.revision() == revision
+
+
+def test_legacy_duplicates_are_merged_before_unique_index(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, task_name TEXT NOT NULL, '
+                 'start_month INTEGER, start_position REAL, end_month INTEGER, end_position REAL, '
+                 'color_rgb TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)')
+    conn.executemany('INSERT INTO tasks (task_name, start_month) VALUES (?, ?)', [('p1', 1), ('p1', 4)])
+    conn.commit()
+    conn.close()
+
+    database = TaskDatabase(path)
+    tasks = database.list_tasks()
+    database.close()
+
+    assert [(task['task_name'], task['start_month']) for task in tasks] == [('p1', 4)]
+
+
+def test_delete_uses_normalized_key(db):
+    db.upsert_task(_task('Projet - Alpha'))
+
+    assert db.delete_task({'task_name': 'projet alpha'})
+    assert db.list_tasks() == []
+
+
+def test_delete_tasks_in_bulk(db):
+    for name in ('P1', 'P2', 'P3'):
+        db.upsert_task(_task(name))
+    revision = db.revision()
+
+    assert db.delete_tasks(['p1', 'P3', 'absent']) == 2
+    assert [task['task_name'] for task in db.list_tasks()] == ['p2']
+    assert db.revision() == revision + 1
+
+
+def test_punctuated_names_match_their_key(db):
+    db.upsert_task(_task('Alpha - Beta'))
+    db.upsert_task(_task('Gamma - Delta'))
+
+    assert task_database.normalize_text('Alpha - Beta') == 'alpha beta'
+    assert db.get_task_by_name('alpha beta')['name_key'] == 'alpha beta'
+    assert db.delete_tasks(['Alpha - Beta']) == 1
+    assert db.delete_task({'task_name': 'Gamma - Delta'})
+    assert db.list_tasks() == []
+
+
+def test_migration_recomputes_punctuated_keys(tmp_path):
+    path = str(tmp_path / 'tasks.db')
+    TaskDatabase(path).close()
+
+    # Noms stockés par l'ancienne normalisation (espaces doubles)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO tasks (task_name, name_key, match_key, created_at) VALUES (?, ?, ?, ?)", [
+        ('alpha  beta', 'alpha  beta', 'alpha beta', '2025-01-01'),
+        ('alpha beta', 'alpha beta', 'alpha beta', '2025-02-01'),
+        ('gamma  delta', 'gamma  delta', 'gamma delta', '2025-01-01'),
+    ])
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION - 1}')
+    conn.commit()
+    conn.close()
+
+    database = TaskDatabase(path)
+    try:
+        assert sorted(task['task_name'] for task in database.list_tasks()) == ['alpha beta', 'gamma delta']
+        assert database.delete_tasks(['Gamma - Delta']) == 1
+    finally:
+        database.close()
+
+
+def test_schema_version_is_recorded(db):
+    conn = db._connection()
+
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+
+
+def test_migrations_run_once_per_version(tmp_path, monkeypatch):
+    path = str(tmp_path / 'tasks.db')
+    TaskDatabase(path).close()
+
+    calls = []
+    monkeypatch.setattr(task_database, 'MIGRATIONS', task_database.MIGRATIONS + [calls.append])
+    monkeypatch.setattr(task_database, 'SCHEMA_VERSION', SCHEMA_VERSION + 1)
+    for _ in range(2):
+        TaskDatabase(path).close()
+
+    assert len(calls) == 1
+
+
+def test_bulk_upsert_streams_chunks_and_reports_conflicts(db):
+    existing_id = db.upsert_task(_task('P0'))
+
+    def stream():
+        yield {'task_name': 'P0', 'end_month': [9, 0.0]}
+        for index in range(1, 6):
+            yield _task(f'P{index}')
+        yield {'task_name': 'P3', 'color_rgb': [255, 0, 0]}
+
+    revision = db.revision()
+    assert db.bulk_upsert(stream(), raw_prompt='import', chunk_size=2) == \
+        {'imported': 7, 'created': 5, 'updated': 2}
+    assert db.get_task_by_name('P0')['id'] == existing_id
+    assert db.get_task_by_name('P3')['color_rgb'] == '[255, 0, 0]'
+    assert db.get_task_by_name('P0')['end_month'] == 9
+    assert len(db.list_tasks()) == 6
+
+    # Paquets journalisés sous une seule révision, annulée d'un bloc
+    assert db.revision() == revision + 1
+    assert {change['revision'] for change in db.changes_since(revision)} == {revision + 1}
+    db.undo()
+    assert [task['task_name'] for task in db.list_tasks()] == ['p0']
+    assert db.get_task_by_name('P0')['end_month'] == 5
+
+
+def test_iter_tasks_pages_by_start_date(db):
+    db.upsert_task(_task('sans date'))
+    for index, day in enumerate(['2025/03/01', '2025/01/15', '2025/03/01', '2025/02/01']):
+        db.upsert_task(_task(f'P{index}', start_date=day))
+
+    names = [task['task_name'] for task in db.iter_tasks(batch=2)]
+    assert names == ['sans date', 'p1', 'p3', 'p0', 'p2']
+
+    resumed = db.iter_tasks(since=(None, db.get_task_by_name('sans date')['id']), batch=1)
+    assert [task['task_name'] for task in resumed] == names[1:]
+    assert len(db.list_tasks(limit=3)) == 3
+
+
+def test_changes_since_reports_each_write(db):
+    db.upsert_task(_task('P1'), raw_prompt='créer P1')
+    revision = db.revision()
+    db.upsert_task({'task_name': 'P1', 'color_rgb': [255, 0, 0]}, raw_prompt='P1 en rouge')
+    db.delete_task({'task_name': 'P1'}, raw_prompt='supprimer P1')
+
+    changes = db.changes_since(revision)
+
+    assert [(change['revision'], change['op']) for change in changes] == [(2, 'update'), (3, 'delete')]
+    assert changes[0]['fields'] == {'color_rgb': [255, 0, 0]}
+    assert changes[1]['raw_prompt'] == 'supprimer P1'
+    assert db.changes_since(db.revision()) == []
+
+
+def test_tasks_overlapping_uses_span_index(db):
+    db.upsert_task(_task('Q1', start_date='2025/01/06', end_date='2025/03/28'))
+    db.upsert_task(_task('Q2', start_date='2025/04/01', end_date='2025/06/30'))
+    db.upsert_task(_task('Sans date'))
+
+    assert [task['task_name'] for task in db.tasks_overlapping('2025-03-15', '2025-04-15')] == ['q1', 'q2']
+    assert [task['task_name'] for task in db.tasks_overlapping('2025/05/01')] == ['q2']
+    assert list(db.iter_task_rows(('task_name',), window=(None, '2025-02-01'))) == [('q1',)]
+
+    # Les triggers suivent les modifications et suppressions
+    db.upsert_task({'task_name': 'Q1', 'end_date': '2025/05/15'})
+    assert [task['task_name'] for task in db.tasks_overlapping('2025-05-01')] == ['q1', 'q2']
+
+    db.delete_task({'task_name': 'Q2'})
+    assert [task['task_name'] for task in db.tasks_overlapping('2025-05-01')] == ['q1']
+
+
+def test_resolve_task_name_ranks_close_names(db):
+    db.upsert_task(_task('Migration CRM'))
+    db.upsert_task(_task('Migration ERP'))
+    db.upsert_task(_task('Phase 1'))
+
+    matches = db.resolve_task_name('Projet Migraton CRM', threshold=0.3)
+    assert [match['task_name'] for match in matches] == ['migration crm', 'migration erp']
+    assert matches[0]['score'] > matches[1]['score']
+
+    # Les numéros doivent correspondre, et le seuil s'applique
+    assert db.resolve_task_name('Phase 2') == []
+    assert db.resolve_task_name('Migraton CRM', threshold=0.95) == []
+
+
+def test_update_and_delete_resolve_approximate_names(db):
+    task_id = db.upsert_task(_task('Déploiement P1'))
+
+    assert db.upsert_task({'type': 'update', 'task_name': 'Projet deploiement P1', 'end_date': '2025/09/01'}) == task_id
+    assert db.get_task_by_name('déploiement p1')['end_date'] == '2025/09/01'
+
+    # Une création garde son propre nom
+    assert db.upsert_task(_task('Déploiement P2')) != task_id
+
+    assert db.delete_task({'task_name': 'Deploiement P1'})
+    assert db.get_task_by_name('déploiement p1') is None
+    assert db.get_task_by_name('déploiement p2') is not None
+
+
+def test_near_miss_names_are_never_modified(db):
+    db.upsert_task(_task('Migration CRM'))
+    db.upsert_task(_task('Refonte site web', end_date='2025/06/30'))
+    db.upsert_task(_task('Refonte site mobile', end_date='2025/09/30'))
+    tasks, revision = db.list_tasks(), db.revision()
+
+    with pytest.raises(AmbiguousTaskName) as error:
+        db.delete_task({'task_name': 'Migration ERP'})
+    assert [candidate['task_name'] for candidate in error.value.candidates] == ['migration crm']
+
+    with pytest.raises(AmbiguousTaskName):
+        db.upsert_task({'type': 'update', 'task_name': 'Refonte site', 'end_date': '2025/12/31'})
+    with pytest.raises(AmbiguousTaskName):
+        db.apply_actions([_task('P1'), {'type': 'delete', 'task_name': 'Migration ERP'}])
+
+    assert db.list_tasks() == tasks
+    assert db.revision() == revision
+
+
+def test_search_changes_finds_prompts_by_relevance(db):
+    db.upsert_task(_task('P1'), raw_prompt='Créer le projet P1 de janvier à mars')
+    db.upsert_task({'task_name': 'P1', 'end_date': '2025/06/30'}, raw_prompt='Décaler les dates de P1 à fin juin')
+    db.upsert_task(_task('P2'), raw_prompt='Créer le projet P2')
+
+    results = db.search_changes('dates p1')
+    assert [(result['op'], result['task_name']) for result in results] == [('update', 'p1')]
+    assert results[0]['fields'] == {'end_date': '2025/06/30'}
+    assert '<mark>dates</mark>' in results[0]['snippet']
+
+    # Accents ignorés, dernier mot en préfixe, pagination
+    assert len(db.search_changes('cree')) == 2
+    assert len(db.search_changes('cree', limit=1, offset=1)) == 1
+    assert db.search_changes('"') == []
+
+
+def test_concurrent_writes_go_through_the_writer(db):
+    def write(worker):
+        for index in range(25):
+            db.upsert_task(_task(f'T{worker}-{index}'))
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db.revision() == 200
+    assert len(db.list_tasks()) == 200
+
+
+def test_failed_write_is_rolled_back_alone(db):
+    db.insert_task(_task('P1'))
+    batch = [(db._insert_task, (_task('P2'),), Future()),
+             (db._insert_task, (_task('P1'),), Future()),
+             (db._upsert_task, (_task('P3'), None), Future())]
+
+    db._write_batch(batch)
+
+    assert batch[0][2].result() and batch[2][2].result()
+    with pytest.raises(sqlite3.IntegrityError):
+        batch[1][2].result()
+    assert [task['task_name'] for task in db.list_tasks()] == ['p1', 'p2', 'p3']
+    assert db.revision() == 3
+
+
+def test_undo_and_redo_restore_previous_images(db):
+    db.upsert_task(_task('P1', end_date='2025/06/30'))
+    db.upsert_task({'task_name': 'P1', 'end_date': '2025/09/30'})
+    db.delete_task({'task_name': 'P1'})
+
+    assert db.undo()['target'] == 3
+    assert db.get_task_by_name('P1')['end_date'] == '2025/09/30'
+    assert db.undo()['target'] == 2
+    assert db.get_task_by_name('P1')['end_date'] == '2025/06/30'
+
+    assert db.redo()['target'] == 2
+    assert db.get_task_by_name('P1')['end_date'] == '2025/09/30'
+
+    # Une nouvelle modification vide la pile de rétablissement
+    db.upsert_task(_task('P2'))
+    assert db.redo() is None
+    assert db.get_task_by_name('P1') is not None
+    assert db.revision() == 7
+
+
+def test_tasks_at_replays_from_nearest_snapshot(db, monkeypatch):
+    monkeypatch.setattr(task_database, 'SNAPSHOT_INTERVAL', 3)
+    for index in range(7):
+        db.upsert_task(_task('P1', end_date=f'2025/0{index + 1}/28'))
+    db.delete_task({'task_name': 'P1'})
+
+    assert [task['end_date'] for task in db.tasks_at(5)] == ['2025/05/28']
+    assert db.tasks_at(5)[0]['color_int'] == 0x00FF00
+    assert db.tasks_at(8) == []
+    assert db.tasks_at(0) == []
+
+
+def test_compaction_keeps_recent_history(db, monkeypatch):
+    monkeypatch.setattr(task_database, 'SNAPSHOT_INTERVAL', 2)
+    for index in range(6):
+        db.upsert_task(_task('P1', end_date=f'2025/0{index + 1}/28'), raw_prompt=f'décalage {index + 1}')
+
+    assert db.compact_history(keep_revisions=2) == 4
+    assert [task['end_date'] for task in db.tasks_at(4)] == ['2025/04/28']
+    with pytest.raises(ValueError):
+        db.tasks_at(3)
+
+    # Les images sont effacées, pas le journal : recherche et synchronisation couvrent tout
+    assert [change['revision'] for change in db.changes_since(0)] == [1, 2, 3, 4, 5, 6]
+    assert [result['revision'] for result in db.search_changes('décalage 1')] == [1]
+    assert len(db.search_changes('décalage')) == 6
+
+    # Les opérations compactées ne s'annulent plus
+    assert db.undo()['target'] == 6
+    assert db.undo()['target'] == 5
+    assert db.undo() is None
+
+
+def test_snapshots_are_pruned_but_the_first_is_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_database, 'SNAPSHOT_INTERVAL', 2)
+    database = TaskDatabase(str(tmp_path / 'tasks.db'), snapshot_retention=2)
+    try:
+        for index in range(10):
+            database.upsert_task(_task('P1', end_date=f'2025/{index + 1:02d}/28'))
+
+        conn = database._connection()
+        revisions = [row[0] for row in conn.execute('SELECT revision FROM task_snapshots ORDER BY revision')]
+        assert revisions == [0, 8, 10]
+        # Reconstruction ancienne : rejeu depuis le premier instantané
+        assert [task['end_date'] for task in database.tasks_at(3)] == ['2025/03/28']
+    finally:
+        database.close()
+
+
+def test_revision_sees_commits_from_other_connections(db, tmp_path):
+    other = TaskDatabase(str(tmp_path / 'tasks.db'))
+    try:
+        assert db.revision() == 0
+
+        # Une autre instance joue le rôle d'un second processus
+        other.upsert_task(_task('P1'))
+        assert db.revision() == 1
+
+        db.upsert_task(_task('P2'))
+        assert other.revision() == 2
+        assert db.revision() == 2
+    finally:
+        other.close()
+
+
+def test_compound_prompt_is_one_undoable_revision(db):
+    db.upsert_task(_task('P2'))
+    revision = db.revision()
+
+    results = db.apply_actions([
+        _task('P1', color_rgb=[0, 128, 0]),
+        {'type': 'update', 'task_name': 'P1', 'end_month': [8, 0.0]},
+        {'type': 'delete', 'task_name': 'P2'},
+        {'type': 'delete', 'task_name': 'absent'},
+    ], raw_prompt='crée P1 puis supprime P2')
+
+    assert results[0] == results[1] and results[2:] == [True, False]
+    assert db.revision() == revision + 1
+    assert [task['task_name'] for task in db.list_tasks()] == ['p1']
+    assert db.get_task_by_name('P1')['end_month'] == 8
+
+    assert db.undo() == {'revision': revision + 2, 'target': revision + 1}
+    assert [task['task_name'] for task in db.list_tasks()] == ['p2']
+
+
+def test_compound_prompt_is_atomic(db):
+    with pytest.raises(ValueError):
+        db.apply_actions([_task('P1'), {'type': 'rename', 'task_name': 'P1'}])
+
+    assert db.list_tasks() == []
+    assert db.revision() == 0
@@ -0,0 +1,299 @@
+import asyncio
+import inspect
+import sqlite3
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import task_database
+from core import sqlalchemy_repository
+from core.repository import TaskRepository
+from core.sqlalchemy_repository import AsyncSQLAlchemyTaskRepository, SQLAlchemyTaskRepository
+from core.task_values import AmbiguousTaskName
+from task_database import TaskDatabase
+
+
+@pytest.fixture(params=['sqlite', 'sqlalchemy'])
+def repository(request, tmp_path):
+    path = tmp_path / 'tasks.db'
+    if request.param == 'sqlite':
+        database = TaskDatabase(str(path))
+    else:
+        # SQLite fichier : stand-in local d'une base serveur, même pool de connexions
+        database = SQLAlchemyTaskRepository(f'sqlite:///{path}', pool_size=2, max_overflow=2)
+    yield database
+    database.close()
+
+
+def _task(name, **fields):
+    return {'type': 'create', 'task_name': name, 'start_month': [2, 0.5],
+            'end_month': [5, 1.0], 'color_rgb': [0, 255, 0], **fields}
+
+
+def test_both_backends_implement_the_interface(repository):
+    assert isinstance(repository, TaskRepository)
+
+
+def test_upsert_merges_fields_and_bumps_revision(repository):
+    task_id = repository.upsert_task(_task('P1'), raw_prompt='créer P1')
+    assert repository.upsert_task({'task_name': ' p1 ', 'end_month': [7, 0.0]}, raw_prompt='prolonger P1') == task_id
+    assert repository.revision() == 2
+
+    task = repository.get_task_by_name('P1')
+    assert (task['start_month'], task['start_position']) == (2, 0.5)
+    assert (task['end_month'], task['end_position']) == (7, 0.0)
+    assert task['color_rgb'] == '[0, 255, 0]'
+    assert task['color_int'] == 0x00FF00
+    assert task['raw_prompt'] == 'prolonger P1'
+
+    # Sans champ renseigné, l'upsert ne change rien
+    assert repository.upsert_task({'task_name': 'P1'}) == task_id
+    assert repository.revision() == 2
+
+
+def test_deletes_use_normalized_keys(repository):
+    for name in ('Projet - Alpha', 'P2', 'P3'):
+        repository.upsert_task(_task(name))
+
+    assert repository.delete_task({'task_name': 'projet alpha'})
+    assert not repository.delete_task({'task_name': 'absent'})
+    assert repository.delete_tasks(['p2', 'absent']) == 1
+    assert [task['task_name'] for task in repository.list_tasks()] == ['p3']
+    assert repository.revision() == 5
+
+
+def test_punctuated_names_use_the_same_key_on_both_backends(repository):
+    for name in ('Alpha - Beta', 'Gamma - Delta', 'Epsilon (v2)'):
+        repository.upsert_task(_task(name))
+
+    assert repository.get_task_by_name('Alpha - Beta')['task_name'] == 'alpha beta'
+    assert repository.delete_task({'task_name': 'Gamma - Delta'})
+    assert repository.delete_tasks(['Alpha - Beta', 'epsilon v2']) == 2
+    assert repository.list_tasks() == []
+
+
+def test_bulk_upsert_reports_conflicts(repository):
+    existing_id = repository.upsert_task(_task('P0'))
+
+    def stream():
+        yield {'task_name': 'P0', 'end_month': [9, 0.0]}
+        for index in range(1, 4):
+            yield _task(f'P{index}')
+        yield {'task_name': 'P2', 'color_rgb': [255, 0, 0]}
+
+    assert repository.bulk_upsert(stream(), raw_prompt='import', chunk_size=2) == \
+        {'imported': 5, 'created': 3, 'updated': 2}
+    assert repository.get_task_by_name('P0')['id'] == existing_id
+    assert repository.get_task_by_name('P0')['end_month'] == 9
+    assert repository.get_task_by_name('P2')['color_rgb'] == '[255, 0, 0]'
+    assert repository.revision() == 2
+
+
+def test_iter_tasks_pages_by_start_date(repository):
+    repository.upsert_task(_task('sans date'))
+    for index, day in enumerate(['2025/03/01', '2025/01/15', '2025/03/01', '2025/02/01']):
+        repository.upsert_task(_task(f'P{index}', start_date=day))
+
+    names = [task['task_name'] for task in repository.iter_tasks(batch=2)]
+    assert names == ['sans date', 'p1', 'p3', 'p0', 'p2']
+
+    resumed = repository.iter_tasks(since=(None, repository.get_task_by_name('sans date')['id']), batch=1)
+    assert [task['task_name'] for task in resumed] == names[1:]
+    assert len(repository.list_tasks(limit=3)) == 3
+
+
+def test_changes_since_reports_each_write(repository):
+    repository.upsert_task(_task('P1'), raw_prompt='créer P1')
+    revision = repository.revision()
+    repository.upsert_task({'task_name': 'P1', 'color_rgb': [255, 0, 0]}, raw_prompt='P1 en rouge')
+    repository.delete_task({'task_name': 'P1'}, raw_prompt='supprimer P1')
+
+    changes = repository.changes_since(revision)
+
+    assert [(change['revision'], change['op']) for change in changes] == [(2, 'update'), (3, 'delete')]
+    assert changes[0]['fields'] == {'color_rgb': [255, 0, 0]}
+    assert changes[1]['raw_prompt'] == 'supprimer P1'
+    assert repository.changes_since(repository.revision()) == []
+
+
+def test_structured_edits_by_id(repository):
+    task_id = repository.insert_task(_task('P1'))
+    other_id = repository.insert_task(_task('P2'))
+    with pytest.raises((sqlite3.IntegrityError, IntegrityError)):
+        repository.insert_task(_task('p1'))
+
+    task = repository.update_task(task_id, {'task_name': 'Lancement', 'color_rgb': [255, 0, 0]},
+                                  raw_prompt='PATCH /api/tasks')
+    assert (task['id'], task['task_name'], task['color_rgb']) == (task_id, 'lancement', '[255, 0, 0]')
+    assert (task['start_month'], task['end_month']) == (2, 5)
+    assert repository.get_task(task_id)['task_name'] == 'lancement'
+    assert repository.changes_since(2)[0]['fields'] == {'color_rgb': [255, 0, 0], 'task_name': 'lancement'}
+
+    with pytest.raises((sqlite3.IntegrityError, IntegrityError)):
+        repository.update_task(other_id, {'task_name': 'lancement'})
+    assert repository.update_task(999, {'color_rgb': [0, 0, 0]}) is None
+
+    assert repository.delete_task_by_id(task_id)
+    assert not repository.delete_task_by_id(task_id)
+    assert repository.get_task(task_id) is None
+    assert repository.revision() == 4
+
+
+def test_compound_actions_share_one_transaction(repository):
+    repository.upsert_task(_task('P2'))
+
+    results = repository.apply_actions([_task('P1'), {'type': 'delete', 'task_name': 'p2'}],
+                                       raw_prompt='crée P1 et supprime P2')
+
+    assert results[1] is True
+    assert repository.revision() == 2
+    assert [change['op'] for change in repository.changes_since(1)] == ['insert', 'delete']
+
+    with pytest.raises(ValueError):
+        repository.apply_actions([_task('P3'), {'type': 'archive', 'task_name': 'P1'}])
+    assert repository.get_task_by_name('P3') is None
+    assert repository.revision() == 2
+
+
+def test_windowed_reads(repository):
+    repository.upsert_task(_task('Q1', start_date='2025/01/06', end_date='2025/03/28'))
+    repository.upsert_task(_task('Q2', start_date='2025/04/01', end_date='2025/06/30', color_rgb=[1, 2, 3]))
+    repository.upsert_task(_task('Sans date'))
+
+    assert [task['task_name'] for task in repository.tasks_overlapping('2025-03-15', '2025-04-15')] == ['q1', 'q2']
+    assert list(repository.iter_task_rows(('task_name',), window=(None, '2025-02-01'))) == [('q1',)]
+    assert list(repository.iter_task_rows(('task_name', 'color_int'), window=('2025-05-01', None))) == \
+        [('q2', 0x010203)]
+
+
+def test_approximate_names_on_both_backends(repository):
+    task_id = repository.upsert_task(_task('Déploiement P1'))
+    repository.upsert_task(_task('Refonte site web'))
+    repository.upsert_task(_task('Refonte site mobile'))
+
+    assert repository.resolve_task_name('Projet deploiement P1')[0]['id'] == task_id
+    assert repository.upsert_task({'type': 'update', 'task_name': 'Projet deploiement P1',
+                                   'end_date': '2025/09/01'}) == task_id
+
+    # Un nom proche de plusieurs tâches ne crée ni ne modifie rien
+    revision = repository.revision()
+    with pytest.raises(AmbiguousTaskName) as error:
+        repository.upsert_task({'type': 'update', 'task_name': 'Refonte site', 'end_date': '2025/12/31'})
+    assert {candidate['task_name'] for candidate in error.value.candidates} == \
+        {'refonte site web', 'refonte site mobile'}
+    with pytest.raises(AmbiguousTaskName):
+        repository.apply_actions([_task('P9'), {'type': 'delete', 'task_name': 'Refonte site'}])
+    assert repository.revision() == revision
+    assert repository.get_task_by_name('P9') is None
+
+    assert repository.delete_task({'task_name': 'Deploiement P1'})
+    assert repository.get_task(task_id) is None
+
+
+def test_undo_redo_and_time_travel_on_both_backends(repository):
+    repository.upsert_task(_task('P1', end_date='2025/06/30'))
+    repository.apply_actions([{'type': 'update', 'task_name': 'P1', 'end_date': '2025/09/30'}, _task('P2')])
+    repository.delete_task({'task_name': 'P1'})
+
+    assert repository.undo()['target'] == 3
+    assert repository.get_task_by_name('P1')['end_date'] == '2025/09/30'
+    assert repository.undo() == {'revision': 5, 'target': 2}
+    assert repository.get_task_by_name('P1')['end_date'] == '2025/06/30'
+    assert repository.get_task_by_name('P2') is None
+
+    assert repository.redo()['target'] == 2
+    assert [task['task_name'] for task in repository.list_tasks()] == ['p1', 'p2']
+
+    assert [task['end_date'] for task in repository.tasks_at(1)] == ['2025/06/30']
+    assert repository.tasks_at(1)[0]['color_int'] == 0x00FF00
+    assert [task['task_name'] for task in repository.tasks_at(3)] == ['p2']
+    assert repository.tasks_at(0) == []
+
+    # Une nouvelle modification vide la pile de rétablissement
+    repository.upsert_task(_task('P3'))
+    assert repository.redo() is None
+
+
+def test_undo_restores_tasks_deleted_together(repository):
+    first_id = repository.insert_task(_task('P1'))
+    repository.insert_task(_task('P2'))
+    assert repository.delete_tasks(['P1', 'P2']) == 2
+
+    repository.undo()
+
+    assert [task['task_name'] for task in repository.list_tasks()] == ['p1', 'p2']
+    assert repository.get_task_by_name('P1')['id'] == first_id
+
+
+def test_tasks_at_replays_from_snapshots_on_both_backends(repository, monkeypatch):
+    monkeypatch.setattr(task_database, 'SNAPSHOT_INTERVAL', 2)
+    monkeypatch.setattr(sqlalchemy_repository, 'SNAPSHOT_INTERVAL', 2)
+
+    for month in range(1, 6):
+        repository.upsert_task(_task('P1', end_date=f'2025/0{month}/28'))
+
+    assert [task['end_date'] for task in repository.tasks_at(3)] == ['2025/03/28']
+    assert [task['end_date'] for task in repository.tasks_at(5)] == ['2025/05/28']
+
+
+def test_search_changes_on_both_backends(repository):
+    repository.upsert_task(_task('P1'), raw_prompt='Créer le projet P1 de janvier à mars')
+    repository.upsert_task({'task_name': 'P1', 'end_date': '2025/06/30'},
+                           raw_prompt='Décaler les dates de P1 à fin juin')
+    repository.upsert_task(_task('P2'), raw_prompt='Créer le projet P2')
+
+    results = repository.search_changes('dates p1')
+    assert [(result['op'], result['task_name']) for result in results] == [('update', 'p1')]
+    assert results[0]['fields'] == {'end_date': '2025/06/30'}
+    assert '<mark>dates</mark>' in results[0]['snippet']
+    assert results[0]['score'] > 0
+
+    # Accents ignorés, dernier mot en préfixe, pagination
+    assert len(repository.search_changes('cree')) == 2
+    assert len(repository.search_changes('cree', limit=1, offset=1)) == 1
+    assert repository.search_changes('"') == []
+
+
+def test_async_repository_covers_the_interface():
+    for name in TaskRepository.__abstractmethods__:
+        method = getattr(AsyncSQLAlchemyTaskRepository, name)
+        assert inspect.iscoroutinefunction(method) or inspect.isasyncgenfunction(method), name
+
+
+def test_async_repository_shares_the_write_logic(tmp_path):
+    pytest.importorskip('aiosqlite')
+
+    async def scenario():
+        repository = await AsyncSQLAlchemyTaskRepository.open(f"sqlite+aiosqlite:///{tmp_path / 'tasks.db'}")
+        try:
+            ids = await asyncio.gather(*(repository.upsert_task(_task(f'P{index}')) for index in range(5)))
+            await repository.upsert_task({'task_name': 'P1', 'end_month': [9, 0.0]})
+            assert await repository.delete_task({'task_name': 'p4'})
+
+            assert await repository.delete_tasks(['P3 - ', 'absent']) == 1
+
+            tasks = await repository.list_tasks()
+            rows = [row async for row in repository.iter_task_rows(('task_name', 'color_int'))]
+            assert rows == [(task['task_name'], 0x00FF00) for task in tasks]
+            assert [task async for task in repository.iter_tasks(batch=2)] == tasks
+            changes = await repository.changes_since(0)
+            revision = await repository.revision()
+
+            # Annulation de la suppression groupée, puis retour à l'état d'avant
+            assert (await repository.undo())['target'] == 8
+            restored = {task['task_name'] for task in await repository.tasks_at(9)}
+            assert restored == {'p0', 'p1', 'p2', 'p3'}
+            assert await repository.redo() is not None
+            assert (await repository.search_changes('p1'))[0]['task_name'] == 'p1'
+            return ids, tasks, changes, revision
+        finally:
+            await repository.close()
+
+    ids, tasks, changes, revision = asyncio.run(scenario())
+
+    assert len(set(ids)) == 5
+    by_name = {task['task_name']: task for task in tasks}
+    assert sorted(by_name) == ['p0', 'p1', 'p2']
+    assert by_name['p1']['end_month'] == 9
+    assert revision == 8
+    assert [change['op'] for change in changes][-3:] == ['update', 'delete', 'delete']
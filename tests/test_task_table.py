@@ -0,0 +1,81 @@
+import pytest
+
+from core.task_table import Task, TaskTable, unpack_rgb
+from task_database import TaskDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = TaskDatabase(str(tmp_path / 'tasks.db'))
+    yield database
+    database.close()
+
+
+def test_unpack_rgb():
+    assert unpack_rgb(0x12AB34) == [0x12, 0xAB, 0x34]
+
+
+def test_table_from_database(db):
+    db.upsert_task({'task_name': 'p1', 'start_month': [0, 0.0], 'end_month': [2, 1.0],
+                    'color_rgb': [255, 0, 0], 'start_date': '2024/01/01'})
+    db.upsert_task({'task_name': 'p2', 'start_month': [5, 0.0], 'end_month': [6, 1.0],
+                    'start_date': '2024/06/01'})
+
+    table = TaskTable.from_rows(db.iter_task_rows(TaskTable.COLUMNS), db.revision())
+
+    assert len(table) == 2
+    assert table.names == ('p1', 'p2')
+    assert table.colors_rgb() == [[255, 0, 0], [0, 0, 255]]
+    # p2 commence après la fin de p1 : même ligne
+    assert table.lanes.tolist() == [0, 0]
+    assert table.revision == db.revision()
+
+    task = table[0]
+    assert isinstance(task, Task)
+    assert task.color_rgb == [255, 0, 0]
+    assert task.start_month == 0 and task.end_position == 1.0
+
+
+def test_table_is_read_only():
+    table = TaskTable.from_rows([(1, 'p1', None, None, None, None, None, None, None)])
+
+    assert table[0].start_month is None
+    with pytest.raises(ValueError):
+        table.starts[0] = 3.0
+
+
+def test_empty_table():
+    table = TaskTable.from_rows([])
+
+    assert len(table) == 0
+    assert table.colors_rgb() == []
+    assert list(table) == []
+
+
+def test_iter_task_rows_rejects_unknown_columns(db):
+    with pytest.raises(ValueError):
+        list(db.iter_task_rows(('id', 'missing')))
+
+
+def test_overlapping_tasks_open_one_lane_each():
+    # Chaque tâche chevauche toutes les précédentes : une ligne ouverte par tâche
+    rows = [(index, f'p{index}', index % 6, 0.0, 11, 1.0, None, '2025/01/01', '2025/12/31')
+            for index in range(50)]
+
+    table = TaskTable.from_rows(rows)
+
+    assert table.lanes.tolist() == list(range(50))
+    assert table.lane_ends == [12.0] * 50
+
+
+def test_freed_lanes_are_reused():
+    # p0 et p1 se chevauchent ; p2 commence après p0, p3 après p1
+    rows = [(0, 'p0', 0, 0.0, 2, 0.0, None, None, None),
+            (1, 'p1', 1, 0.0, 5, 0.0, None, None, None),
+            (2, 'p2', 3, 0.0, 4, 0.0, None, None, None),
+            (3, 'p3', 6, 0.0, 7, 0.0, None, None, None)]
+
+    table = TaskTable.from_rows(rows)
+
+    assert table.lanes.tolist() == [0, 1, 0, 0]
+    assert table.lane_ends == [7.0, 5.0]
@@ -0,0 +1,33 @@
+import os
+
+from core.layout import compute_layout
+from core.thumbnail import ThumbnailCache, render_thumbnail
+
+
+def test_render_thumbnail_is_png():
+    layout = compute_layout([0], [0.5], [5], [1.0], [1])
+    data = render_thumbnail(layout, ['p1'], [[0, 255, 0]], 480, 360)
+
+    assert data.startswith(b'\x89PNG')
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_entries=2)
+    first = cache.put(1, 100, 75, b'a')
+    second = cache.put(1, 200, 150, b'b')
+    os.utime(first, (0, 0))
+    os.utime(second, (1, 1))
+
+    assert cache.get(1, 100, 75) == first  # rafraîchit l'entrée
+    cache.put(2, 100, 75, b'c')
+
+    assert cache.get(1, 200, 150) is None
+    assert cache.get(1, 100, 75) == first
+
+
+def test_render_thumbnail_with_an_inverted_task():
+    # Fin (janvier) antérieure au début (mars) : la vignette reste rendue
+    layout = compute_layout([2, 0], [0.0, 0.0], [0, 5], [0.0, 1.0], [0, 1])
+    data = render_thumbnail(layout, ['p1', 'p2'], [[255, 0, 0], [0, 255, 0]], 480, 360)
+
+    assert data.startswith(b'\x89PNG')